@@ -1,9 +1,58 @@
 
 from langchain_ollama import OllamaError
+import os
 import json
 import re
 import sys
+import asyncio
+import atexit
+import functools
+import hashlib
+import logging
+import threading
 from llm_factory import LLMFactory
+from json_extract import extract_first_json_array, extract_first_json_object
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+
+# Placeholder markers in cached prompt skeletons (NUL never survives into real text)
+_SLOT_RE = re.compile(r'\x00(\w+)\x00')
+
+# Lookup tables / run patterns for the _clean_json_response scanner
+_CTRL_TO_SPACE = {c: ' ' for c in range(32) if c not in (9, 10, 13)}
+_STRING_RUN_RE = re.compile(r'[^"\\]+')
+_WS_RUN_RE = re.compile(r'[ \t\r\n]+')
+_PLAIN_RUN_RE = re.compile(r'[^"/,\[\]{} \t\r\n]+')
+# Still-escaped body of each "response" string in an Ollama NDJSON stream
+_NDJSON_RESPONSE_RE = re.compile(r'"response"\s*:\s*"((?:[^"\\]|\\.)*)"', re.ASCII)
+
+# Full prompts/responses are logged at DEBUG only (large texts are slow to print,
+# especially on Windows consoles); main.py enables DEBUG when TESTDATA_DEBUG=1
+logger = logging.getLogger(__name__)
+
+# Opt-in cache of parsed results keyed by prompt hash, so tables with identical
+# schemas (common during development/tests) skip the LLM. Persisted with shelve.
+ENABLE_PROMPT_CACHE = os.getenv("ENABLE_PROMPT_CACHE", "").lower() in ("1", "true", "yes")
+PROMPT_CACHE_PATH = os.getenv("PROMPT_CACHE_PATH", ".prompt_cache")
+_prompt_cache_lock = threading.Lock()
+
+
+def _loads(text: str):
+    """Parse JSON with orjson when installed, else the stdlib.
+
+    Anything orjson rejects is re-parsed with json.loads, so callers see the
+    same results and the same json.JSONDecodeError (msg/doc/pos) as before.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except ValueError:
+            pass
+    return json.loads(text)
 
 
 def _safe_print(text: str) -> None:
@@ -23,71 +72,122 @@ def _safe_print(text: str) -> None:
             print(text.encode('utf-8', errors='replace').decode('utf-8'))
 
 
-class TestDataGenerator:
-    
-    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
-        self.provider = provider
-        # Only pass model_name for Ollama; Groq uses model from .env
-        if provider == "ollama":
-            self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.7)
-        else:
-            self.llm = LLMFactory.create_llm(provider=provider, temperature=0.7)
+def _assemble_ndjson(response: str) -> str:
+    """Concatenate the `response` field of each NDJSON line, in order.
 
-    def _create_prompt(
-        self, 
-        schema_fields: list, 
-        num_records: int, 
-        correct_num_records: int, 
-        wrong_num_records: int, 
-        additional_rules: str = None, 
-        parent_tables_data: dict = None
-    ) -> str:
-        
-        field_names = [field.get('name', '') for field in schema_fields if field.get('name')]
-        valid_count = correct_num_records
-        invalid_count = wrong_num_records
+    A single regex pass collects the still-escaped string bodies, decoded
+    with one JSON parse; per-line parsing is only the fallback. Returns ''
+    when the text isn't an Ollama NDJSON stream.
+    """
+    text = (response or '').lstrip()
+    # NDJSON lines are objects; a bare array is model output, whose own
+    # "response" fields must not be mistaken for stream chunks.
+    if not text.startswith('{'):
+        return ''
+    bodies = _NDJSON_RESPONSE_RE.findall(text)
+    if bodies:
+        try:
+            return _loads('"' + ''.join(bodies) + '"')
+        except ValueError:
+            pass
+
+    parts = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = _loads(line)
+        except ValueError:
+            # Not a JSON line; ignore and continue
+            continue
+        if isinstance(obj, dict) and isinstance(obj.get('response'), str):
+            parts.append(obj['response'])
+    return ''.join(parts)
 
-        # Build field details with type, rules, and examples
-        field_details = []
-        for field in schema_fields:
-            field_info = f"- {field.get('name', 'unknown')}: type={field.get('type', 'string')}"
-            if field.get('rules'):
-                field_info += f", rules={field.get('rules')}"
-            if field.get('example'):
-                field_info += f", example={field.get('example')}"
-            field_details.append(field_info)
-        
-        # Build parent tables context
-        parent_tables_context = ""
-        if parent_tables_data:
-            parent_tables_context = "\n                === PARENT TABLES DATA (USE THESE ACTUAL VALUES!) ===\n\n"
-            for parent_table_name, parent_rows in parent_tables_data.items():
-                parent_tables_context += f"                {parent_table_name.upper()} Table (already generated):\n"
-                # Show sample of parent data with all fields
-                sample_count = min(10, len(parent_rows))
-                for i, row in enumerate(parent_rows[:sample_count]):
-                    parent_tables_context += f"                  {row}\n"
-                if len(parent_rows) > sample_count:
-                    parent_tables_context += f"                  ... and {len(parent_rows) - sample_count} more records\n"
-                parent_tables_context += "\n"
-                
-                # Extract key values for easy reference
-                if parent_rows:
-                    # Get all field names from first row
-                    sample_row = parent_rows[0]
-                    for key in sample_row.keys():
-                        if key != "is_valid":
-                            values = [str(row.get(key, "")) for row in parent_rows if key in row]
-                            unique_values = list(set(values))[:20]  # Show up to 20 unique values
-                            parent_tables_context += f"                Available {parent_table_name}.{key} values: {', '.join(unique_values)}\n"
-                parent_tables_context += "\n"
 
-        prompt = f"""You are an expert test data generator and validator. Your task is to generate {num_records} UNIQUE, DIVERSE, and REALISTIC test data records.
+@functools.lru_cache(maxsize=1)
+def _get_prompt_cache():
+    """Open the shared on-disk prompt cache once per process."""
+    # Imported here: only needed when ENABLE_PROMPT_CACHE is on
+    import dbm.dumb
+    import shelve
+    # dbm.dumb rather than shelve.open()'s default backend: the cache is hit
+    # from worker threads, and the sqlite3 backend (Python 3.13+) refuses
+    # use from any thread but the one that opened it
+    db = shelve.Shelf(dbm.dumb.open(PROMPT_CACHE_PATH, "c"))
+    atexit.register(db.close)
+    return db
+
+
+def _prompt_cache_get(key: str):
+    with _prompt_cache_lock:
+        return _get_prompt_cache().get(key)
+
+
+def _prompt_cache_put(key: str, value) -> None:
+    with _prompt_cache_lock:
+        db = _get_prompt_cache()
+        db[key] = value
+        db.sync()
+
+
+def _slot(name: str) -> str:
+    return f"\x00{name}\x00"
+
+
+def _field_details(schema_fields: list) -> tuple:
+    """(field names, "- name: type=..., rules=..., example=..." lines) for a prompt.
+
+    Built in one pass, reading each key from the field dict once.
+    """
+    field_names = []
+    field_details = []
+    for field in schema_fields:
+        get = field.get
+        name = get('name')
+        rules = get('rules')
+        example = get('example')
+        if name:
+            field_names.append(name)
+        field_info = f"- {name or 'unknown'}: type={get('type', 'string')}"
+        if rules:
+            field_info += f", rules={rules}"
+        if example:
+            field_info += f", example={example}"
+        field_details.append(field_info)
+    return tuple(field_names), tuple(field_details)
+
+
+@functools.lru_cache(maxsize=128)
+def _prompt_skeleton(field_details: tuple, field_names: tuple, has_parents: bool) -> tuple:
+    """Static part of the generation prompt for one schema, split around slots.
+
+    Returns [text, slot_name, text, slot_name, ..., text]; _create_prompt fills
+    the slots (record counts, rules, parent data) per call.
+    """
+    num_records = _slot("num_records")
+    valid_count = _slot("valid_count")
+    invalid_count = _slot("invalid_count")
+    additional_rules_block = _slot("additional_rules_block")
+    # Schemas without parent data get a skeleton with no parent slot at all
+    parent_tables_context = _slot("parent_tables_context") if has_parents else ""
+    field_details_text = "\n".join(field_details)
+    # Both example rows come from a single enumeration of the field names
+    valid_parts = []
+    invalid_parts = []
+    for i, name in enumerate(field_names, 1):
+        valid_parts.append(f'"{name}": "valid_value_example_{i}"')
+        invalid_parts.append(f'"{name}": "invalid_value_example_{i}"')
+    valid_example = ", ".join(valid_parts)
+    invalid_example = ", ".join(invalid_parts)
+
+    prompt = f"""You are an expert test data generator and validator. Your task is to generate {num_records} UNIQUE, DIVERSE, and REALISTIC test data records.
 
                 SCHEMA DEFINITION:
-                {chr(10).join(field_details)}
+                {field_details_text}
 
-                {f"ADDITIONAL CONTEXT/RULES:\n{additional_rules}\n" if additional_rules else ""}
+                {additional_rules_block}
                 {parent_tables_context}
                 === CRITICAL INSTRUCTIONS ===
 
@@ -96,7 +196,7 @@ class TestDataGenerator:
                 - All values must look realistic and natural.
                 - Never copy or reuse any example or previously generated value.
                 - Each valid and invalid record must differ clearly from the others.
-                {f"- **CRITICAL**: If parent table data is provided above, you MUST use those ACTUAL values (e.g., actual department names, actual IDs) to maintain referential integrity and logical consistency between tables." if parent_tables_data else ""}
+                {f"- **CRITICAL**: If parent table data is provided above, you MUST use those ACTUAL values (e.g., actual department names, actual IDs) to maintain referential integrity and logical consistency between tables." if has_parents else ""}
 
                 2. RECORD COUNT:
                 - Generate EXACTLY {num_records} total records.
@@ -144,8 +244,8 @@ class TestDataGenerator:
                 - Values must be unique and realistic.
                 - Example structure:
                 [
-                {{ {', '.join([f'"{name}": "valid_value_example_{i+1}"' for i, name in enumerate(field_names)])}, "is_valid": true }},
-                {{ {', '.join([f'"{name}": "invalid_value_example_{i+1}"' for i, name in enumerate(field_names)])}, "is_valid": false }}
+                {{ {valid_example}, "is_valid": true }},
+                {{ {invalid_example}, "is_valid": false }}
                 ]
 
                 7. QUALITY CHECK BEFORE OUTPUT:
@@ -156,69 +256,465 @@ class TestDataGenerator:
 
                 Now, generate {num_records} unique records following the above schema and constraints."""
 
-        return prompt
-
-    def _clean_json_response(self, response: str) -> str:
-        # First, remove control characters (except newline, tab, carriage return)
-        # Control characters in JSON strings cause parsing errors
-        cleaned = []
-        for char in response:
-            code = ord(char)
-            # Keep printable chars, newlines, tabs, carriage returns
-            if code >= 32 or char in '\n\r\t':
-                cleaned.append(char)
+    return tuple(_SLOT_RE.split(prompt))
+
+
+def _first_unique(rows: list, key: str, limit: int = 20) -> list:
+    """First `limit` distinct str values of `key` across `rows`, in row order.
+
+    Stops scanning as soon as `limit` values are found.
+    """
+    seen = set()
+    out = []
+    for row in rows:
+        if key not in row:
+            continue
+        value = str(row[key])
+        if value in seen:
+            continue
+        seen.add(value)
+        out.append(value)
+        if len(out) == limit:
+            break
+    return out
+
+
+def _strip_double_brackets(text: str) -> str:
+    """Turn a leading `[[` / trailing `]]` (a common LLM slip) into a single bracket."""
+    head = text.lstrip()
+    if head[:1] == '[':
+        rest = head[1:].lstrip()
+        if rest[:1] == '[':
+            text = '[' + rest[1:]
+    tail = text.rstrip()
+    if tail[-1:] == ']':
+        rest = tail[:-1].rstrip()
+        if rest[-1:] == ']':
+            text = rest[:-1] + ']'
+    return text
+
+
+def _clean_json_response(response: str) -> str:
+    """Repair common LLM JSON mistakes in one left-to-right scan.
+
+    Outside string literals this drops // and /* */ comments, trailing
+    commas before ] or }, repeated/leading commas, and lone `null` entries
+    inside objects. Inside strings it only rewrites \\' to '. Because string
+    contents are copied verbatim, "//" in URLs or "null" in text survive.
+    """
+    # Control characters (except \n, \r, \t) break JSON parsing; make them spaces
+    response = _strip_double_brackets(response.translate(_CTRL_TO_SPACE))
+
+    # Fast path: most responses are already valid JSON once control chars and
+    # doubled brackets are dealt with; a C parse confirms that cheaply.
+    try:
+        _loads(response)
+        return response
+    except ValueError:
+        pass
+
+    out = []
+    emit = out.append
+    match_string_run = _STRING_RUN_RE.match
+    match_ws_run = _WS_RUN_RE.match
+    match_plain_run = _PLAIN_RUN_RE.match
+    startswith = response.startswith
+    find = response.find
+    containers = []
+    last_sig = ''      # last significant character emitted outside strings
+    comma_idx = -1     # position in `out` of the most recent comma
+    i = 0
+    n = len(response)
+
+    while i < n:
+        ch = response[i]
+
+        if ch == '"':
+            # Copy the whole string literal
+            emit('"')
+            i += 1
+            while i < n:
+                m = match_string_run(response, i)
+                if m:
+                    emit(m.group())
+                    i = m.end()
+                    continue
+                if response[i] == '"':
+                    emit('"')
+                    i += 1
+                    break
+                # Backslash escape; \' is not valid JSON, ' needs no escape
+                nxt = response[i + 1:i + 2]
+                emit("'" if nxt == "'" else '\\' + nxt)
+                i += 2
+            last_sig = '"'
+
+        elif ch == '/' and startswith('//', i):
+            j = find('\n', i)
+            i = n if j == -1 else j
+
+        elif ch == '/' and startswith('/*', i) and find('*/', i + 2) != -1:
+            i = find('*/', i + 2) + 2
+
+        elif ch == ',':
+            # Collapse repeated commas and drop ones directly after an opener
+            if last_sig not in ('', ',', '{', '['):
+                comma_idx = len(out)
+                emit(',')
+                last_sig = ','
+            i += 1
+
+        elif ch == ']' or ch == '}':
+            if last_sig == ',':
+                out[comma_idx] = ''  # trailing comma
+            if containers:
+                containers.pop()
+            emit(ch)
+            last_sig = ch
+            i += 1
+
+        elif ch == '[' or ch == '{':
+            containers.append(ch)
+            emit(ch)
+            last_sig = ch
+            i += 1
+
+        elif ch in ' \t\r\n':
+            m = match_ws_run(response, i)
+            emit(m.group())
+            i = m.end()
+
+        else:
+            # A bare `null` where an object expects a key, e.g. { "a": 1, null, "b": 2 }
+            if (ch == 'n' and last_sig in (',', '{') and containers
+                    and containers[-1] == '{' and startswith('null', i)):
+                j = i + 4
+                while j < n and response[j] in ' \t\r\n':
+                    j += 1
+                if j == n or response[j] in ',}':
+                    i = j
+                    continue
+            m = match_plain_run(response, i)
+            if m:
+                run = m.group()
+                if '\\' in run:
+                    run = run.replace("\\'", "'")
+                emit(run)
+                last_sig = run[-1]
+                i = m.end()
             else:
-                # Replace other control chars with space
-                cleaned.append(' ')
-        response = ''.join(cleaned)
-        
-        # Escape unescaped forward slashes in URLs within JSON strings
-        # This fixes issues like: "example": "https://example.com/"
-        # Pattern: Find URLs and ensure they're properly formatted
-        def escape_urls_in_json(text):
-            # Find all string values that look like URLs and ensure forward slashes are handled
-            # JSON doesn't require escaping / but some parsers are sensitive
-            import re
-            # This pattern finds "key": "value" pairs where value contains http:// or https://
-            pattern = r'("(?:example|url|website|link)[^"]*":\s*")(https?://[^"]*?)(")'
-            def replacer(match):
-                prefix = match.group(1)
-                url = match.group(2)
-                suffix = match.group(3)
-                # URLs are fine as-is in JSON, just ensure no control chars
-                return prefix + url + suffix
-            return re.sub(pattern, replacer, text, flags=re.IGNORECASE)
-        
-        response = escape_urls_in_json(response)
-        
-        # Remove double brackets
-        response = re.sub(r'^\s*\[\s*\[', '[', response)
-        response = re.sub(r'\]\s*\]\s*$', ']', response)
-        
-        # Remove comments
-        response = re.sub(r'//.*', '', response)
-        response = re.sub(r'/\*.*?\*/', '', response, flags=re.DOTALL)
+                emit(ch)
+                last_sig = ch
+                i += 1
+
+    return ''.join(out)
+
+
+class _JsonStreamScanner:
+    """Incrementally track the first top-level JSON array (or object) across streamed chunks.
+
+    Keeps the (depth, in_str, escape) scanner state between feed() calls so a
+    caller can stop reading the stream as soon as the value closes.
+    """
+
+    def __init__(self, open_ch: str = '[', close_ch: str = ']'):
+        self._open = open_ch
+        self._close = close_ch
+        self._parts = []
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+        self.complete = False
+
+    def feed(self, chunk: str) -> bool:
+        """Consume `chunk`; return True once the first array/object has closed."""
+        if self.complete or not chunk:
+            return self.complete
+        start = 0
+        open_ch, close_ch = self._open, self._close
+        if not self._parts:
+            start = chunk.find(open_ch)
+            if start == -1:
+                return False
+        depth, in_str, escape = self._depth, self._in_str, self._escape
+        for i in range(start, len(chunk)):
+            ch = chunk[i]
+            if in_str:
+                if escape:
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == '"':
+                    in_str = False
+            elif ch == '"':
+                in_str = True
+            elif ch == open_ch:
+                depth += 1
+            elif ch == close_ch:
+                depth -= 1
+                if depth == 0:
+                    self._parts.append(chunk[start:i + 1])
+                    self.complete = True
+                    return True
+        self._parts.append(chunk[start:])
+        self._depth, self._in_str, self._escape = depth, in_str, escape
+        return False
+
+    def text(self) -> str:
+        return ''.join(self._parts)
+
+
+def _invoke_json(llm, prompt: str, open_ch: str = '{', close_ch: str = '}') -> str:
+    """Invoke `llm` for a JSON reply, streaming when the client supports it.
+
+    Use this rather than llm.invoke() whenever the reply is an object:
+    OllamaLLM.invoke() returns only the first JSON array in a reply, which
+    would cut an object such as {"users": [...], "orders": [...]} down to
+    its first value. Pass '[' and ']' for an array reply.
+
+    Reading stops as soon as the first top-level value closes, so any prose the
+    model appends after the JSON is never generated/transferred. If the value
+    never closes, everything received is returned (so the usual repair
+    heuristics still get a chance).
+    """
+    if not hasattr(llm, "stream"):
+        return llm.invoke(prompt)
+    scanner = _JsonStreamScanner(open_ch, close_ch)
+    received = []
+    stream = llm.stream(prompt)
+    try:
+        for chunk in stream:
+            received.append(chunk)
+            if scanner.feed(chunk):
+                return scanner.text()
+    finally:
+        stream.close()
+    return ''.join(received)
+
+
+async def _bounded(semaphore, coro):
+    """Await `coro` holding one slot of `semaphore` (if there is one)."""
+    if semaphore is None:
+        return await coro
+    async with semaphore:
+        return await coro
+
+
+async def _ainvoke_json(llm, prompt: str, open_ch: str = '{', close_ch: str = '}') -> str:
+    """Async variant of _invoke_json(); the stream is read in a worker thread."""
+    if not hasattr(llm, "stream"):
+        return await llm.ainvoke(prompt)
+    return await asyncio.to_thread(_invoke_json, llm, prompt, open_ch, close_ch)
+
+
+class TestDataGenerator:
+    
+    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama", use_cache: bool = None):
+        self.provider = provider
+        # Only pass model_name for Ollama; Groq uses model from .env
+        if provider == "ollama":
+            self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.7)
+        else:
+            self.llm = LLMFactory.get_shared(provider=provider, temperature=0.7)
+        # Prompt-hash response cache; defaults to ENABLE_PROMPT_CACHE
+        self.use_cache = ENABLE_PROMPT_CACHE if use_cache is None else use_cache
+
+    def _create_prompt(
+        self, 
+        schema_fields: list, 
+        num_records: int, 
+        correct_num_records: int, 
+        wrong_num_records: int, 
+        additional_rules: str = None, 
+        parent_tables_data: dict = None
+    ) -> str:
         
-        # Remove trailing commas before closing bracket
-        response = re.sub(r',(\s*\])', r'\1', response)
+        valid_count = correct_num_records
+        invalid_count = wrong_num_records
+
+        field_names, field_details = _field_details(schema_fields)
         
-        # Remove blank lines
-        response = '\n'.join([line for line in response.splitlines() if line.strip()])
+        # Build parent tables context (fragments joined once at the end)
+        parent_tables_context = ""
+        if parent_tables_data:
+            parts = ["\n                === PARENT TABLES DATA (USE THESE ACTUAL VALUES!) ===\n\n"]
+            append = parts.append
+            for parent_table_name, parent_rows in parent_tables_data.items():
+                append(f"                {parent_table_name.upper()} Table (already generated):\n")
+                # Show sample of parent data with all fields
+                sample_count = min(10, len(parent_rows))
+                for row in parent_rows[:sample_count]:
+                    append(f"                  {row}\n")
+                if len(parent_rows) > sample_count:
+                    append(f"                  ... and {len(parent_rows) - sample_count} more records\n")
+                append("\n")
+                
+                # Extract key values for easy reference
+                if parent_rows:
+                    # Get all field names from first row
+                    sample_row = parent_rows[0]
+                    for key in sample_row.keys():
+                        if key != "is_valid":
+                            unique_values = _first_unique(parent_rows, key)  # Show up to 20 unique values
+                            append(f"                Available {parent_table_name}.{key} values: {', '.join(unique_values)}\n")
+                append("\n")
+            parent_tables_context = "".join(parts)
+
+        skeleton = _prompt_skeleton(field_details, field_names, bool(parent_tables_data))
+        slots = {
+            "num_records": str(num_records),
+            "valid_count": str(valid_count),
+            "invalid_count": str(invalid_count),
+            "additional_rules_block": f"ADDITIONAL CONTEXT/RULES:\n{additional_rules}\n" if additional_rules else "",
+            "parent_tables_context": parent_tables_context,
+        }
+        return "".join(slots[part] if i % 2 else part for i, part in enumerate(skeleton))
+
+    def _create_batch_prompt(self, tables_spec: list) -> str:
+        """Build one prompt asking for several independent tables at once.
+
+        `tables_spec` items carry `table_name` plus the generate_data() keyword
+        arguments (schema_fields, num_records, correct_num_records,
+        wrong_num_records, additional_rules). The shared instructions are sent
+        once; only the per-table sections vary.
+        """
+        table_sections = []
+        for spec in tables_spec:
+            field_names, field_details = _field_details(spec["schema_fields"])
+            section = (
+                f"=== TABLE: {spec['table_name']} ===\n"
+                f"{chr(10).join(field_details)}\n"
+                f"Records: EXACTLY {spec['num_records']} — first {spec['correct_num_records']} VALID (is_valid = true), "
+                f"next {spec['wrong_num_records']} INVALID (is_valid = false)\n"
+                f"Fields per record: {', '.join(field_names)}, is_valid"
+            )
+            if spec.get("additional_rules"):
+                section += f"\nADDITIONAL CONTEXT/RULES:\n{spec['additional_rules']}"
+            table_sections.append(section)
+
+        table_names = [spec["table_name"] for spec in tables_spec]
+        example = ', '.join(f'"{name}": [ {{ ... , "is_valid": true }} ]' for name in table_names)
+
+        return f"""You are an expert test data generator and validator. Generate UNIQUE, DIVERSE, and REALISTIC test data for each of the {len(tables_spec)} tables below.
+
+{(chr(10) * 2).join(table_sections)}
+
+=== CRITICAL INSTRUCTIONS (apply to every table) ===
+- Every record must have COMPLETELY UNIQUE, realistic values — no value repeats within a table.
+- Each record includes ALL of its table's fields plus "is_valid" (boolean); no missing or extra fields.
+- VALID records must perfectly follow the schema rules, types, formats and ranges.
+- INVALID records must each CLEARLY break at least ONE rule (wrong type, length, format, missing value, nonsensical value), each for a different reason.
+- Keep valid records first, then invalid records, in the exact counts given.
+
+=== OUTPUT REQUIREMENTS ===
+- Return ONE JSON object keyed by table name, each value a JSON array of that table's records.
+- No markdown, no code fences, no comments, no trailing commas, no text before or after the object.
+- Example structure: {{ {example} }}
+
+Return an object keyed by table name: {', '.join(table_names)}"""
+
+    def _parse_batch_response(self, response: str, tables_spec: list) -> dict:
+        """Parse a batched response into {table_name: {"data": [...], "count": N}}.
+
+        Raises if the object is missing or any requested table is absent.
+        """
+        assembled = _assemble_ndjson(response)
+        source = assembled if assembled else (response or '')
+
+        json_str = extract_first_json_object(source)
+        if not json_str:
+            raise ValueError("No JSON object found in batched LLM response")
+        parsed = _loads(_clean_json_response(json_str))
+        if not isinstance(parsed, dict):
+            raise ValueError("Batched LLM response is not a JSON object")
+
+        results = {}
+        for spec in tables_spec:
+            rows = parsed.get(spec["table_name"])
+            if not isinstance(rows, list):
+                raise ValueError(f"Table '{spec['table_name']}' missing from batched LLM response")
+            rows = [row for row in rows if isinstance(row, dict)][:spec["num_records"]]
+            results[spec["table_name"]] = {"data": rows, "count": len(rows)}
+        return results
+
+    def _parse_generated_response(self, response: str, num_records: int) -> dict:
+        """Extract, clean and parse the JSON records from a raw LLM response."""
+        # Extract JSON from response
+        # First, try to parse the response as NDJSON (Ollama streams many JSON objects).
+        assembled = _assemble_ndjson(response)
+
+        # If we assembled something from NDJSON, prefer that; otherwise use raw response
+        source_for_extraction = assembled if assembled else (response or '')
+
+        # Try to extract the first JSON array from the assembled source
+        json_str = extract_first_json_array(source_for_extraction)
+        if not json_str:
+            # Try to fix incomplete (truncated) response
+            json_str = (response or '').strip()
+            if json_str.startswith('[') and not json_str.endswith(']'):
+                json_str += '\n]'
+            json_str = re.sub(r',(\s*\])', r'\1', json_str)
         
-        # Fix escaped single quotes - JSON doesn't require escaping single quotes
-        # LLMs sometimes generate \' which is invalid in JSON
-        response = response.replace("\\'", "'")
+        # Clean JSON
+        json_str = _clean_json_response(json_str)
+
+        logger.debug("--- CLEANED JSON ---\n%s\n--- END CLEANED JSON ---", json_str)
+
+        # Parse JSON (try a second repair pass if initial parse fails)
+        try:
+            generated_data = _loads(json_str)
+        except json.JSONDecodeError as jde:
+            # Include raw LLM response snippet in the error to aid debugging
+            raw_snippet = (response or '')[:1000]
+            raise json.JSONDecodeError(
+                f"{str(jde)} -- raw LLM response snippet: {raw_snippet}",
+                jde.doc,
+                jde.pos,
+            )
+            # Attempt additional, aggressive fixes for common LLM formatting issues
+            repaired = json_str
+            # Replace single quotes with double quotes when safe (only for simple cases)
+            # but avoid changing common apostrophes by limiting to patterns of keys
+            repaired = re.sub(r"(?<=[{,\s])'([^']+?)'\s*:\s*", r'"\1": ', repaired)
+            # Ensure true/false/null are lowercase JSON literals (some LLMs use True/False/None)
+            repaired = re.sub(r"\bTrue\b", 'true', repaired)
+            repaired = re.sub(r"\bFalse\b", 'false', repaired)
+            repaired = re.sub(r"\bNone\b", 'null', repaired)
+            # Remove any remaining lone 'null' tokens
+            repaired = re.sub(r',\s*null\s*,', ',', repaired)
+            repaired = re.sub(r',\s*null\s*}', '}', repaired)
+            repaired = re.sub(r'{\s*null\s*,', '{', repaired)
+            repaired = re.sub(r',\s*,+', ',', repaired)
+
+            logger.debug("--- REPAIRED JSON ATTEMPT ---\n%s\n--- END REPAIRED JSON ATTEMPT ---", repaired)
+
+            # Try parsing repaired JSON
+            generated_data = _loads(repaired)
+
+        # Ensure it's a list
+        if not isinstance(generated_data, list):
+            generated_data = [generated_data]
+        # Only objects are records; drop null/scalar entries the model left in
+        generated_data = [row for row in generated_data if isinstance(row, dict)]
         
-        # Remove lone 'null' tokens that appear as standalone entries inside objects
-        # e.g. { "a": 1, null, "b": 2 } -> { "a": 1, "b": 2 }
-        response = re.sub(r',\s*null\s*,', ',', response)
-        response = re.sub(r',\s*null\s*}', '}', response)
-        response = re.sub(r'{\s*null\s*,', '{', response)
+        return {
+            "data": generated_data[:num_records],
+            "count": len(generated_data[:num_records])
+        }
 
-        # Collapse accidental multiple commas introduced by fixes
-        response = re.sub(r',\s*,+', ',', response)
+    def _call_llm(self, prompt: str) -> str:
+        return _invoke_json(self.llm, prompt, '[', ']')
 
-        return response
+    def _prompt_cache_key(self, prompt: str) -> str:
+        """Content hash of the prompt plus model settings (switching models invalidates)."""
+        h = hashlib.blake2b(digest_size=16)
+        for part in (self.provider, getattr(self.llm, "model", ""), getattr(self.llm, "temperature", ""), prompt):
+            h.update(str(part).encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    async def _acall_llm(self, prompt: str) -> str:
+        return await _ainvoke_json(self.llm, prompt, '[', ']')
 
     def generate_data(
         self, 
@@ -230,8 +726,33 @@ class TestDataGenerator:
         parent_tables_data: dict = None
     ) -> dict:
         try:
-            # Create prompt
-            prompt = self._create_prompt(
+            prompt, cache_key, cached = self._prepare_generation(
+                schema_fields, 
+                num_records, 
+                correct_num_records, 
+                wrong_num_records, 
+                additional_rules, 
+                parent_tables_data
+            )
+            if cached is not None:
+                return cached
+            # Generate data using Ollama (may raise OllamaError for connection/empty responses)
+            return self._finish_generation(self._call_llm(prompt), num_records, cache_key)
+        except Exception as e:
+            raise self._generation_error(e)
+
+    async def agenerate_data(
+        self, 
+        schema_fields: list, 
+        num_records: int = 5, 
+        correct_num_records: int = 5, 
+        wrong_num_records: int = 0, 
+        additional_rules: str = None, 
+        parent_tables_data: dict = None
+    ) -> dict:
+        """Async variant of generate_data(); awaits the LLM via ainvoke()."""
+        try:
+            prompt, cache_key, cached = self._prepare_generation(
                 schema_fields, 
                 num_records, 
                 correct_num_records, 
@@ -239,148 +760,88 @@ class TestDataGenerator:
                 additional_rules, 
                 parent_tables_data
             )
+            if cached is not None:
+                return cached
+            return self._finish_generation(await self._acall_llm(prompt), num_records, cache_key)
+        except Exception as e:
+            raise self._generation_error(e)
+
+    def _prepare_generation(self, *prompt_args) -> tuple:
+        """Build the prompt for _create_prompt(*prompt_args) and look it up in
+        the prompt cache. Returns (prompt, cache_key, cached result or None)."""
+        prompt = self._create_prompt(*prompt_args)
+
+        logger.debug("--- PROMPT SENT TO LLM ---\n%s\n--- END PROMPT ---", prompt)
+
+        cache_key = None
+        if self.use_cache:
+            cache_key = self._prompt_cache_key(prompt)
+            cached = _prompt_cache_get(cache_key)
+            if cached is not None:
+                return prompt, cache_key, cached
+        return prompt, cache_key, None
+
+    def _finish_generation(self, response: str, num_records: int, cache_key) -> dict:
+        """Parse the LLM response and store the result under `cache_key` (if any)."""
+        logger.debug("--- LLM RESPONSE ---\n%s\n--- END RESPONSE ---", response)
+
+        result = self._parse_generated_response(response, num_records)
+        if cache_key is not None:
+            _prompt_cache_put(cache_key, result)
+        return result
+
+    @staticmethod
+    def _generation_error(e: Exception) -> Exception:
+        """The exception generate_data()/agenerate_data() raise for `e`."""
+        if isinstance(e, json.JSONDecodeError):
+            return Exception(f"Failed to parse JSON. LLM response format issue: {str(e)}")
+        if isinstance(e, OllamaError):
+            return Exception(f"Error generating data: LLM connection/error: {e}")
+        return Exception(f"Error generating data: {str(e)}")
+
+    @staticmethod
+    def _spec_kwargs(spec: dict) -> dict:
+        return {k: v for k, v in spec.items() if k != "table_name"}
+
+    def generate_many(self, tables_spec: list) -> dict:
+        """
+        Generate several independent tables with a single LLM request.
+
+        Returns {table_name: {"data": [...], "count": N}}. If the batched
+        response can't be parsed, falls back to one generate_data() call per table.
+        """
+        if len(tables_spec) == 1:
+            spec = tables_spec[0]
+            return {spec["table_name"]: self.generate_data(**self._spec_kwargs(spec))}
+
+        prompt = self._create_batch_prompt(tables_spec)
+        try:
+            return self._parse_batch_response(_invoke_json(self.llm, prompt), tables_spec)
+        except Exception as e:
+            logger.warning("Batched generation failed (%s); falling back to per-table requests", e)
 
-            print(f"\n--- PROMPT SENT TO LLM ---")
-            _safe_print(prompt)
-            print(f"--- END PROMPT ---\n")
+        return {
+            spec["table_name"]: self.generate_data(**self._spec_kwargs(spec))
+            for spec in tables_spec
+        }
 
-            # Generate data using Ollama (may raise OllamaError for connection/empty responses)
-            try:
-                response = self.llm.invoke(prompt)
-                print(f"LLM invocation successful.")
-                print(response)
-            except OllamaError as e:
-                raise Exception(f"LLM connection/error: {e}")
-
-            print(f"\n--- LLM RESPONSE ---")
-            # _safe_print(response)
-            print(f"--- END RESPONSE ---\n")
-
-            # Extract JSON from response
-            # First, try to parse the response as NDJSON (Ollama streams many JSON objects).
-            # If NDJSON, extract each object's `response` field and concatenate them in order.
-            assembled = ''
-            try:
-                for line in (response or '').splitlines():
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        obj = json.loads(line)
-                        if isinstance(obj, dict) and 'response' in obj:
-                            assembled += obj['response']
-                        else:
-                            # Not the expected NDJSON object; ignore
-                            continue
-                    except Exception:
-                        # Not a JSON line; ignore and continue
-                        continue
-            except Exception:
-                assembled = ''
-
-            # If we assembled something from NDJSON, prefer that; otherwise use raw response
-            source_for_extraction = assembled if assembled else (response or '')
-
-            def _extract_first_json_array(text: str) -> str | None:
-                """Find the first balanced JSON array in `text` and return it, or None.
-
-                This scanner handles quoted strings and escapes so it doesn't stop
-                on brackets that appear inside strings.
-                """
-                if not text:
-                    return None
-                start = text.find('[')
-                if start == -1:
-                    return None
-                i = start
-                depth = 0
-                in_str = False
-                escape = False
-                while i < len(text):
-                    ch = text[i]
-                    if in_str:
-                        if escape:
-                            escape = False
-                        elif ch == '\\':
-                            escape = True
-                        elif ch == '"':
-                            in_str = False
-                    else:
-                        if ch == '"':
-                            in_str = True
-                        elif ch == '[':
-                            depth += 1
-                        elif ch == ']':
-                            depth -= 1
-                            if depth == 0:
-                                return text[start:i+1]
-                    i += 1
-                return None
-
-            # Try to extract the first JSON array from the assembled source
-            json_str = _extract_first_json_array(source_for_extraction)
-            if not json_str:
-                # Fallback: existing heuristics on the raw response
-                json_match = re.search(r'\[.*\]', response, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0)
-                else:
-                    # Try to fix incomplete response
-                    json_str = (response or '').strip()
-                    if json_str.startswith('[') and not json_str.endswith(']'):
-                        json_str += '\n]'
-                    json_str = re.sub(r',(\s*\])', r'\1', json_str)
-            
-            # Clean JSON
-            json_str = self._clean_json_response(json_str)
-
-            print(f"\n--- CLEANED JSON ---")
-            # _safe_print(json_str)
-            print(f"--- END CLEANED JSON ---\n")
-
-            # Parse JSON (try a second repair pass if initial parse fails)
-            try:
-                generated_data = json.loads(json_str)
-            except json.JSONDecodeError as jde:
-                # Include raw LLM response snippet in the error to aid debugging
-                raw_snippet = (response or '')[:1000]
-                raise json.JSONDecodeError(
-                    f"{str(jde)} -- raw LLM response snippet: {raw_snippet}",
-                    jde.doc,
-                    jde.pos,
-                )
-                # Attempt additional, aggressive fixes for common LLM formatting issues
-                repaired = json_str
-                # Replace single quotes with double quotes when safe (only for simple cases)
-                # but avoid changing common apostrophes by limiting to patterns of keys
-                repaired = re.sub(r"(?<=[{,\s])'([^']+?)'\s*:\s*", r'"\1": ', repaired)
-                # Ensure true/false/null are lowercase JSON literals (some LLMs use True/False/None)
-                repaired = re.sub(r"\bTrue\b", 'true', repaired)
-                repaired = re.sub(r"\bFalse\b", 'false', repaired)
-                repaired = re.sub(r"\bNone\b", 'null', repaired)
-                # Remove any remaining lone 'null' tokens
-                repaired = re.sub(r',\s*null\s*,', ',', repaired)
-                repaired = re.sub(r',\s*null\s*}', '}', repaired)
-                repaired = re.sub(r'{\s*null\s*,', '{', repaired)
-                repaired = re.sub(r',\s*,+', ',', repaired)
-
-                print("\n--- REPAIRED JSON ATTEMPT ---")
-                # _safe_print(repaired)
-                print("--- END REPAIRED JSON ATTEMPT ---\n")
-
-                # Try parsing repaired JSON
-                generated_data = json.loads(repaired)
-
-            # Ensure it's a list
-            if not isinstance(generated_data, list):
-                generated_data = [generated_data]
-            
-            return {
-                "data": generated_data[:num_records],
-                "count": len(generated_data[:num_records])
-            }
-            
-        except json.JSONDecodeError as e:
-            raise Exception(f"Failed to parse JSON. LLM response format issue: {str(e)}")
+    async def agenerate_many(self, tables_spec: list, semaphore: asyncio.Semaphore = None) -> dict:
+        """Async variant of generate_many(); the per-table fallback runs concurrently.
+
+        With `semaphore`, the batched request and each fallback request hold
+        one slot of it, so the fallback stays within the caller's cap.
+        """
+        if len(tables_spec) == 1:
+            spec = tables_spec[0]
+            return {spec["table_name"]: await _bounded(semaphore, self.agenerate_data(**self._spec_kwargs(spec)))}
+
+        prompt = self._create_batch_prompt(tables_spec)
+        try:
+            return self._parse_batch_response(await _bounded(semaphore, _ainvoke_json(self.llm, prompt)), tables_spec)
         except Exception as e:
-            raise Exception(f"Error generating data: {str(e)}")
\ No newline at end of file
+            logger.warning("Batched generation failed (%s); falling back to per-table requests", e)
+
+        results = await asyncio.gather(
+            *(_bounded(semaphore, self.agenerate_data(**self._spec_kwargs(spec))) for spec in tables_spec)
+        )
+        return {spec["table_name"]: result for spec, result in zip(tables_spec, results)}
@@ -1,8 +1,32 @@
+import os
 import json
 import random
-from typing import Dict, List, Any
+import asyncio
+from collections import deque
+from typing import Dict, List, Any, Optional
 from data_generator import TestDataGenerator
 
+try:
+    from faker import Faker
+except Exception:
+    Faker = None
+
+
+# Max concurrent table generations per tier; match Ollama's OLLAMA_NUM_PARALLEL
+# so extra requests don't just queue server-side.
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+# Tables whose columns are all keys are always built locally (there is
+# nothing for the LLM to write). Tables with at most this many records whose
+# only non-key fields (at most _LOCAL_SYNTH_MAX_FIELDS) carry an `example` and
+# no `rules` are also synthesized from those examples. Off by default: without
+# faker the values are the example plus a counter.
+LOCAL_SYNTH_MAX_RECORDS = int(os.getenv("LOCAL_SYNTH_MAX_RECORDS", "0"))
+_LOCAL_SYNTH_MAX_FIELDS = 2
+_NUMERIC_TYPES = ("integer", "int", "number")
+# Free-text types where "<example> <n>" is still a valid value
+_LOCAL_TEXT_TYPES = ("string", "str", "text", "varchar", "name")
+
 
 class DatabaseTestDataGenerator:
 
@@ -19,48 +43,59 @@ class DatabaseTestDataGenerator:
     # Helper Methods
     # ------------------------------------------------------------------------
 
-    def _topo_sort_tables(self, tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Topologically sort tables by FK dependencies (parents before children)."""
+    def _topo_sort_tiers(self, tables: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Group tables into dependency tiers with Kahn's algorithm (parents first).
+        
+        Every table in a tier only references tables from earlier tiers, so a
+        tier's tables can be generated in parallel. Within a tier the input
+        order is kept.
+        """
         name_to_table = {t["table_name"]: t for t in tables}
-        visited = {}
-        order = []
+        indeg = {name: 0 for name in name_to_table}
+        children = {name: [] for name in name_to_table}
         
-        def visit(tname):
-            if visited.get(tname) == 1:
-                return  # Already processed
-            
-            if visited.get(tname) == -1:
-                raise Exception(f"Circular dependency detected for table: {tname}")
-            
-            visited[tname] = -1  # Mark as being processed
-            table = name_to_table.get(tname)
-            
-            if not table:
-                visited[tname] = 1
-                return
-                
-            # Visit all parent tables first
+        for table in tables:
+            tname = table["table_name"]
+            parents = set()
             for field in table.get("fields", []):
                 ref = field.get("references")
                 if ref:
                     parent_table = ref.get("table")
-                    if parent_table and parent_table != tname:
-                        visit(parent_table)
-            
-            visited[tname] = 1
-            order.append(table)
+                    # Ignore self-references and references to unknown tables
+                    if parent_table and parent_table != tname and parent_table in name_to_table:
+                        parents.add(parent_table)
+            indeg[tname] = len(parents)
+            for parent_table in parents:
+                children[parent_table].append(tname)
         
-        # Process all tables
-        for table in tables:
-            if visited.get(table["table_name"]) != 1:
-                visit(table["table_name"])
+        ready = deque(name for name in name_to_table if indeg[name] == 0)
+        tiers = []
+        placed = 0
+        while ready:
+            tier = [name_to_table[name] for name in ready]
+            ready = deque()
+            for table in tier:
+                for child in children[table["table_name"]]:
+                    indeg[child] -= 1
+                    if indeg[child] == 0:
+                        ready.append(child)
+            tiers.append(tier)
+            placed += len(tier)
         
-        return order
+        if placed != len(name_to_table):
+            stuck = [name for name, d in indeg.items() if d > 0]
+            raise Exception(f"Circular dependency detected for tables: {', '.join(stuck)}")
+        
+        return tiers
+
+    def _topo_sort_tables(self, tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Topologically sort tables by FK dependencies (parents before children)."""
+        return [table for tier in self._topo_sort_tiers(tables) for table in tier]
 
     def _generate_primary_keys(self, rows: List[Dict], pk_field: str, start_id: int = 1):
         """Generate sequential primary key values."""
-        for i, row in enumerate(rows):
-            row[pk_field] = start_id + i
+        for pk_value, row in enumerate(rows, start_id):
+            row[pk_field] = pk_value
 
     def _inject_foreign_keys(
         self, 
@@ -70,6 +105,8 @@ class DatabaseTestDataGenerator:
         correct_count: int
     ):
         """Inject foreign key values from parent tables."""
+        # Several FKs may point at the same parent key; collect its values once
+        parent_keys_cache = {}
         for fk_field in fk_fields:
             fk_name = fk_field["name"]
             ref = fk_field.get("references")
@@ -87,50 +124,146 @@ class DatabaseTestDataGenerator:
                 continue
             
             # Collect parent key values
-            parent_keys = [p[parent_field_name] for p in parent_rows if parent_field_name in p]
+            parent_keys = parent_keys_cache.get((parent_table_name, parent_field_name))
+            if parent_keys is None:
+                parent_keys = [p[parent_field_name] for p in parent_rows if parent_field_name in p]
+                parent_keys_cache[(parent_table_name, parent_field_name)] = parent_keys
             
             if not parent_keys:
                 print(f"   ⚠️  Warning: No valid keys in '{parent_table_name}.{parent_field_name}'")
                 continue
             
-            # Inject valid FK values for correct records
-            for i in range(min(len(rows), correct_count)):
-                rows[i][fk_name] = random.choice(parent_keys)
+            # Inject valid FK values for correct records (one batched draw per FK)
+            valid_count = min(len(rows), correct_count)
+            picks = random.choices(parent_keys, k=valid_count)
+            for row, key in zip(rows, picks):
+                row[fk_name] = key
             
             # Inject invalid FK values for incorrect records
-            for i in range(correct_count, len(rows)):
-                if fk_field.get("type") in ["integer", "int", "number"]:
-                    rows[i][fk_name] = 999999 + i
-                else:
-                    rows[i][fk_name] = f"INVALID_FK_{parent_table_name.upper()}_{i}"
+            if fk_field.get("type") in ("integer", "int", "number"):
+                invalid_values = range(999999 + correct_count, 999999 + len(rows))
+            else:
+                invalid_prefix = f"INVALID_FK_{parent_table_name.upper()}_"
+                invalid_values = [f"{invalid_prefix}{i}" for i in range(correct_count, len(rows))]
+            for row, value in zip(rows[correct_count:], invalid_values):
+                row[fk_name] = value
 
     def _identify_primary_key(self, fields: List[Dict]) -> str:
         """Identify which field is the primary key."""
+        # First field named 'id' or flagged as primary key wins. (An 'id' field
+        # always returns inside the loop, so no second scan is needed.)
         for field in fields:
-            if field.get("name") == "id":
-                return "id"
-            if field.get("primary_key") or field.get("is_primary_key"):
-                return field.get("name")
-        
-        # Default to 'id' if exists
-        field_names = [f.get("name") for f in fields]
-        if "id" in field_names:
-            return "id"
+            name = field.get("name")
+            if name == "id" or field.get("primary_key") or field.get("is_primary_key"):
+                return name
         
         return None
 
     # ------------------------------------------------------------------------
-    # Main Generation Method
+    # Local Synthesis (trivial tables)
     # ------------------------------------------------------------------------
 
-    def generate_database(self, db_schema: Dict[str, Any]) -> Dict[str, Any]:
+    def _can_synthesize_locally(self, fields: List[Dict], num_records: int) -> bool:
+        """True for key-only tables, and for tiny tables whose non-FK fields have
+        no rules and can all be derived from their example by _synthesize_value()."""
+        data_fields = [f for f in fields if not f.get("references")]
+        if not data_fields:
+            return True
+        if num_records > LOCAL_SYNTH_MAX_RECORDS:
+            return False
+        if len(data_fields) > _LOCAL_SYNTH_MAX_FIELDS:
+            return False
+        return all(not f.get("rules") and self._can_synthesize_field(f) for f in data_fields)
+
+    @staticmethod
+    def _can_synthesize_field(field: Dict) -> bool:
+        """True if _synthesize_value() yields valid values for `field`.
+
+        Other types (dates, booleans, decimals, ...) go to the LLM: suffixing
+        their example with a counter would make the value invalid.
         """
-        Generate database test data with explicit PK/FK definitions.
-        
-        Schema must include:
-        - fields[].references for foreign keys
-        - Primary key field (usually 'id')
+        example = field.get("example")
+        if example in (None, ""):
+            return False
+        field_type = str(field.get("type", "string")).lower()
+        if field_type in _NUMERIC_TYPES:
+            try:
+                int(str(example))
+            except ValueError:
+                return False
+            return True
+        if field_type == "email":
+            return Faker is not None or "@" in str(example)
+        return field_type in _LOCAL_TEXT_TYPES
+
+    @staticmethod
+    def _synthesize_value(field: Dict, n: int, fake) -> Any:
+        """n-th unique valid value for `field`, derived from its example.
+
+        Only called for fields accepted by _can_synthesize_field().
+        """
+        field_type = str(field.get("type", "string")).lower()
+        example = field["example"]
+        if field_type in _NUMERIC_TYPES:
+            return int(str(example)) + n
+        if field_type == "email":
+            if fake is not None:
+                return fake.unique.email()
+            local, at, domain = str(example).partition("@")
+            if at:
+                return f"{local}{n}@{domain}"
+        if field_type == "name" and fake is not None:
+            return fake.unique.name()
+        return f"{example} {n}"
+
+    @staticmethod
+    def _invalid_value(field: Dict) -> Any:
+        """A value that obviously breaks `field`'s type."""
+        field_type = str(field.get("type", "string")).lower()
+        if field_type in _NUMERIC_TYPES:
+            return "not_a_number"
+        if field_type == "email":
+            return "invalid-email"
+        # An empty string is still a valid text value; a missing one is not
+        return None
+
+    def _synthesize_locally(self, fields: List[Dict], num_records: int, correct_count: int) -> Dict[str, Any]:
+        """Build rows for a trivial table without the LLM.
+
+        Values come from each field's example (Faker for email/name types when
+        installed). FK fields are left as None for _inject_foreign_keys, and each
+        invalid row breaks one data field, rotating through them.
         """
+        data_fields = [f for f in fields if not f.get("references")]
+        fk_names = [f["name"] for f in fields if f.get("references")]
+        fake = None
+        if Faker is not None and any(str(f.get("type", "")).lower() in ("email", "name") for f in data_fields):
+            fake = Faker()
+        
+        rows = []
+        for i in range(num_records):
+            row = {f["name"]: self._synthesize_value(f, i + 1, fake) for f in data_fields}
+            for fk_name in fk_names:
+                row[fk_name] = None
+            is_valid = i < correct_count
+            if not is_valid and data_fields:
+                broken = data_fields[(i - correct_count) % len(data_fields)]
+                row[broken["name"]] = self._invalid_value(broken)
+            row["is_valid"] = is_valid
+            rows.append(row)
+        return {"data": rows, "count": len(rows)}
+
+    def _synthesize_plan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs = plan["generate_kwargs"]
+        print(f"   ⚡ Trivial schema for '{plan['table_name']}': synthesized locally (no LLM call)")
+        return self._synthesize_locally(kwargs["schema_fields"], kwargs["num_records"], kwargs["correct_num_records"])
+
+    # ------------------------------------------------------------------------
+    # Main Generation Method
+    # ------------------------------------------------------------------------
+
+    def _start_generation(self, db_schema: Dict[str, Any]):
+        """Validate the schema, print the header and return (tiers, result)."""
         tables = db_schema.get("tables", [])
         
         if not tables:
@@ -144,8 +277,8 @@ class DatabaseTestDataGenerator:
         
         # Sort tables by dependencies
         try:
-            ordered_tables = self._topo_sort_tables(tables)
-            table_order = [t['table_name'] for t in ordered_tables]
+            tiers = self._topo_sort_tiers(tables)
+            table_order = [t['table_name'] for tier in tiers for t in tier]
             print(f"Generation order: {' → '.join(table_order)}\n")
         except Exception as e:
             raise Exception(f"Failed to sort tables: {str(e)}")
@@ -156,74 +289,90 @@ class DatabaseTestDataGenerator:
             "counts": {},
             "generation_order": []
         }
+        return tiers, result
+
+    def _prepare_table(self, table: Dict[str, Any], idx: int, total: int) -> Optional[Dict[str, Any]]:
+        """Work out record counts and PK/FK fields for one table (None = skip it)."""
+        table_name = table["table_name"]
+        num_records = table.get("num_records", 5)
+        correct_count = table.get("correct_num_records", num_records)
+        wrong_count = table.get("wrong_num_records", max(0, num_records - correct_count))
         
-        generated_tables = {}
+        print(f"[{idx}/{total}] Generating: {table_name}")
+        print(f"   Records: {num_records} (valid: {correct_count}, invalid: {wrong_count})")
         
-        # Generate each table in dependency order
-        for idx, table in enumerate(ordered_tables, 1):
-            table_name = table["table_name"]
-            num_records = table.get("num_records", 5)
-            correct_count = table.get("correct_num_records", num_records)
-            wrong_count = table.get("wrong_num_records", max(0, num_records - correct_count))
-            
-            print(f"[{idx}/{len(ordered_tables)}] Generating: {table_name}")
-            print(f"   Records: {num_records} (valid: {correct_count}, invalid: {wrong_count})")
-            
-            schema_fields = table.get("fields", [])
-            
-            if not schema_fields:
-                print(f"   ⚠️  Warning: No fields defined. Skipping.\n")
-                continue
-            
-            # Identify FK and PK fields
-            fk_fields = [f for f in schema_fields if f.get("references")]
-            pk_field = self._identify_primary_key(schema_fields)
-            
-            # Remove PK from LLM generation (we'll generate it)
-            fields_for_llm = [
-                f for f in schema_fields 
-                if f.get("name") != pk_field
-            ] if pk_field else schema_fields
-            
-            try:
-                # Generate data
-                gen_result = self.table_generator.generate_data(
-                    schema_fields=fields_for_llm,
-                    num_records=num_records,
-                    correct_num_records=correct_count,
-                    wrong_num_records=wrong_count,
-                    additional_rules=table.get("additional_rules")
-                )
-                
-                rows = gen_result["data"]
-                
-                # Generate PKs
-                if pk_field:
-                    self._generate_primary_keys(rows, pk_field)
-                    print(f"   ✓ Generated primary keys: {pk_field}")
-                
-                # Inject FKs
-                if fk_fields:
-                    self._inject_foreign_keys(rows, fk_fields, generated_tables, correct_count)
-                    fk_names = [f["name"] for f in fk_fields]
-                    print(f"   ✓ Injected foreign keys: {', '.join(fk_names)}")
-                
-                # Store results
-                generated_tables[table_name] = rows
-                result["tables"][table_name] = rows
-                result["counts"][table_name] = {
-                    "total": len(rows),
-                    "valid": correct_count,
-                    "invalid": wrong_count
-                }
-                result["generation_order"].append(table_name)
-                
-                print(f"   ✅ Completed: {len(rows)} records\n")
-                
-            except Exception as e:
-                print(f"   ❌ Error: {str(e)}\n")
-                raise Exception(f"Failed to generate '{table_name}': {str(e)}")
+        schema_fields = table.get("fields", [])
+        
+        if not schema_fields:
+            print(f"   ⚠️  Warning: No fields defined. Skipping.\n")
+            return None
+        
+        # Identify FK and PK fields
+        fk_fields = [f for f in schema_fields if f.get("references")]
+        pk_field = self._identify_primary_key(schema_fields)
+        
+        # Remove PK from LLM generation (we'll generate it)
+        fields_for_llm = [
+            f for f in schema_fields 
+            if f.get("name") != pk_field
+        ] if pk_field else schema_fields
+        
+        return {
+            "table_name": table_name,
+            "num_records": num_records,
+            "correct_count": correct_count,
+            "wrong_count": wrong_count,
+            "fk_fields": fk_fields,
+            "pk_field": pk_field,
+            "local": self._can_synthesize_locally(fields_for_llm, num_records),
+            "generate_kwargs": {
+                "schema_fields": fields_for_llm,
+                "num_records": num_records,
+                "correct_num_records": correct_count,
+                "wrong_num_records": wrong_count,
+                "additional_rules": table.get("additional_rules")
+            }
+        }
+
+    def _finish_table(
+        self,
+        plan: Dict[str, Any],
+        gen_result: Dict[str, Any],
+        generated_tables: Dict[str, List[Dict]],
+        result: Dict[str, Any]
+    ):
+        """Assign PKs, inject FKs and record the generated rows for one table."""
+        table_name = plan["table_name"]
+        pk_field = plan["pk_field"]
+        fk_fields = plan["fk_fields"]
+        correct_count = plan["correct_count"]
         
+        rows = gen_result["data"]
+        
+        # Generate PKs
+        if pk_field:
+            self._generate_primary_keys(rows, pk_field)
+            print(f"   ✓ Generated primary keys: {pk_field}")
+        
+        # Inject FKs
+        if fk_fields:
+            self._inject_foreign_keys(rows, fk_fields, generated_tables, correct_count)
+            fk_names = [f["name"] for f in fk_fields]
+            print(f"   ✓ Injected foreign keys: {', '.join(fk_names)}")
+        
+        # Store results
+        generated_tables[table_name] = rows
+        result["tables"][table_name] = rows
+        result["counts"][table_name] = {
+            "total": len(rows),
+            "valid": correct_count,
+            "invalid": plan["wrong_count"]
+        }
+        result["generation_order"].append(table_name)
+        
+        print(f"   ✅ Completed: {len(rows)} records\n")
+
+    def _finish_generation(self, result: Dict[str, Any], generated_tables: Dict[str, List[Dict]]) -> Dict[str, Any]:
         # Calculate totals
         result["total_records"] = sum(len(rows) for rows in generated_tables.values())
         result["total_tables"] = len(generated_tables)
@@ -235,6 +384,106 @@ class DatabaseTestDataGenerator:
         
         return result
 
+    def generate_database(self, db_schema: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate database test data with explicit PK/FK definitions.
+        
+        Schema must include:
+        - fields[].references for foreign keys
+        - Primary key field (usually 'id')
+        """
+        tiers, result = self._start_generation(db_schema)
+        ordered_tables = [t for tier in tiers for t in tier]
+        generated_tables = {}
+        
+        # Generate each table in dependency order
+        for idx, table in enumerate(ordered_tables, 1):
+            plan = self._prepare_table(table, idx, len(ordered_tables))
+            if plan is None:
+                continue
+            
+            try:
+                if plan["local"]:
+                    gen_result = self._synthesize_plan(plan)
+                else:
+                    gen_result = self.table_generator.generate_data(**plan["generate_kwargs"])
+                self._finish_table(plan, gen_result, generated_tables, result)
+            except Exception as e:
+                print(f"   ❌ Error: {str(e)}\n")
+                raise Exception(f"Failed to generate '{plan['table_name']}': {str(e)}")
+        
+        return self._finish_generation(result, generated_tables)
+
+    async def _agenerate_table(self, plan: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        if plan["local"]:
+            return self._synthesize_plan(plan)
+        async with semaphore:
+            try:
+                return await self.table_generator.agenerate_data(**plan["generate_kwargs"])
+            except Exception as e:
+                print(f"   ❌ Error: {str(e)}\n")
+                raise Exception(f"Failed to generate '{plan['table_name']}': {str(e)}")
+
+    async def _agenerate_tier_batched(self, plans: List[Dict[str, Any]], semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        tables_spec = [
+            {"table_name": plan["table_name"], **plan["generate_kwargs"]}
+            for plan in plans
+        ]
+        # agenerate_many takes a slot per request, including its per-table fallback
+        try:
+            batch = await self.table_generator.agenerate_many(tables_spec, semaphore)
+        except Exception as e:
+            names = ', '.join(plan["table_name"] for plan in plans)
+            print(f"   ❌ Error: {str(e)}\n")
+            raise Exception(f"Failed to generate '{names}': {str(e)}")
+        return [batch[plan["table_name"]] for plan in plans]
+
+    async def agenerate_database(self, db_schema: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async variant of generate_database().
+        
+        Tables in the same dependency tier only need rows from earlier tiers, so
+        their LLM calls run concurrently (at most OLLAMA_NUM_PARALLEL at a time).
+        PK/FK injection still happens tier by tier, in topological order.
+        
+        Set `batch_tables: true` in db_schema to request each tier's tables in a
+        single LLM call instead (falls back to per-table calls on parse failure).
+        """
+        tiers, result = self._start_generation(db_schema)
+        total = sum(len(tier) for tier in tiers)
+        generated_tables = {}
+        semaphore = asyncio.Semaphore(max(1, OLLAMA_NUM_PARALLEL))
+        batch_tables = db_schema.get("batch_tables", False)
+        
+        idx = 0
+        for tier in tiers:
+            plans = []
+            for table in tier:
+                idx += 1
+                plan = self._prepare_table(table, idx, total)
+                if plan is not None:
+                    plans.append(plan)
+            
+            llm_plans = [plan for plan in plans if not plan["local"]]
+            if batch_tables and len(llm_plans) > 1:
+                llm_results = iter(await self._agenerate_tier_batched(llm_plans, semaphore))
+                gen_results = [
+                    self._synthesize_plan(plan) if plan["local"] else next(llm_results)
+                    for plan in plans
+                ]
+            else:
+                gen_results = await asyncio.gather(
+                    *(self._agenerate_table(plan, semaphore) for plan in plans)
+                )
+            for plan, gen_result in zip(plans, gen_results):
+                try:
+                    self._finish_table(plan, gen_result, generated_tables, result)
+                except Exception as e:
+                    print(f"   ❌ Error: {str(e)}\n")
+                    raise Exception(f"Failed to generate '{plan['table_name']}': {str(e)}")
+        
+        return self._finish_generation(result, generated_tables)
+
 
 # ============================================================================
 # EXAMPLE USAGE (for testing)
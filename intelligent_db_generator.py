@@ -19,13 +19,162 @@ Phase 7: Validation → Verify referential integrity
 
 """
 
+import os
 import json
 import re
 import random
-from typing import Dict, List, Any
-from data_generator import TestDataGenerator
+import asyncio
+import hashlib
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from data_generator import (
+    TestDataGenerator,
+    ENABLE_PROMPT_CACHE,
+    _ainvoke_json,
+    _invoke_json,
+    _loads,
+    _prompt_cache_get,
+    _prompt_cache_put,
+)
+from db_generator import OLLAMA_NUM_PARALLEL
+from json_extract import extract_first_json_object
 from llm_factory import LLMFactory
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+
+# Per-row samples (parent keys, injected FKs, first records) are DEBUG output
+logger = logging.getLogger(__name__)
+
+# Other tables' user context is cut to this many characters in FK prompts. Every
+# table's prompt lists every other table, so prompt size grows as O(T^2).
+MAX_CONTEXT_CHARS = 200
+
+# When set, every table finished in Phase 6 is saved under
+# CHECKPOINT_DIR/<db_name>/<table>.json; "resume": true in db_schema reloads
+# those tables instead of generating them again
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR")
+
+# Fenced code blocks stripped from free-text agent replies
+_CODE_FENCE_RE = re.compile(r'```.*?```', re.DOTALL)
+
+
+def _dumps_indented(obj) -> str:
+    """json.dumps(obj, indent=2) for prompts, via orjson when installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj, indent=2)
+
+
+def _context_excerpt(table: Dict[str, Any]) -> str:
+    """A table's additional_context, truncated to MAX_CONTEXT_CHARS."""
+    context = table.get("additional_context", "")
+    if isinstance(context, str) and len(context) > MAX_CONTEXT_CHARS:
+        return context[:MAX_CONTEXT_CHARS].rstrip() + "..."
+    return context
+
+
+def _field_info(fields: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The name/type/rules view of a table's fields that agent prompts show."""
+    return [
+        {"name": get("name"), "type": get("type"), "rules": get("rules", "")}
+        for get in (f.get for f in fields)
+    ]
+
+
+_AUTO_ID_TYPE = "integer"
+_AUTO_ID_RULES = "auto-generated primary key"
+
+
+def _auto_id_field(name: str) -> Dict[str, Any]:
+    """Field spec for a primary key the pipeline adds itself."""
+    return {"name": name, "type": _AUTO_ID_TYPE, "rules": _AUTO_ID_RULES, "_auto_generated": True}
+
+
+def _parse_table_map(response: str) -> Dict[str, Any]:
+    """Parse a bulk agent reply keyed by table name ({} if there is none)."""
+    json_text = extract_first_json_object(response)
+    if json_text is None:
+        return {}
+    result = _loads(json_text)
+    return result if isinstance(result, dict) else {}
+
+
+# ============================================================================
+# LLM RESPONSE CACHE
+# ============================================================================
+
+class CachedLLM:
+    """
+    Wraps an LLM client so identical agent prompts are answered from the
+    shared on-disk prompt cache (see data_generator.PROMPT_CACHE_PATH).
+    Keyed by sha256(provider|model|temperature|prompt).
+    """
+    
+    def __init__(self, llm, provider: str):
+        self.llm = llm
+        self.provider = provider
+    
+    def _key(self, prompt: str) -> str:
+        parts = (self.provider, getattr(self.llm, "model", ""), getattr(self.llm, "temperature", ""), prompt)
+        return hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    
+    def invoke(self, prompt: str) -> str:
+        key = self._key(prompt)
+        cached = _prompt_cache_get(key)
+        if cached is not None:
+            return cached
+        response = self.llm.invoke(prompt)
+        if response:
+            _prompt_cache_put(key, response)
+        return response
+    
+    async def ainvoke(self, prompt: str) -> str:
+        key = self._key(prompt)
+        cached = _prompt_cache_get(key)
+        if cached is not None:
+            return cached
+        response = await self.llm.ainvoke(prompt)
+        if response:
+            _prompt_cache_put(key, response)
+        return response
+    
+    def stream(self, prompt: str):
+        """Yield the cached reply, or stream from the wrapped client and cache
+        what the caller consumed (it may stop early once it has the JSON)."""
+        key = self._key(prompt)
+        cached = _prompt_cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+        if not hasattr(self.llm, "stream"):
+            yield self.invoke(prompt)
+            return
+        
+        parts = []
+        inner = self.llm.stream(prompt)
+        try:
+            for chunk in inner:
+                parts.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # Consumer stopped early: the part it read is all it will ever use
+            if parts:
+                _prompt_cache_put(key, "".join(parts))
+            raise
+        finally:
+            inner.close()
+        if parts:
+            _prompt_cache_put(key, "".join(parts))
+
 
 # ============================================================================
 # AGENT 1: PRIMARY KEY DETECTION
@@ -39,13 +188,100 @@ class PrimaryKeyDetectionAgent:
     
     def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
         self.provider = provider
-        self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.1)
+        self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.1, json_mode=True)
     
     def detect_or_create_primary_key(self, table: Dict[str, Any]) -> str:
         """
         Detect existing PK or determine where to add one.
         Returns the primary key field name.
         """
+        auto_id_name, existing_pk = self._existing_primary_key(table)
+        if existing_pk:
+            return existing_pk
+        
+        try:
+            response = _invoke_json(self.llm, self._build_prompt(table, auto_id_name))
+            pk_field = self._apply_response(table, auto_id_name, response)
+            if pk_field:
+                return pk_field
+        except Exception as e:
+            print(f"   ⚠️  PK detection failed, adding default '{auto_id_name}': {e}")
+        
+        return self._add_auto_id(table, auto_id_name)
+    
+    async def adetect_or_create_primary_key(self, table: Dict[str, Any]) -> str:
+        """Async variant of detect_or_create_primary_key(); awaits the LLM via ainvoke()."""
+        auto_id_name, existing_pk = self._existing_primary_key(table)
+        if existing_pk:
+            return existing_pk
+        
+        try:
+            response = await _ainvoke_json(self.llm, self._build_prompt(table, auto_id_name))
+            pk_field = self._apply_response(table, auto_id_name, response)
+            if pk_field:
+                return pk_field
+        except Exception as e:
+            print(f"   ⚠️  PK detection failed, adding default '{auto_id_name}': {e}")
+        
+        return self._add_auto_id(table, auto_id_name)
+    
+    def detect_primary_keys_bulk(self, tables: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Detect/create the PK of every table with a single LLM call.
+        Tables the response doesn't cover fall back to detect_or_create_primary_key().
+        """
+        primary_keys, pending = self._split_pending(tables)
+        if not pending:
+            return primary_keys
+        
+        results = {}
+        try:
+            results = _parse_table_map(_invoke_json(self.llm, self._build_bulk_prompt(pending)))
+        except Exception as e:
+            print(f"   ⚠️  Bulk PK detection failed, falling back to per-table calls: {e}")
+        
+        for table, auto_id_name in pending:
+            entry = results.get(table["table_name"])
+            pk_field = self._apply_result(table, auto_id_name, entry) if isinstance(entry, dict) else None
+            primary_keys[table["table_name"]] = pk_field or self.detect_or_create_primary_key(table)
+        return primary_keys
+    
+    async def adetect_primary_keys_bulk(self, tables: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Async variant of detect_primary_keys_bulk(); awaits the LLM via ainvoke()."""
+        primary_keys, pending = self._split_pending(tables)
+        if not pending:
+            return primary_keys
+        
+        results = {}
+        try:
+            results = _parse_table_map(await _ainvoke_json(self.llm, self._build_bulk_prompt(pending)))
+        except Exception as e:
+            print(f"   ⚠️  Bulk PK detection failed, falling back to per-table calls: {e}")
+        
+        for table, auto_id_name in pending:
+            entry = results.get(table["table_name"])
+            pk_field = self._apply_result(table, auto_id_name, entry) if isinstance(entry, dict) else None
+            primary_keys[table["table_name"]] = pk_field or await self.adetect_or_create_primary_key(table)
+        return primary_keys
+    
+    def _split_pending(self, tables: List[Dict[str, Any]]):
+        """Resolve obvious PKs locally; return (primary_keys, [(table, auto_id_name), ...] still to ask)."""
+        primary_keys = {}
+        pending = []
+        for table in tables:
+            auto_id_name, existing_pk = self._existing_primary_key(table)
+            if existing_pk:
+                primary_keys[table["table_name"]] = existing_pk
+            else:
+                pending.append((table, auto_id_name))
+        return primary_keys, pending
+    
+    @staticmethod
+    def _existing_primary_key(table: Dict[str, Any]):
+        """Return (auto_id_name, existing PK field name or None).
+
+        Field names are expected to be stripped already (Phase 0 does this).
+        """
         table_name = table.get("table_name", "unknown")
         fields = table.get("fields", [])
         
@@ -55,18 +291,44 @@ class PrimaryKeyDetectionAgent:
         auto_id_name = f"{table_name_singular}_id"
         
         # Check if explicit id field exists
+        candidates = frozenset(("id", auto_id_name.lower(), f"{table_name.lower()}_id"))
+        for field in fields:
+            fname = field.get("name", "")
+            if fname.lower() in candidates:
+                return auto_id_name, fname
+        
+        # A single uuid/integer field declared unique, or a single uuid "*_id"
+        # field, is unambiguous enough to skip the LLM. Integer "*_id" fields
+        # are left to the LLM since they are usually foreign keys.
+        unique_fields = []
+        uuid_id_fields = []
         for field in fields:
-            fname = field.get("name", "").strip().lower()
-            if fname == "id" or fname == auto_id_name.lower() or fname == f"{table_name.lower()}_id":
-                return field.get("name").strip()
+            ftype = str(field.get("type", "")).strip().lower()
+            if ftype not in ("uuid", "integer"):
+                continue
+            fname = field.get("name", "")
+            if "unique" in str(field.get("rules", "")).lower():
+                unique_fields.append(fname)
+            elif ftype == "uuid" and fname.lower().endswith("_id"):
+                uuid_id_fields.append(fname)
+        if len(unique_fields) == 1:
+            return auto_id_name, unique_fields[0]
+        if not unique_fields and len(uuid_id_fields) == 1:
+            return auto_id_name, uuid_id_fields[0]
+        
+        return auto_id_name, None
+    
+    def _build_prompt(self, table: Dict[str, Any], auto_id_name: str) -> str:
+        table_name = table.get("table_name", "unknown")
+        fields = table.get("fields", [])
         
         # Ask LLM if any field could serve as PK
-        field_info = [{"name": f.get("name"), "type": f.get("type"), "rules": f.get("rules", "")} for f in fields]
+        field_info = _field_info(fields)
         
         prompt = f"""You are a database design expert. Analyze this table and determine the PRIMARY KEY.
 
 Table: {table_name}
-Fields: {json.dumps(field_info, indent=2)}
+Fields: {_dumps_indented(field_info)}
 
 TASK: Identify which field should be the primary key, or if we need to add an '{auto_id_name}' field.
 
@@ -81,36 +343,58 @@ OUTPUT ONLY JSON:
   "reasoning": "brief explanation",
   "should_add_id": true/false
 }}"""
+        return prompt
+    
+    def _build_bulk_prompt(self, pending: List[Any]) -> str:
+        tables_info = [
+            {
+                "table": table.get("table_name", "unknown"),
+                "id_field_to_add": auto_id_name,
+                "fields": _field_info(table.get("fields", []))
+            }
+            for table, auto_id_name in pending
+        ]
         
-        try:
-            response = self.llm.invoke(prompt)
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group(0))
-                
-                if result.get("should_add_id") or result.get("primary_key") == "NONE":
-                    # Add table-specific id field (e.g., "customer_id" for "customer" table)
-                    id_field = {
-                        "name": auto_id_name,
-                        "type": "integer",
-                        "rules": "auto-generated primary key",
-                        "_auto_generated": True
-                    }
-                    table["fields"].insert(0, id_field)
-                    return auto_id_name
-                else:
-                    return result.get("primary_key", auto_id_name)
-        except Exception as e:
-            print(f"   ⚠️  PK detection failed, adding default '{auto_id_name}': {e}")
-        
-        # Fallback: add table-specific id field
-        id_field = {
-            "name": auto_id_name,
-            "type": "integer",
-            "rules": "auto-generated primary key",
-            "_auto_generated": True
-        }
-        table["fields"].insert(0, id_field)
+        prompt = f"""You are a database design expert. Analyze these tables and determine the PRIMARY KEY of each.
+
+Tables: {_dumps_indented(tables_info)}
+
+TASK: For each table, identify which field should be the primary key, or if we need to add its 'id_field_to_add' field.
+
+Rules:
+- Primary key must uniquely identify each record
+- Look for fields like: id, <table>_id, or unique identifiers
+- If no suitable PK exists, we should add the table's 'id_field_to_add' field
+
+OUTPUT ONLY JSON, with one entry per table name:
+{{
+  "table_name": {{
+    "primary_key": "field_name or 'NONE' if need to add id",
+    "reasoning": "brief explanation",
+    "should_add_id": true/false
+  }}
+}}"""
+        return prompt
+    
+    def _apply_response(self, table: Dict[str, Any], auto_id_name: str, response: str):
+        """Apply the LLM's PK decision; None if the response holds no JSON."""
+        json_text = extract_first_json_object(response)
+        if json_text is None:
+            return None
+        return self._apply_result(table, auto_id_name, _loads(json_text))
+    
+    def _apply_result(self, table: Dict[str, Any], auto_id_name: str, result: Dict[str, Any]):
+        if result.get("should_add_id") or result.get("primary_key") == "NONE":
+            # Add table-specific id field (e.g., "customer_id" for "customer" table)
+            return self._add_auto_id(table, auto_id_name)
+        return result.get("primary_key", auto_id_name)
+    
+    @staticmethod
+    def _add_auto_id(table: Dict[str, Any], auto_id_name: str) -> str:
+        id_field = _auto_id_field(auto_id_name)
+        # Rebind rather than insert(0): one allocation, no in-place shift that
+        # concurrent readers of the old list (other tables' prompts) could see
+        table["fields"] = [id_field, *table.get("fields", [])]
         return auto_id_name
 
 
@@ -128,47 +412,168 @@ class ForeignKeyDetectionAgent:
         self.provider = provider
         # Only pass model_name for Ollama; Groq uses model from .env
         if provider == "ollama":
-            self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.2)
+            self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.2, json_mode=True)
         else:
-            self.llm = LLMFactory.create_llm(provider=provider, temperature=0.2)
+            self.llm = LLMFactory.get_shared(provider=provider, temperature=0.2, json_mode=True)
     
     def detect_foreign_keys(
         self, 
         table: Dict[str, Any], 
         all_tables: List[Dict[str, Any]],
-        primary_keys: Dict[str, str]
+        primary_keys: Dict[str, str],
+        tables_json: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Detect which existing fields in the table are foreign keys.
         """
-        table_name = table.get("table_name", "unknown")
-        fields = table.get("fields", [])
-        user_context = table.get("additional_context", "")
+        prompt = self._build_prompt(table, all_tables, primary_keys, tables_json)
+        try:
+            return self._parse_response(_invoke_json(self.llm, prompt))
+        except Exception as e:
+            print(f"   ⚠️  FK detection failed: {e}")
         
-        # Build info about other tables
-        other_tables_info = []
-        for t in all_tables:
-            if t["table_name"] != table_name:
-                other_tables_info.append({
-                    "name": t["table_name"],
-                    "primary_key": primary_keys.get(t["table_name"], "id"),
-                    "context": t.get("additional_context", ""),
-                    "fields": [f.get("name") for f in t.get("fields", [])]
-                })
+        return []
+    
+    async def adetect_foreign_keys(
+        self, 
+        table: Dict[str, Any], 
+        all_tables: List[Dict[str, Any]],
+        primary_keys: Dict[str, str],
+        tables_json: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Async variant of detect_foreign_keys(); awaits the LLM via ainvoke()."""
+        prompt = self._build_prompt(table, all_tables, primary_keys, tables_json)
+        try:
+            return self._parse_response(await _ainvoke_json(self.llm, prompt))
+        except Exception as e:
+            print(f"   ⚠️  FK detection failed: {e}")
         
-        prompt = f"""You are a database relationship expert. Analyze which EXISTING fields in this table are FOREIGN KEYS.
+        return []
+    
+    def detect_foreign_keys_bulk(
+        self,
+        tables: List[Dict[str, Any]],
+        primary_keys: Dict[str, str]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Detect the FKs of every table with a single LLM call.
+        Tables the response doesn't cover fall back to detect_foreign_keys().
+        """
+        results = {}
+        try:
+            results = _parse_table_map(_invoke_json(self.llm, self._build_bulk_prompt(tables, primary_keys)))
+        except Exception as e:
+            print(f"   ⚠️  Bulk FK detection failed, falling back to per-table calls: {e}")
+        
+        detected = {}
+        tables_json = None
+        for table in tables:
+            fks = results.get(table["table_name"])
+            if not isinstance(fks, list):
+                if tables_json is None:
+                    tables_json = self.describe_tables(tables, primary_keys)
+                fks = self.detect_foreign_keys(table, tables, primary_keys, tables_json)
+            detected[table["table_name"]] = fks
+        return detected
+    
+    async def adetect_foreign_keys_bulk(
+        self,
+        tables: List[Dict[str, Any]],
+        primary_keys: Dict[str, str]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Async variant of detect_foreign_keys_bulk(); awaits the LLM via ainvoke()."""
+        results = {}
+        try:
+            results = _parse_table_map(await _ainvoke_json(self.llm, self._build_bulk_prompt(tables, primary_keys)))
+        except Exception as e:
+            print(f"   ⚠️  Bulk FK detection failed, falling back to per-table calls: {e}")
+        
+        detected = {}
+        tables_json = None
+        for table in tables:
+            fks = results.get(table["table_name"])
+            if not isinstance(fks, list):
+                if tables_json is None:
+                    tables_json = self.describe_tables(tables, primary_keys)
+                fks = await self.adetect_foreign_keys(table, tables, primary_keys, tables_json)
+            detected[table["table_name"]] = fks
+        return detected
+    
+    def _build_bulk_prompt(self, tables: List[Dict[str, Any]], primary_keys: Dict[str, str]) -> str:
+        # Every table is described once and shared as context for all of them
+        tables_info = [
+            {
+                "name": t["table_name"],
+                "primary_key": primary_keys.get(t["table_name"], "id"),
+                "context": _context_excerpt(t),
+                "fields": _field_info(t.get("fields", []))
+            }
+            for t in tables
+        ]
+        
+        prompt = f"""You are a database relationship expert. For EACH table below, analyze which of its EXISTING fields are FOREIGN KEYS.
 
-Current Table: {table_name}
-User Context: {user_context}
-Fields: {json.dumps([{"name": f.get("name"), "type": f.get("type"), "rules": f.get("rules", "")} for f in fields], indent=2)}
+Tables:
+{_dumps_indented(tables_info)}
 
-Other Tables:
-{json.dumps(other_tables_info, indent=2)}
+**CRITICAL RULES**:
+1. Only identify EXISTING fields as FKs (don't suggest new fields yet)
+2. A foreign key must reference a DIFFERENT table from the list above
+3. EXCLUDE aggregate/count fields (e.g., "number of employee", "total", "count") - these are NOT foreign keys
+4. Look for:
+   - Fields ending with "_id" (e.g., "dept_id", "employee_id")
+   - Fields matching table names (e.g., "department" might reference department table)
+   - Fields semantically suggesting relationships
+
+OUTPUT ONLY JSON, with one entry per table name (an empty list if the table has no FKs):
+{{
+  "table_name": [
+    {{
+      "field": "existing_field_name",
+      "references_table": "table_name",
+      "references_field": "primary_key_of_that_table",
+      "reasoning": "why this is a FK"
+    }}
+  ]
+}}"""
+        return prompt
+    
+    def describe_tables(self, all_tables: List[Dict[str, Any]], primary_keys: Dict[str, str]) -> str:
+        """
+        Serialized table list shared by every per-table prompt. Build it once
+        per phase and pass it as tables_json instead of re-dumping per table.
+        """
+        return _dumps_indented([
+            {
+                "name": t["table_name"],
+                "primary_key": primary_keys.get(t["table_name"], "id"),
+                "context": _context_excerpt(t)
+            }
+            for t in all_tables
+        ])
+    
+    def _build_prompt(
+        self, 
+        table: Dict[str, Any], 
+        all_tables: List[Dict[str, Any]],
+        primary_keys: Dict[str, str],
+        tables_json: Optional[str] = None
+    ) -> str:
+        table_name = table.get("table_name", "unknown")
+        fields = table.get("fields", [])
+        user_context = table.get("additional_context", "")
+        if tables_json is None:
+            tables_json = self.describe_tables(all_tables, primary_keys)
+        
+        # Everything up to the table list is identical for every table in a
+        # run, so backends with prefix caching only prefill the tail per call
+        prompt = f"""You are a database relationship expert. Analyze which EXISTING fields in the current table (given at the end) are FOREIGN KEYS.
 
 **CRITICAL RULES**:
 1. Only identify EXISTING fields as FKs (don't suggest new fields yet)
-2. EXCLUDE aggregate/count fields (e.g., "number of employee", "total", "count") - these are NOT foreign keys
-3. Look for:
+2. A foreign key must reference one of the OTHER tables in the list below, never the current table
+3. EXCLUDE aggregate/count fields (e.g., "number of employee", "total", "count") - these are NOT foreign keys
+4. Look for:
    - Fields ending with "_id" (e.g., "dept_id", "employee_id")
    - Fields matching table names (e.g., "department" might reference department table)
    - Fields semantically suggesting relationships
@@ -183,17 +588,21 @@ OUTPUT ONLY JSON:
       "reasoning": "why this is a FK"
     }}
   ]
-}}"""
-        
-        try:
-            response = self.llm.invoke(prompt)
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group(0))
-                return result.get("foreign_keys", [])
-        except Exception as e:
-            print(f"   ⚠️  FK detection failed: {e}")
-        
+}}
+
+Tables:
+{tables_json}
+
+Current Table: {table_name}
+User Context: {user_context}
+Fields: {_dumps_indented(_field_info(fields))}"""
+        return prompt
+    
+    def _parse_response(self, response: str) -> List[Dict[str, Any]]:
+        json_text = extract_first_json_object(response)
+        if json_text is not None:
+            result = _loads(json_text)
+            return result.get("foreign_keys", [])
         return []
 
 
@@ -209,7 +618,7 @@ class SchemaEnhancementAgent:
     
     def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
         self.provider = provider
-        self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.3)
+        self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.3, json_mode=True)
     
     def suggest_missing_relationships(
         self,
@@ -221,26 +630,66 @@ class SchemaEnhancementAgent:
         """
         Suggest new FK fields that should be added for proper relationships.
         """
+        prompt = self._build_prompt(table, all_tables, primary_keys, existing_fks)
+        if prompt is None:
+            return []
+        
+        try:
+            return self._parse_response(_invoke_json(self.llm, prompt))
+        except Exception as e:
+            print(f"   ⚠️  Schema enhancement failed: {e}")
+        
+        return []
+    
+    async def asuggest_missing_relationships(
+        self,
+        table: Dict[str, Any],
+        all_tables: List[Dict[str, Any]],
+        primary_keys: Dict[str, str],
+        existing_fks: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Async variant of suggest_missing_relationships(); awaits the LLM via ainvoke()."""
+        prompt = self._build_prompt(table, all_tables, primary_keys, existing_fks)
+        if prompt is None:
+            return []
+        
+        try:
+            return self._parse_response(await _ainvoke_json(self.llm, prompt))
+        except Exception as e:
+            print(f"   ⚠️  Schema enhancement failed: {e}")
+        
+        return []
+    
+    def _build_prompt(
+        self,
+        table: Dict[str, Any],
+        all_tables: List[Dict[str, Any]],
+        primary_keys: Dict[str, str],
+        existing_fks: List[Dict[str, Any]]
+    ):
+        """Prompt for the missing-FK question, or None when there are no candidate tables."""
         table_name = table.get("table_name", "unknown")
         fields = table.get("fields", [])
         user_context = table.get("additional_context", "")
         
-        existing_fk_tables = [fk["references_table"] for fk in existing_fks]
+        # Ordered and de-duplicated for the prompt; the set is for the filter below
+        existing_fk_tables = list(dict.fromkeys(fk["references_table"] for fk in existing_fks))
         existing_field_names = [f.get("name") for f in fields]
+        excluded_tables = {table_name, *existing_fk_tables}
         
         # Build info about other tables
         other_tables_info = []
         for t in all_tables:
-            if t["table_name"] != table_name and t["table_name"] not in existing_fk_tables:
+            if t["table_name"] not in excluded_tables:
                 other_tables_info.append({
                     "name": t["table_name"],
                     "primary_key": primary_keys.get(t["table_name"], "id"),
                     "primary_key_type": "integer",  # Assuming auto-generated IDs are integers
-                    "context": t.get("additional_context", "")
+                    "context": _context_excerpt(t)
                 })
         
         if not other_tables_info:
-            return []
+            return None
         
         prompt = f"""You are a database design expert. Determine if this table is MISSING foreign key relationships.
 
@@ -250,7 +699,7 @@ Existing Fields: {existing_field_names}
 Already Has FKs to: {existing_fk_tables}
 
 Other Tables Available:
-{json.dumps(other_tables_info, indent=2)}
+{_dumps_indented(other_tables_info)}
 
 TASK: Based on semantic relationships and common database patterns, suggest NEW FK fields to add.
 
@@ -279,16 +728,13 @@ OUTPUT ONLY JSON:
 }}
 
 If no additional FKs needed, return empty array."""
-        
-        try:
-            response = self.llm.invoke(prompt)
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group(0))
-                return result.get("suggested_foreign_keys", [])
-        except Exception as e:
-            print(f"   ⚠️  Schema enhancement failed: {e}")
-        
+        return prompt
+    
+    def _parse_response(self, response: str) -> List[Dict[str, Any]]:
+        json_text = extract_first_json_object(response)
+        if json_text is not None:
+            result = _loads(json_text)
+            return result.get("suggested_foreign_keys", [])
         return []
 
 
@@ -304,56 +750,244 @@ class RelationshipInferenceAgent:
     
     def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
         self.provider = provider
-        self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.3)
+        self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.3)
     
     def infer_additional_rules(self, table: Dict[str, Any], schema_analysis: Dict[str, Any]) -> str:
         """
         Infer additional generation rules for a table based on context.
         """
+        try:
+            response = self.llm.invoke(self._build_prompt(table, schema_analysis))
+            return self._clean_rules(response)
+        except Exception as e:
+            print(f"⚠️  Rule inference failed: {e}")
+            return f"Generate diverse, realistic data for {table.get('table_name', 'unknown')} table."
+    
+    async def ainfer_additional_rules(self, table: Dict[str, Any], schema_analysis: Dict[str, Any]) -> str:
+        """Async variant of infer_additional_rules(); awaits the LLM via ainvoke()."""
+        try:
+            response = await self.llm.ainvoke(self._build_prompt(table, schema_analysis))
+            return self._clean_rules(response)
+        except Exception as e:
+            print(f"⚠️  Rule inference failed: {e}")
+            return f"Generate diverse, realistic data for {table.get('table_name', 'unknown')} table."
+    
+    def _build_prompt(self, table: Dict[str, Any], schema_analysis: Dict[str, Any]) -> str:
+        table_name = table.get("table_name", "unknown")
+        fields = table.get("fields", [])
+        fks = schema_analysis.get("foreign_keys", [])
+        
+        prompt = f"""You are a test data generation expert. Given this table schema, suggest ADDITIONAL RULES for generating realistic test data.
+
+TABLE: {table_name}
+FIELDS: {_dumps_indented(fields)}
+FOREIGN KEYS: {_dumps_indented(fks)}
+
+Consider:
+- What real-world entity does this table represent?
+- What business rules or constraints apply?
+- What data patterns are typical for this domain?
+- What diversity is needed for good test coverage?
+
+Examples:
+- For "employees": "Generate diverse job titles (Professor, Assistant, Dean), email should match name pattern, hire dates should be in past"
+- For "students": "Age between 18-30, emails should have student format, enrollment dates recent, diverse majors"
+- For "orders": "Order dates should be recent, amounts should vary, status should include pending/completed/cancelled"
+
+Return ONLY a concise string of additional rules (2-3 sentences max), NO JSON, NO extra formatting:"""
+        return prompt
+    
+    @staticmethod
+    def _clean_rules(response: str) -> str:
+        rules = response.strip()
+        
+        # Remove any markdown or code blocks
+        rules = _CODE_FENCE_RE.sub('', rules)
+        rules = rules.replace('`', '')
+        
+        # Take first 2-3 sentences
+        sentences = rules.split('. ')
+        rules = '. '.join(sentences[:3])
+        
+        if rules and not rules.endswith('.'):
+            rules += '.'
+        
+        print(f"   Additional Rules: {rules}")
+        return rules
+
+
+# ============================================================================
+# AGENTS 1-4 FUSED: UNIFIED SCHEMA ANALYSIS
+# ============================================================================
+
+class UnifiedSchemaAgent:
+    """
+    Does the work of agents 1-4 (PK, FK, missing relationships, business rules)
+    for one table in a single LLM call, so the table's schema is sent and
+    processed once instead of four times.
+    """
+    
+    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
+        self.provider = provider
+        # Only pass model_name for Ollama; Groq uses model from .env
+        if provider == "ollama":
+            self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.2, json_mode=True)
+        else:
+            self.llm = LLMFactory.get_shared(provider=provider, temperature=0.2, json_mode=True)
+    
+    def analyze(self, table: Dict[str, Any], all_tables: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Analyze one table. Returns a dict with primary_key, foreign_keys,
+        suggested_foreign_keys and generation_rules (the PK field is added to
+        the table when it has to be created).
+        """
+        auto_id_name, existing_pk = PrimaryKeyDetectionAgent._existing_primary_key(table)
+        prompt = self._build_prompt(table, all_tables, auto_id_name, existing_pk)
+        try:
+            result = self._parse_response(_invoke_json(self.llm, prompt))
+        except Exception as e:
+            print(f"   ⚠️  Unified schema analysis failed for {table.get('table_name', 'unknown')}: {e}")
+            result = {}
+        return self._finalize(table, result, auto_id_name, existing_pk)
+    
+    async def aanalyze(self, table: Dict[str, Any], all_tables: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Async variant of analyze(); awaits the LLM via ainvoke()."""
+        auto_id_name, existing_pk = PrimaryKeyDetectionAgent._existing_primary_key(table)
+        prompt = self._build_prompt(table, all_tables, auto_id_name, existing_pk)
+        try:
+            result = self._parse_response(await _ainvoke_json(self.llm, prompt))
+        except Exception as e:
+            print(f"   ⚠️  Unified schema analysis failed for {table.get('table_name', 'unknown')}: {e}")
+            result = {}
+        return self._finalize(table, result, auto_id_name, existing_pk)
+    
+    def _build_prompt(
+        self,
+        table: Dict[str, Any],
+        all_tables: List[Dict[str, Any]],
+        auto_id_name: str,
+        existing_pk: Optional[str]
+    ) -> str:
+        table_name = table.get("table_name", "unknown")
+        fields = table.get("fields", [])
+        user_context = table.get("additional_context", "")
+        field_info = _field_info(fields)
+        
+        # Other tables' PKs aren't final yet; use the known or expected id field
+        other_tables_info = []
+        for t in all_tables:
+            if t["table_name"] != table_name:
+                other_auto_id, other_pk = PrimaryKeyDetectionAgent._existing_primary_key(t)
+                other_tables_info.append({
+                    "name": t["table_name"],
+                    "primary_key": other_pk or other_auto_id,
+                    "context": _context_excerpt(t)
+                })
+        
+        if existing_pk:
+            pk_task = f"1. PRIMARY KEY: The primary key is '{existing_pk}'. Return it unchanged."
+        else:
+            pk_task = (
+                "1. PRIMARY KEY: Identify which field uniquely identifies each record. "
+                f"If no suitable field exists, return 'NONE' and we will add an '{auto_id_name}' field."
+            )
+        
+        prompt = f"""You are a database design and test data expert. Analyze this table's keys, relationships and data rules in ONE pass.
+
+Current Table: {table_name}
+User Context: {user_context}
+Fields: {_dumps_indented(field_info)}
+
+Other Tables:
+{_dumps_indented(other_tables_info)}
+
+TASKS:
+{pk_task}
+2. FOREIGN KEYS: Identify which EXISTING fields reference another table's primary key.
+   - Look for fields ending with "_id", fields matching table names, or fields semantically suggesting relationships
+   - EXCLUDE aggregate/count fields (e.g., "number of employee", "total", "count") - these are NOT foreign keys
+3. MISSING RELATIONSHIPS: Suggest NEW FK fields only when the table semantically needs a link to another table that no existing field covers.
+   - Use common naming conventions: <table>_id (e.g., "employee_id", "dept_id")
+4. GENERATION RULES: 2-3 sentences of business rules for realistic, diverse test data (e.g., "hire dates should be in past, email should match name pattern").
+
+OUTPUT ONLY JSON:
+{{
+  "primary_key": "field_name or 'NONE' if need to add id",
+  "foreign_keys": [
+    {{
+      "field": "existing_field_name",
+      "references_table": "table_name",
+      "references_field": "primary_key_of_that_table",
+      "reasoning": "why this is a FK"
+    }}
+  ],
+  "suggested_foreign_keys": [
+    {{
+      "field_name": "new_field_name_to_add",
+      "field_type": "integer",
+      "references_table": "table_name",
+      "references_field": "primary_key",
+      "reasoning": "why this relationship makes sense"
+    }}
+  ],
+  "generation_rules": "concise rules, 2-3 sentences"
+}}"""
+        return prompt
+    
+    def _parse_response(self, response: str) -> Dict[str, Any]:
+        json_text = extract_first_json_object(response)
+        if json_text is None:
+            return {}
+        result = _loads(json_text)
+        return result if isinstance(result, dict) else {}
+    
+    def _finalize(
+        self,
+        table: Dict[str, Any],
+        result: Dict[str, Any],
+        auto_id_name: str,
+        existing_pk: Optional[str]
+    ) -> Dict[str, Any]:
+        """Normalize the parsed reply, adding the auto id field when needed."""
         table_name = table.get("table_name", "unknown")
-        fields = table.get("fields", [])
-        fks = schema_analysis.get("foreign_keys", [])
         
-        prompt = f"""You are a test data generation expert. Given this table schema, suggest ADDITIONAL RULES for generating realistic test data.
-
-TABLE: {table_name}
-FIELDS: {json.dumps(fields, indent=2)}
-FOREIGN KEYS: {json.dumps(fks, indent=2)}
-
-Consider:
-- What real-world entity does this table represent?
-- What business rules or constraints apply?
-- What data patterns are typical for this domain?
-- What diversity is needed for good test coverage?
-
-Examples:
-- For "employees": "Generate diverse job titles (Professor, Assistant, Dean), email should match name pattern, hire dates should be in past"
-- For "students": "Age between 18-30, emails should have student format, enrollment dates recent, diverse majors"
-- For "orders": "Order dates should be recent, amounts should vary, status should include pending/completed/cancelled"
-
-Return ONLY a concise string of additional rules (2-3 sentences max), NO JSON, NO extra formatting:"""
-
-        try:
-            response = self.llm.invoke(prompt)
-            rules = response.strip()
-            
-            # Remove any markdown or code blocks
-            rules = re.sub(r'```.*?```', '', rules, flags=re.DOTALL)
-            rules = re.sub(r'`', '', rules)
-            
-            # Take first 2-3 sentences
-            sentences = rules.split('. ')
-            rules = '. '.join(sentences[:3])
-            
-            if rules and not rules.endswith('.'):
-                rules += '.'
-            
-            print(f"   Additional Rules: {rules}")
-            return rules
-            
-        except Exception as e:
-            print(f"⚠️  Rule inference failed: {e}")
-            return f"Generate diverse, realistic data for {table_name} table."
+        pk_field = existing_pk
+        if not pk_field:
+            candidate = result.get("primary_key")
+            field_names = {f.get("name") for f in table.get("fields", [])}
+            if isinstance(candidate, str) and candidate in field_names:
+                pk_field = candidate
+            else:
+                pk_field = PrimaryKeyDetectionAgent._add_auto_id(table, auto_id_name)
+        
+        foreign_keys = [
+            fk for fk in result.get("foreign_keys") or []
+            if isinstance(fk, dict) and fk.get("field") and fk.get("references_table")
+        ]
+        for fk in foreign_keys:
+            fk.setdefault("references_field", "id")
+        
+        suggestions = [
+            sg for sg in result.get("suggested_foreign_keys") or []
+            if isinstance(sg, dict) and sg.get("field_name") and sg.get("references_table")
+        ]
+        for sg in suggestions:
+            sg.setdefault("field_type", "integer")
+            sg.setdefault("references_field", "id")
+            sg.setdefault("reasoning", "")
+        
+        rules = result.get("generation_rules")
+        if isinstance(rules, str) and rules.strip():
+            rules = RelationshipInferenceAgent._clean_rules(rules)
+        else:
+            rules = f"Generate diverse, realistic data for {table_name} table."
+        
+        return {
+            "primary_key": pk_field,
+            "foreign_keys": foreign_keys,
+            "suggested_foreign_keys": suggestions,
+            "generation_rules": rules
+        }
 
 
 # ============================================================================
@@ -371,15 +1005,18 @@ class DataValidationAgent:
     
     def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
         self.provider = provider
-        self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.1)
+        self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.1)
     
     def validate_database(
         self, 
         db_data: Dict[str, List[Dict]], 
-        schema_analyses: Dict[str, Dict]
+        schema_analyses: Dict[str, Dict],
+        fail_fast: bool = False
     ) -> Dict[str, Any]:
         """
         Validate entire database for correctness.
+        With fail_fast, stop at the first error (CI-style checks); the report
+        then only covers the tables scanned so far.
         """
         validation_report = {
             "overall_valid": True,
@@ -390,12 +1027,17 @@ class DataValidationAgent:
         
         print(f"\n🔍 Validating generated database...")
         
+        # One lookup set per referenced (table, field), shared by every table
+        ref_index = self._build_ref_index(db_data, schema_analyses)
+        
         for table_name, rows in db_data.items():
             table_validation = self._validate_table(
                 table_name, 
                 rows, 
                 schema_analyses.get(table_name, {}),
-                db_data
+                db_data,
+                ref_index,
+                fail_fast
             )
             validation_report["tables"][table_name] = table_validation
             
@@ -404,6 +1046,9 @@ class DataValidationAgent:
             
             validation_report["errors"].extend(table_validation.get("errors", []))
             validation_report["warnings"].extend(table_validation.get("warnings", []))
+            
+            if fail_fast and not validation_report["overall_valid"]:
+                break
         
         # Print summary
         if validation_report["overall_valid"]:
@@ -415,16 +1060,43 @@ class DataValidationAgent:
         
         return validation_report
     
+    def _build_ref_index(
+        self,
+        db_data: Dict[str, List[Dict]],
+        schema_analyses: Dict[str, Dict]
+    ) -> Dict[Tuple[str, str], Any]:
+        """
+        Collect the values of every FK target (ref_table, ref_field) once.
+        """
+        ref_index = {}
+        for analysis in schema_analyses.values():
+            for fk in analysis.get("foreign_keys", []):
+                key = (fk["references_table"], fk.get("references_field", "id"))
+                if key in ref_index or key[0] not in db_data:
+                    continue
+                values = [r.get(key[1]) for r in db_data[key[0]]]
+                try:
+                    ref_index[key] = set(values)
+                except TypeError:
+                    # Unhashable values (lists/dicts): fall back to list membership
+                    ref_index[key] = values
+        return ref_index
+    
     def _validate_table(
         self, 
         table_name: str, 
         rows: List[Dict],
         schema_analysis: Dict,
-        all_data: Dict[str, List[Dict]]
+        all_data: Dict[str, List[Dict]],
+        ref_index: Optional[Dict[Tuple[str, str], Any]] = None,
+        fail_fast: bool = False
     ) -> Dict[str, Any]:
         """
         Validate a single table's data.
         """
+        if ref_index is None:
+            ref_index = self._build_ref_index(all_data, {table_name: schema_analysis})
+        
         validation = {
             "valid": True,
             "errors": [],
@@ -439,45 +1111,100 @@ class DataValidationAgent:
         pk_field = schema_analysis.get("primary_key")
         fks = schema_analysis.get("foreign_keys", [])
         
+        # Resolve each FK's lookup set once; FKs to tables without data are skipped
+        fk_checks = []
+        for fk in fks:
+            ref_table = fk["references_table"]
+            if ref_table not in all_data:
+                continue
+            ref_field = fk.get("references_field", "id")
+            fk_checks.append((fk["field"], ref_table, ref_field, ref_index[(ref_table, ref_field)]))
+        
+        errors = validation["errors"]
+        valid_rows = [row for row in rows if row.get("is_valid", True)]
+        valid_records = len(valid_rows)
+        
+        # Column-wise pass first: one set build per column settles the common
+        # all-clean case; only tables with problems get the row-by-row scan
+        # below, which reports each offending row in order
+        if not self._columns_clean(rows, valid_rows, pk_field, fk_checks):
+            self._scan_rows(table_name, rows, pk_field, fk_checks, errors, fail_fast)
+        
+        validation["stats"]["valid_records"] = valid_records
+        validation["stats"]["invalid_records"] = len(rows) - valid_records
+        if errors:
+            validation["valid"] = False
+        
+        return validation
+    
+    @staticmethod
+    def _columns_clean(
+        rows: List[Dict],
+        valid_rows: List[Dict],
+        pk_field: Optional[str],
+        fk_checks: List[Tuple[str, str, str, Any]]
+    ) -> bool:
+        """True when PKs are unique and every valid row's FKs resolve."""
+        try:
+            if pk_field:
+                pk_column = [row[pk_field] for row in rows if pk_field in row]
+                if len(set(pk_column)) != len(pk_column):
+                    return False
+            for fk_field, _, _, ref_values in fk_checks:
+                if not isinstance(ref_values, set):
+                    return False
+                if not {row[fk_field] for row in valid_rows if fk_field in row} <= ref_values:
+                    return False
+        except TypeError:
+            # Unhashable values: let the row scan handle them
+            return False
+        return True
+    
+    @staticmethod
+    def _scan_rows(
+        table_name: str,
+        rows: List[Dict],
+        pk_field: Optional[str],
+        fk_checks: List[Tuple[str, str, str, Any]],
+        errors: List[str],
+        fail_fast: bool = False
+    ) -> None:
+        """Row-by-row check that appends one error per offending row."""
         # Track PKs for uniqueness
         seen_pks = set()
         
         for i, row in enumerate(rows):
             is_valid = row.get("is_valid", True)
             
-            if is_valid:
-                validation["stats"]["valid_records"] += 1
-            else:
-                validation["stats"]["invalid_records"] += 1
-            
             # Validate PK uniqueness
             if pk_field and pk_field in row:
                 pk_value = row[pk_field]
                 if pk_value in seen_pks:
-                    validation["errors"].append(
+                    errors.append(
                         f"{table_name}[{i}]: Duplicate primary key {pk_field}={pk_value}"
                     )
-                    validation["valid"] = False
                 seen_pks.add(pk_value)
             
             # Validate FK references (only for valid records)
             if is_valid:
-                for fk in fks:
-                    fk_field = fk["field"]
-                    ref_table = fk["references_table"]
-                    ref_field = fk.get("references_field", "id")
+                for fk_field, ref_table, ref_field, ref_values in fk_checks:
+                    if fk_field not in row:
+                        continue
+                    fk_value = row[fk_field]
                     
-                    if fk_field in row and ref_table in all_data:
-                        fk_value = row[fk_field]
-                        ref_values = [r.get(ref_field) for r in all_data[ref_table]]
-                        
-                        if fk_value not in ref_values:
-                            validation["errors"].append(
-                                f"{table_name}[{i}]: FK {fk_field}={fk_value} references non-existent {ref_table}.{ref_field}"
-                            )
-                            validation["valid"] = False
-        
-        return validation
+                    try:
+                        missing = fk_value not in ref_values
+                    except TypeError:
+                        # Unhashable FK value can't match any hashable key
+                        missing = True
+                    
+                    if missing:
+                        errors.append(
+                            f"{table_name}[{i}]: FK {fk_field}={fk_value} references non-existent {ref_table}.{ref_field}"
+                        )
+            
+            if fail_fast and errors:
+                return
 
 
 # ============================================================================
@@ -497,26 +1224,282 @@ class IntelligentDatabaseGenerator:
     6. DataValidationAgent - Validates referential integrity
     """
     
-    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
+    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama", use_cache: Optional[bool] = None):
         self.model_name = model_name
         self.provider = provider
+        # Reuse LLM replies for identical prompts (defaults to ENABLE_PROMPT_CACHE)
+        if use_cache is None:
+            use_cache = ENABLE_PROMPT_CACHE
         # Specialized agents - only pass model_name for Ollama
         if provider == "ollama":
             self.pk_detector = PrimaryKeyDetectionAgent(model_name, provider)
             self.fk_detector = ForeignKeyDetectionAgent(model_name, provider)
             self.schema_enhancer = SchemaEnhancementAgent(model_name, provider)
             self.relationship_inferencer = RelationshipInferenceAgent(model_name, provider)
+            self.unified_agent = UnifiedSchemaAgent(model_name, provider)
             self.data_validator = DataValidationAgent(model_name, provider)
-            self.table_generator = TestDataGenerator(model_name, provider)
+            self.table_generator = TestDataGenerator(model_name, provider, use_cache=use_cache)
         else:
             self.pk_detector = PrimaryKeyDetectionAgent(provider=provider)
             self.fk_detector = ForeignKeyDetectionAgent(provider=provider)
             self.schema_enhancer = SchemaEnhancementAgent(provider=provider)
             self.relationship_inferencer = RelationshipInferenceAgent(provider=provider)
+            self.unified_agent = UnifiedSchemaAgent(provider=provider)
             self.data_validator = DataValidationAgent(provider=provider)
-            self.table_generator = TestDataGenerator(provider=provider)
+            self.table_generator = TestDataGenerator(provider=provider, use_cache=use_cache)
+        
+        if use_cache:
+            for agent in (self.pk_detector, self.fk_detector, self.schema_enhancer, self.relationship_inferencer, self.unified_agent):
+                agent.llm = CachedLLM(agent.llm, provider)
     
     def generate_database(self, db_schema: Dict[str, Any]) -> Dict[str, Any]:
+        tables = self._preprocess_tables(db_schema)
+        if db_schema.get("unified_agents"):
+            primary_keys = self._run_unified_agent(tables)
+        else:
+            primary_keys = self._run_agent_phases(tables, db_schema.get("batch_tables", False))
+        
+        # PHASE 5: Topological Sort
+        ordered_tables = self._order_tables(tables)
+        
+        # PHASE 6: Data Generation (Agent 5 - Coordinator)
+        print(f"\n PHASE 6: Data Generation Coordinator Agent...")
+        result = self._new_result(db_schema, primary_keys)
+        generated_tables = {}
+        checkpoint_dir = self._checkpoint_dir(db_schema)
+        
+        # Tables in one tier don't reference each other, so their LLM calls run
+        # on the pool; PK/FK injection then happens in generation order
+        idx = 0
+        workers = max(1, OLLAMA_NUM_PARALLEL)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for tier in self._generation_tiers(ordered_tables):
+                plans, idx = self._plan_tier(
+                    tier, idx, len(ordered_tables), primary_keys, generated_tables,
+                    result, checkpoint_dir, db_schema.get("resume", False)
+                )
+                # Generate data with parent table context
+                futures = [executor.submit(self._generate_plan, plan) for plan in plans]
+                for plan, future in zip(plans, futures):
+                    gen_result = future.exception() or future.result()
+                    self._complete_table(plan, gen_result, generated_tables, result, checkpoint_dir)
+        
+        return self._finish_generation(result, generated_tables, primary_keys)
+    
+    async def agenerate_database(self, db_schema: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async variant of generate_database().
+        
+        Within each agent phase the per-table LLM calls are independent, so they
+        run concurrently (at most OLLAMA_NUM_PARALLEL at a time). Phases still run
+        one after another since each builds on the previous phase's results.
+        Phase 6 likewise generates each dependency tier's tables concurrently.
+        
+        Set `batch_tables: true` in db_schema to ask for all tables' PKs and FKs
+        in one LLM call each (tables missing from the reply fall back to
+        per-table calls), or `unified_agents: true` to replace phases 1-4 with
+        one combined LLM call per table (UnifiedSchemaAgent).
+        """
+        tables = self._preprocess_tables(db_schema)
+        if db_schema.get("unified_agents"):
+            primary_keys = await self._arun_unified_agent(tables)
+        else:
+            primary_keys = await self._arun_agent_phases(tables, db_schema.get("batch_tables", False))
+        
+        # PHASE 5: Topological Sort
+        ordered_tables = self._order_tables(tables)
+        
+        # PHASE 6: Data Generation (Agent 5 - Coordinator)
+        print(f"\n PHASE 6: Data Generation Coordinator Agent...")
+        result = self._new_result(db_schema, primary_keys)
+        generated_tables = {}
+        checkpoint_dir = self._checkpoint_dir(db_schema)
+        semaphore = asyncio.Semaphore(max(1, OLLAMA_NUM_PARALLEL))
+        
+        idx = 0
+        for tier in self._generation_tiers(ordered_tables):
+            plans, idx = self._plan_tier(
+                tier, idx, len(ordered_tables), primary_keys, generated_tables,
+                result, checkpoint_dir, db_schema.get("resume", False)
+            )
+            # Generate data with parent table context
+            gen_results = await asyncio.gather(*(
+                self._agenerate_plan(plan, semaphore) for plan in plans
+            ), return_exceptions=True)
+            for plan, gen_result in zip(plans, gen_results):
+                self._complete_table(plan, gen_result, generated_tables, result, checkpoint_dir)
+        
+        return self._finish_generation(result, generated_tables, primary_keys)
+    
+    # ------------------------------------------------------------------------
+    # Phase Steps (shared by the sync and async pipelines)
+    # ------------------------------------------------------------------------
+    
+    def _run_agent_phases(self, tables: List[Dict[str, Any]], batch_tables: bool) -> Dict[str, str]:
+        """Phases 1-4 with one specialized agent per phase; returns the primary keys."""
+        # Per-table agent calls within a phase are independent blocking HTTP
+        # requests, so one thread pool fans them out (results kept in table order)
+        workers = max(1, min(len(tables), OLLAMA_NUM_PARALLEL))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # PHASE 1: Primary Key Detection (Agent 1)
+            print(f"\n PHASE 1: Primary Key Detection Agent...")
+            if batch_tables:
+                primary_keys = self.pk_detector.detect_primary_keys_bulk(tables)
+                pk_fields = [primary_keys[table["table_name"]] for table in tables]
+            else:
+                pk_fields = list(executor.map(self.pk_detector.detect_or_create_primary_key, tables))
+            primary_keys = {}
+            for table, pk_field in zip(tables, pk_fields):
+                primary_keys[table["table_name"]] = pk_field
+                print(f" {table['table_name']}.{pk_field} (Primary Key)")
+            
+            # PHASES 2-4 per table: FK detection, schema enhancement and rule
+            # inference only depend on Phase 1 and the table's own earlier
+            # steps, so each table moves on without waiting for the others
+            print(f"\n PHASES 2-4: Foreign Key Detection, Schema Enhancement and Relationship Inference Agents...")
+            bulk_fks = {}
+            tables_json = None
+            if batch_tables:
+                bulk_fks = self.fk_detector.detect_foreign_keys_bulk(tables, primary_keys)
+            else:
+                tables_json = self.fk_detector.describe_tables(tables, primary_keys)
+            list(executor.map(
+                lambda table: self._run_table_chain(
+                    table, tables, primary_keys, tables_json, bulk_fks.get(table["table_name"])
+                ),
+                tables
+            ))
+        
+        return primary_keys
+    
+    def _run_table_chain(
+        self,
+        table: Dict[str, Any],
+        tables: List[Dict[str, Any]],
+        primary_keys: Dict[str, str],
+        tables_json: Optional[str],
+        fks: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Phases 2-4 for one table (Phase 2 is skipped when fks are given)."""
+        if fks is None:
+            fks = self.fk_detector.detect_foreign_keys(table, tables, primary_keys, tables_json)
+        self._apply_foreign_keys(table, fks)
+        
+        suggested_fks = self.schema_enhancer.suggest_missing_relationships(table, tables, primary_keys, fks)
+        self._apply_suggestions(table, suggested_fks)
+        
+        additional_rules = self.relationship_inferencer.infer_additional_rules(
+            table, self._rules_analysis(table, primary_keys)
+        )
+        self._apply_rules(table, additional_rules)
+    
+    async def _arun_agent_phases(self, tables: List[Dict[str, Any]], batch_tables: bool) -> Dict[str, str]:
+        """Async variant of _run_agent_phases()."""
+        semaphore = asyncio.Semaphore(max(1, OLLAMA_NUM_PARALLEL))
+        
+        # PHASE 1: Primary Key Detection (Agent 1)
+        print(f"\n PHASE 1: Primary Key Detection Agent...")
+        if batch_tables:
+            primary_keys = await self.pk_detector.adetect_primary_keys_bulk(tables)
+            pk_fields = [primary_keys[table["table_name"]] for table in tables]
+        else:
+            pk_fields = await asyncio.gather(*(
+                self._bounded(semaphore, self.pk_detector.adetect_or_create_primary_key(table))
+                for table in tables
+            ))
+        primary_keys = {}
+        for table, pk_field in zip(tables, pk_fields):
+            primary_keys[table["table_name"]] = pk_field
+            print(f" {table['table_name']}.{pk_field} (Primary Key)")
+        
+        # PHASES 2-4 per table (see _run_agent_phases)
+        print(f"\n PHASES 2-4: Foreign Key Detection, Schema Enhancement and Relationship Inference Agents...")
+        bulk_fks = {}
+        tables_json = None
+        if batch_tables:
+            bulk_fks = await self.fk_detector.adetect_foreign_keys_bulk(tables, primary_keys)
+        else:
+            tables_json = self.fk_detector.describe_tables(tables, primary_keys)
+        await asyncio.gather(*(
+            self._arun_table_chain(
+                semaphore, table, tables, primary_keys, tables_json, bulk_fks.get(table["table_name"])
+            )
+            for table in tables
+        ))
+        
+        return primary_keys
+    
+    async def _arun_table_chain(
+        self,
+        semaphore: asyncio.Semaphore,
+        table: Dict[str, Any],
+        tables: List[Dict[str, Any]],
+        primary_keys: Dict[str, str],
+        tables_json: Optional[str],
+        fks: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Async variant of _run_table_chain(); each LLM call holds the semaphore."""
+        if fks is None:
+            fks = await self._bounded(
+                semaphore, self.fk_detector.adetect_foreign_keys(table, tables, primary_keys, tables_json)
+            )
+        self._apply_foreign_keys(table, fks)
+        
+        suggested_fks = await self._bounded(
+            semaphore, self.schema_enhancer.asuggest_missing_relationships(table, tables, primary_keys, fks)
+        )
+        self._apply_suggestions(table, suggested_fks)
+        
+        additional_rules = await self._bounded(
+            semaphore, self.relationship_inferencer.ainfer_additional_rules(
+                table, self._rules_analysis(table, primary_keys)
+            )
+        )
+        self._apply_rules(table, additional_rules)
+    
+    def _run_unified_agent(self, tables: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Phases 1-4 as a single fused LLM call per table; returns the primary keys."""
+        print(f"\n PHASES 1-4: Unified Schema Agent (keys, relationships and rules in one call per table)...")
+        workers = max(1, min(len(tables), OLLAMA_NUM_PARALLEL))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            analyses = list(executor.map(lambda table: self.unified_agent.analyze(table, tables), tables))
+        return self._apply_unified(tables, analyses)
+    
+    async def _arun_unified_agent(self, tables: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Async variant of _run_unified_agent()."""
+        print(f"\n PHASES 1-4: Unified Schema Agent (keys, relationships and rules in one call per table)...")
+        semaphore = asyncio.Semaphore(max(1, OLLAMA_NUM_PARALLEL))
+        analyses = await asyncio.gather(*(
+            self._bounded(semaphore, self.unified_agent.aanalyze(table, tables))
+            for table in tables
+        ))
+        return self._apply_unified(tables, analyses)
+    
+    def _apply_unified(self, tables: List[Dict[str, Any]], analyses: List[Dict[str, Any]]) -> Dict[str, str]:
+        primary_keys = {}
+        for table, analysis in zip(tables, analyses):
+            primary_keys[table["table_name"]] = analysis["primary_key"]
+            print(f" {table['table_name']}.{analysis['primary_key']} (Primary Key)")
+        
+        # PKs were only guessed while the tables were analysed in parallel, so
+        # point every reference at the referenced table's final primary key
+        for table, analysis in zip(tables, analyses):
+            for fk in analysis["foreign_keys"]:
+                fk["references_field"] = primary_keys.get(fk["references_table"], fk["references_field"])
+            for suggestion in analysis["suggested_foreign_keys"]:
+                suggestion["references_field"] = primary_keys.get(suggestion["references_table"], suggestion["references_field"])
+            self._apply_foreign_keys(table, analysis["foreign_keys"])
+            self._apply_suggestions(table, analysis["suggested_foreign_keys"])
+            self._apply_rules(table, analysis["generation_rules"])
+        return primary_keys
+    
+    @staticmethod
+    async def _bounded(semaphore: asyncio.Semaphore, coro):
+        async with semaphore:
+            return await coro
+    
+    def _preprocess_tables(self, db_schema: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Normalize names and drop duplicate fields (Phase 0)."""
         tables = db_schema.get("tables", [])
         
         if not tables:
@@ -538,207 +1521,375 @@ class IntelligentDatabaseGenerator:
             table_name = table["table_name"]
             fields = table.get("fields", [])
             
-            # Remove duplicate field names
-            seen_names = set()
-            unique_fields = []
+            # Remove duplicate field names (first occurrence wins, order kept)
+            unique_fields = {}
             for field in fields:
-                field_name = field.get("name", "").strip()
-                if field_name not in seen_names:
-                    seen_names.add(field_name)
-                    unique_fields.append(field)
+                field_name = field["name"]
+                if field_name not in unique_fields:
+                    unique_fields[field_name] = field
                 else:
                     print(f" Removed duplicate field '{field_name}' from {table_name}")
             
-            table["fields"] = unique_fields
-        
-        # PHASE 1: Primary Key Detection (Agent 1)
-        print(f"\n PHASE 1: Primary Key Detection Agent...")
-        primary_keys = {}
-        for table in tables:
-            table_name = table["table_name"]
-            pk_field = self.pk_detector.detect_or_create_primary_key(table)
-            primary_keys[table_name] = pk_field
-            print(f" {table_name}.{pk_field} (Primary Key)")
+            table["fields"] = list(unique_fields.values())
         
-        # PHASE 2: Foreign Key Detection (Agent 2)
-        print(f"\n PHASE 2: Foreign Key Detection Agent...")
-        detected_fks = {}
-        for table in tables:
-            table_name = table["table_name"]
-            fks = self.fk_detector.detect_foreign_keys(table, tables, primary_keys)
-            detected_fks[table_name] = fks
+        return tables
+    
+    @staticmethod
+    def _fields_by_name(table: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Field lookup by name; the first field wins if a name repeats."""
+        field_by_name = {}
+        for field in table["fields"]:
+            field_by_name.setdefault(field["name"], field)
+        return field_by_name
+    
+    def _apply_foreign_keys(self, table: Dict[str, Any], fks: List[Dict[str, Any]]):
+        """Mark the FK fields detected in Phase 2 with their references."""
+        table_name = table["table_name"]
+        field_by_name = self._fields_by_name(table)
+        for fk in fks:
+            field_name = fk["field"]
+            ref_table = fk["references_table"]
+            ref_field = fk["references_field"]
             
-            # Apply detected FKs to fields
-            for fk in fks:
-                field_name = fk["field"]
-                ref_table = fk["references_table"]
-                ref_field = fk["references_field"]
-                
-                # Find and update the field
-                for field in table["fields"]:
-                    if field["name"] == field_name:
-                        field["references"] = {
-                            "table": ref_table,
-                            "field": ref_field
-                        }
-                        print(f" Detected: {table_name}.{field_name} → {ref_table}.{ref_field}")
-                        break
-        
-        # PHASE 3: Schema Enhancement (Agent 3)
-        print(f"\n PHASE 3: Schema Enhancement Agent (Adding Missing Relationships)...")
-        for table in tables:
-            table_name = table["table_name"]
-            existing_fks = detected_fks.get(table_name, [])
+            # Find and update the field
+            field = field_by_name.get(field_name)
+            if field is not None:
+                field["references"] = {
+                    "table": ref_table,
+                    "field": ref_field
+                }
+                print(f" Detected: {table_name}.{field_name} → {ref_table}.{ref_field}")
+    
+    def _apply_suggestions(self, table: Dict[str, Any], suggested_fks: List[Dict[str, Any]]):
+        """Add (or link) the FK fields suggested in Phase 3."""
+        table_name = table["table_name"]
+        field_by_name = self._fields_by_name(table)
+        for suggestion in suggested_fks:
+            field_name = suggestion["field_name"]
             
-            # Get suggestions for missing FK fields
-            suggested_fks = self.schema_enhancer.suggest_missing_relationships(
-                table, tables, primary_keys, existing_fks
-            )
+            # Check if field already exists
+            field = field_by_name.get(field_name)
             
-            for suggestion in suggested_fks:
-                field_name = suggestion["field_name"]
-                
-                # Check if field already exists
-                field_exists = any(f["name"] == field_name for f in table["fields"])
-                
-                if field_exists:
-                    # Just add the reference
-                    for field in table["fields"]:
-                        if field["name"] == field_name:
-                            field["references"] = {
-                                "table": suggestion["references_table"],
-                                "field": suggestion["references_field"]
-                            }
-                            print(f"   ✨ Enhanced: {table_name}.{field_name} → {suggestion['references_table']}.{suggestion['references_field']}")
-                            print(f"      Reason: {suggestion['reasoning']}")
-                            break
-                else:
-                    # Add new FK field
-                    new_field = {
-                        "name": field_name,
-                        "type": suggestion["field_type"],
-                        "rules": f"foreign key to {suggestion['references_table']}",
-                        "references": {
-                            "table": suggestion["references_table"],
-                            "field": suggestion["references_field"]
-                        },
-                        "_ai_generated": True
-                    }
-                    table["fields"].append(new_field)
-                    print(f"   ✨ Added: {table_name}.{field_name} → {suggestion['references_table']}.{suggestion['references_field']}")
-                    print(f"      Reason: {suggestion['reasoning']}")
-        
-        # PHASE 4: Relationship Inference (Agent 4)
-        print(f"\nPHASE 4: Relationship Inference Agent (Business Rules)...")
-        for table in tables:
-            table_name = table["table_name"]
-            # Create a simple analysis dict for compatibility
-            analysis = {
-                "primary_key": primary_keys.get(table_name),
-                "foreign_keys": []
-            }
-            additional_rules = self.relationship_inferencer.infer_additional_rules(table, analysis)
-            table["_inferred_rules"] = additional_rules
-            print(f"  {table_name}: {additional_rules[:100]}...")
-        
-        # PHASE 5: Topological Sort
+            if field is not None:
+                # Just add the reference
+                field["references"] = {
+                    "table": suggestion["references_table"],
+                    "field": suggestion["references_field"]
+                }
+                print(f"   ✨ Enhanced: {table_name}.{field_name} → {suggestion['references_table']}.{suggestion['references_field']}")
+                print(f"      Reason: {suggestion['reasoning']}")
+            else:
+                # Add new FK field
+                new_field = {
+                    "name": field_name,
+                    "type": suggestion["field_type"],
+                    "rules": f"foreign key to {suggestion['references_table']}",
+                    "references": {
+                        "table": suggestion["references_table"],
+                        "field": suggestion["references_field"]
+                    },
+                    "_ai_generated": True
+                }
+                table["fields"].append(new_field)
+                field_by_name[field_name] = new_field
+                print(f"   ✨ Added: {table_name}.{field_name} → {suggestion['references_table']}.{suggestion['references_field']}")
+                print(f"      Reason: {suggestion['reasoning']}")
+    
+    def _rules_analysis(self, table: Dict[str, Any], primary_keys: Dict[str, str]) -> Dict[str, Any]:
+        # Create a simple analysis dict for compatibility
+        return {
+            "primary_key": primary_keys.get(table["table_name"]),
+            "foreign_keys": []
+        }
+    
+    def _apply_rules(self, table: Dict[str, Any], additional_rules: str):
+        table["_inferred_rules"] = additional_rules
+        print(f"  {table['table_name']}: {additional_rules[:100]}...")
+    
+    def _order_tables(self, tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         print(f"\nPHASE 5: Determining Generation Order...")
         try:
             ordered_tables = self._topo_sort_tables(tables)
             print(f"   Generation order: {' → '.join([t['table_name'] for t in ordered_tables])}")
         except Exception as e:
             raise Exception(f"Failed to sort tables: {str(e)}")
-        
-        # PHASE 6: Data Generation (Agent 5 - Coordinator)
-        print(f"\n PHASE 6: Data Generation Coordinator Agent...")
-        result = {
+        return ordered_tables
+    
+    def _new_result(self, db_schema: Dict[str, Any], primary_keys: Dict[str, str]) -> Dict[str, Any]:
+        return {
             "db_name": db_schema.get("db_name", "database"),
             "tables": {},
             "counts": {},
             "generation_order": [],
-            "primary_keys": primary_keys
+            "primary_keys": primary_keys,
+            "failed_tables": {}
         }
-        
-        generated_tables = {}
-        
-        for idx, table in enumerate(ordered_tables, 1):
+    
+    def _generation_tiers(self, ordered_tables: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Split the generation order into runs of tables that don't reference each
+        other. Every parent that precedes a table in the order lands in an earlier
+        tier, so each table still sees the same parent rows as when generating
+        one table at a time, and the overall order is unchanged.
+        """
+        tiers = []
+        current, current_names = [], set()
+        for table in ordered_tables:
+            parents = {
+                f["references"].get("table")
+                for f in table.get("fields", [])
+                if f.get("references")
+            }
+            parents.discard(table["table_name"])
+            if parents & current_names:
+                tiers.append(current)
+                current, current_names = [], set()
+            current.append(table)
+            current_names.add(table["table_name"])
+        if current:
+            tiers.append(current)
+        return tiers
+    
+    def _plan_tier(
+        self,
+        tier: List[Dict[str, Any]],
+        idx: int,
+        total: int,
+        primary_keys: Dict[str, str],
+        generated_tables: Dict[str, List[Dict]],
+        result: Dict[str, Any],
+        checkpoint_dir: Optional[str],
+        resume: bool
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Plan the tables of one tier that still need generating. Checkpointed
+        tables are restored when resuming, and tables whose parent failed are
+        recorded as failed too rather than generated with missing FKs.
+        """
+        plans = []
+        for table in tier:
+            idx += 1
             table_name = table["table_name"]
-            # Convert to integers to handle string inputs from frontend
-            num_records = int(table.get("num_records", 5))
-            correct_count = int(table.get("correct_num_records", num_records))
-            wrong_count = int(table.get("wrong_num_records", max(0, num_records - correct_count)))
-            
-            print(f"\n[{idx}/{len(ordered_tables)}] Generating: {table_name}")
-            print(f"   Records: {num_records} (valid: {correct_count}, invalid: {wrong_count})")
-            
-            # Combine user context with inferred rules
-            user_context = table.get("additional_context", "")
-            inferred_rules = table.get("_inferred_rules", "")
-            combined_rules = f"{user_context}. {inferred_rules}".strip()
-            
-            schema_fields = table.get("fields", [])
-            pk_field = primary_keys.get(table_name, "id")
-            fk_fields = [f for f in schema_fields if f.get("references")]
             
-            # Remove PK and FK fields from LLM generation (they'll be auto-generated/injected)
-            fields_for_llm = [
-                f for f in schema_fields 
-                if f.get("name") != pk_field and not f.get("references")
-            ]
+            rows = self._load_checkpoint(checkpoint_dir, table_name) if resume else None
+            if rows is not None:
+                print(f"\n[{idx}/{total}] Restored from checkpoint: {table_name} ({len(rows)} records)")
+                self._record_table(table_name, rows, generated_tables, result)
+                continue
             
-            # Prepare parent tables data context for logical consistency
-            parent_tables_context = {}
-            for fk_field in fk_fields:
-                ref = fk_field.get("references")
-                if ref:
-                    parent_table_name = ref["table"]
-                    if parent_table_name in generated_tables:
-                        parent_tables_context[parent_table_name] = generated_tables[parent_table_name]
+            failed_parents = sorted({
+                f["references"]["table"]
+                for f in table.get("fields", [])
+                if f.get("references") and f["references"].get("table") in result["failed_tables"]
+            })
+            if failed_parents:
+                print(f"\n[{idx}/{total}] Skipping {table_name}: parent table(s) {', '.join(failed_parents)} failed")
+                result["failed_tables"][table_name] = f"Parent table(s) not generated: {', '.join(failed_parents)}"
+                continue
             
-            try:
-                # Generate data with parent table context
-                gen_result = self.table_generator.generate_data(
-                    schema_fields=fields_for_llm,
-                    num_records=num_records,
-                    correct_num_records=correct_count,
-                    wrong_num_records=wrong_count,
-                    additional_rules=combined_rules,
-                    parent_tables_data=parent_tables_context if parent_tables_context else None
-                )
-                
-                rows = gen_result["data"]
-                
-                # Generate PKs
-                if pk_field:
-                    self._generate_primary_keys(rows, pk_field)
-                    print(f"   ✓ Generated primary keys: {pk_field}")
-                
-                # Inject FKs
-                if fk_fields:
-                    self._inject_foreign_keys(rows, fk_fields, generated_tables, correct_count, pk_field)
-                    fk_names = [f["name"] for f in fk_fields]
-                    print(f"   ✓ Injected foreign keys: {', '.join(fk_names)}")
-                
-                # Show sample records with all fields (including FKs)
-                print(f"\n    Sample records (with FKs):")
-                for i in range(min(3, len(rows))):
-                    print(f"      Record {i+1}: {rows[i]}")
-                
-                generated_tables[table_name] = rows
-                result["tables"][table_name] = rows
-                result["counts"][table_name] = {
-                    "total": len(rows),
-                    "valid": correct_count,
-                    "invalid": wrong_count
-                }
-                result["generation_order"].append(table_name)
-                
-                print(f"    Completed: {len(rows)} records")
-                
-            except Exception as e:
-                print(f"    Error: {str(e)}")
-                raise
+            plans.append(self._prepare_table(table, idx, total, primary_keys, generated_tables))
+        return plans, idx
+    
+    def _prepare_table(
+        self,
+        table: Dict[str, Any],
+        idx: int,
+        total: int,
+        primary_keys: Dict[str, str],
+        generated_tables: Dict[str, List[Dict]]
+    ) -> Dict[str, Any]:
+        """Work out record counts, PK/FK fields and parent context for one table."""
+        table_name = table["table_name"]
+        # Convert to integers to handle string inputs from frontend
+        num_records = int(table.get("num_records", 5))
+        correct_count = int(table.get("correct_num_records", num_records))
+        wrong_count = int(table.get("wrong_num_records", max(0, num_records - correct_count)))
+        
+        print(f"\n[{idx}/{total}] Generating: {table_name}")
+        print(f"   Records: {num_records} (valid: {correct_count}, invalid: {wrong_count})")
         
+        # Combine user context with inferred rules
+        user_context = table.get("additional_context", "")
+        inferred_rules = table.get("_inferred_rules", "")
+        combined_rules = f"{user_context}. {inferred_rules}".strip()
+        
+        schema_fields = table.get("fields", [])
+        pk_field = primary_keys.get(table_name, "id")
+        fk_fields = [f for f in schema_fields if f.get("references")]
+        
+        # Remove PK and FK fields from LLM generation (they'll be auto-generated/injected)
+        fields_for_llm = [
+            f for f in schema_fields 
+            if f.get("name") != pk_field and not f.get("references")
+        ]
+        
+        # Prepare parent tables data context for logical consistency
+        parent_tables_context = {}
+        for fk_field in fk_fields:
+            ref = fk_field.get("references")
+            if ref:
+                parent_table_name = ref["table"]
+                if parent_table_name in generated_tables:
+                    parent_tables_context[parent_table_name] = generated_tables[parent_table_name]
+        
+        return {
+            "table_name": table_name,
+            "correct_count": correct_count,
+            "wrong_count": wrong_count,
+            "pk_field": pk_field,
+            "fk_fields": fk_fields,
+            # Only PK/FK columns (e.g. join tables): nothing for the LLM to write
+            "local": not fields_for_llm,
+            "generate_kwargs": {
+                "schema_fields": fields_for_llm,
+                "num_records": num_records,
+                "correct_num_records": correct_count,
+                "wrong_num_records": wrong_count,
+                "additional_rules": combined_rules,
+                "parent_tables_data": parent_tables_context if parent_tables_context else None
+            }
+        }
+    
+    def _generate_plan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        if plan["local"]:
+            return self._synthesize_key_rows(plan)
+        return self.table_generator.generate_data(**plan["generate_kwargs"])
+    
+    async def _agenerate_plan(self, plan: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        if plan["local"]:
+            return self._synthesize_key_rows(plan)
+        return await self._bounded(semaphore, self.table_generator.agenerate_data(**plan["generate_kwargs"]))
+    
+    def _synthesize_key_rows(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Empty rows for a table whose columns are all keys; _finish_table
+        fills in the PK and FKs (breaking the FKs of the invalid rows)."""
+        kwargs = plan["generate_kwargs"]
+        print(f"   ⚡ Only key columns in '{plan['table_name']}': rows built locally (no LLM call)")
+        rows = [{"is_valid": i < kwargs["correct_num_records"]} for i in range(kwargs["num_records"])]
+        return {"data": rows, "count": len(rows)}
+    
+    def _finish_table(
+        self,
+        plan: Dict[str, Any],
+        gen_result: Dict[str, Any],
+        generated_tables: Dict[str, List[Dict]],
+        result: Dict[str, Any]
+    ):
+        """Assign PKs, inject FKs and record the generated rows for one table."""
+        table_name = plan["table_name"]
+        pk_field = plan["pk_field"]
+        fk_fields = plan["fk_fields"]
+        correct_count = plan["correct_count"]
+        
+        rows = gen_result["data"]
+        
+        # Generate PKs and inject FKs in a single pass over the rows
+        self._finalize_rows(rows, pk_field, fk_fields, generated_tables, correct_count)
+        if pk_field:
+            print(f"   ✓ Generated primary keys: {pk_field}")
+        if fk_fields:
+            fk_names = [f["name"] for f in fk_fields]
+            print(f"   ✓ Injected foreign keys: {', '.join(fk_names)}")
+        
+        # Show sample records with all fields (including FKs)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("\n    Sample records (with FKs):")
+            for i in range(min(3, len(rows))):
+                logger.debug("      Record %d: %s", i + 1, rows[i])
+        
+        self._record_table(table_name, rows, generated_tables, result, correct_count, plan["wrong_count"])
+        
+        print(f"    Completed: {len(rows)} records")
+    
+    def _record_table(
+        self,
+        table_name: str,
+        rows: List[Dict],
+        generated_tables: Dict[str, List[Dict]],
+        result: Dict[str, Any],
+        valid: int = None,
+        invalid: int = None
+    ):
+        if valid is None:
+            valid = sum(1 for row in rows if row.get("is_valid"))
+            invalid = len(rows) - valid
+        generated_tables[table_name] = rows
+        result["tables"][table_name] = rows
+        result["counts"][table_name] = {
+            "total": len(rows),
+            "valid": valid,
+            "invalid": invalid
+        }
+        result["generation_order"].append(table_name)
+    
+    def _complete_table(
+        self,
+        plan: Dict[str, Any],
+        gen_result: Any,
+        generated_tables: Dict[str, List[Dict]],
+        result: Dict[str, Any],
+        checkpoint_dir: Optional[str]
+    ):
+        """
+        Finish and checkpoint one table. A failure (gen_result may be the
+        exception raised while generating) is recorded in the result so the
+        remaining tables still get generated.
+        """
+        table_name = plan["table_name"]
+        try:
+            if isinstance(gen_result, BaseException):
+                raise gen_result
+            self._finish_table(plan, gen_result, generated_tables, result)
+        except Exception as e:
+            print(f"    Error generating {table_name}: {str(e)}")
+            result["failed_tables"][table_name] = str(e)
+            return
+        if checkpoint_dir:
+            self._save_checkpoint(checkpoint_dir, table_name, generated_tables[table_name])
+    
+    @staticmethod
+    def _checkpoint_dir(db_schema: Dict[str, Any]) -> Optional[str]:
+        """This database's checkpoint directory, or None without CHECKPOINT_DIR."""
+        if not CHECKPOINT_DIR:
+            return None
+        # db_name comes from the request; keep it to one safe path component
+        db_name = re.sub(r'[^\w-]', '_', str(db_schema.get("db_name", "database")))
+        return os.path.join(CHECKPOINT_DIR, db_name)
+    
+    @staticmethod
+    def _checkpoint_path(checkpoint_dir: str, table_name: str) -> str:
+        return os.path.join(checkpoint_dir, re.sub(r'[^\w-]', '_', table_name) + ".json")
+    
+    def _load_checkpoint(self, checkpoint_dir: Optional[str], table_name: str) -> Optional[List[Dict]]:
+        if not checkpoint_dir:
+            return None
+        try:
+            with open(self._checkpoint_path(checkpoint_dir, table_name), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"     Warning: Ignoring unreadable checkpoint for '{table_name}': {str(e)}")
+            return None
+    
+    def _save_checkpoint(self, checkpoint_dir: str, table_name: str, rows: List[Dict]):
+        path = self._checkpoint_path(checkpoint_dir, table_name)
+        try:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            # Write then rename so an interrupted run never leaves a torn file
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(rows, f, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"     Warning: Could not checkpoint '{table_name}': {str(e)}")
+    
+    def _finish_generation(
+        self,
+        result: Dict[str, Any],
+        generated_tables: Dict[str, List[Dict]],
+        primary_keys: Dict[str, str]
+    ) -> Dict[str, Any]:
         # PHASE 7: Validation (Agent 6)
         print(f"\n PHASE 7: Data Validation Agent...")
         # Build schema_analyses for validation compatibility
@@ -750,6 +1901,10 @@ class IntelligentDatabaseGenerator:
             }
         
         validation_report = self.data_validator.validate_database(generated_tables, schema_analyses_for_validation)
+        # A partial database is never reported as valid
+        for table_name, error in result["failed_tables"].items():
+            validation_report["overall_valid"] = False
+            validation_report["errors"].append(f"{table_name}: not generated ({error})")
         result["validation"] = validation_report
         
         result["total_records"] = sum(len(rows) for rows in generated_tables.values())
@@ -758,6 +1913,8 @@ class IntelligentDatabaseGenerator:
         print(f"\n{'='*70}")
         print(f"🎉 DATABASE GENERATION COMPLETE!")
         print(f"Total: {result['total_records']} records across {result['total_tables']} tables")
+        if result["failed_tables"]:
+            print(f"Failed tables: {', '.join(result['failed_tables'])}")
         print(f"Validation: {'PASSED' if validation_report['overall_valid'] else '⚠️  HAS ISSUES'}")
         print(f"{'='*70}\n")
         
@@ -789,16 +1946,16 @@ class IntelligentDatabaseGenerator:
                 ref = field.get("references")
                 if ref:
                     parent = ref.get("table")
-                    if parent and parent in name_to_table and parent != child:
+                    if parent and parent in name_to_table and parent != child and child not in parents_to_children[parent]:
                         parents_to_children[parent].add(child)
-                        in_degree[child] = in_degree.get(child, 0) + 1
+                        in_degree[child] += 1
 
         # Kahn's algorithm
-        queue = [name for name, deg in in_degree.items() if deg == 0]
+        queue = deque(name for name, deg in in_degree.items() if deg == 0)
         order_names = []
 
         while queue:
-            node = queue.pop(0)
+            node = queue.popleft()
             order_names.append(node)
             for child in list(parents_to_children.get(node, [])):
                 in_degree[child] -= 1
@@ -821,20 +1978,43 @@ class IntelligentDatabaseGenerator:
         ordered_tables = [name_to_table[name] for name in order_names if name in name_to_table]
         return ordered_tables
     
-    def _generate_primary_keys(self, rows: List[Dict], pk_field: str, start_id: int = 1):
-        """Generate sequential primary keys."""
-        for i, row in enumerate(rows):
-            row[pk_field] = start_id + i
+    def _finalize_rows(
+        self,
+        rows: List[Dict],
+        pk_field: Optional[str],
+        fk_fields: List[Dict],
+        generated_tables: Dict[str, List[Dict]],
+        correct_count: int,
+        start_id: int = 1
+    ):
+        """Assign sequential primary keys and foreign key values in one pass."""
+        fk_plan = self._build_fk_plan(len(rows), fk_fields, generated_tables, correct_count, pk_field)
+        for index, row in enumerate(rows):
+            if pk_field:
+                row[pk_field] = start_id + index
+            for fk_name, values in fk_plan:
+                row[fk_name] = values[index]
+        
+        # Show sample of injected values
+        if fk_plan and logger.isEnabledFor(logging.DEBUG):
+            for fk_name, _ in fk_plan:
+                logger.debug("         Sample injected %s: %s", fk_name, [row[fk_name] for row in rows[:3]])
     
-    def _inject_foreign_keys(
-        self, 
-        rows: List[Dict], 
+    def _build_fk_plan(
+        self,
+        num_rows: int,
         fk_fields: List[Dict],
         generated_tables: Dict[str, List[Dict]],
         correct_count: int,
         pk_field: str = None
-    ):
-        """Inject foreign key values."""
+    ) -> List[Tuple[str, List[Any]]]:
+        """Precompute the full column of values for each injectable FK.
+        
+        Valid rows get parent keys, invalid rows get broken values.
+        """
+        fk_plan = []
+        # Several FKs may point at the same parent key; collect its values once
+        parent_keys_cache = {}
         for fk_field in fk_fields:
             fk_name = fk_field["name"]
             ref = fk_field.get("references")
@@ -851,7 +2031,10 @@ class IntelligentDatabaseGenerator:
                 print(f"     Warning: Parent table '{parent_table_name}' has no data")
                 continue
             
-            parent_keys = [p[parent_field_name] for p in parent_rows if parent_field_name in p]
+            parent_keys = parent_keys_cache.get((parent_table_name, parent_field_name))
+            if parent_keys is None:
+                parent_keys = [p[parent_field_name] for p in parent_rows if parent_field_name in p]
+                parent_keys_cache[(parent_table_name, parent_field_name)] = parent_keys
             
             if not parent_keys:
                 print(f"     Warning: No valid keys in '{parent_table_name}.{parent_field_name}'")
@@ -863,20 +2046,22 @@ class IntelligentDatabaseGenerator:
                 continue
 
             print(f"        FK '{fk_name}' → {parent_table_name}.{parent_field_name}")
-            print(f"           Available parent values: {parent_keys[:5]}{'...' if len(parent_keys) > 5 else ''}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "           Available parent values: %s%s",
+                    parent_keys[:5], '...' if len(parent_keys) > 5 else ''
+                )
 
-            # Valid records get real FK values
-            for i in range(min(len(rows), correct_count)):
-                rows[i][fk_name] = random.choice(parent_keys)
+            # Valid records get real FK values (one batched draw per FK)
+            values = random.choices(parent_keys, k=min(num_rows, correct_count))
             
             # Invalid records get broken FK values
-            for i in range(correct_count, len(rows)):
-                if fk_field.get("type") in ["integer", "int", "number"]:
-                    rows[i][fk_name] = 999999 + i
-                else:
-                    rows[i][fk_name] = f"INVALID_FK_{parent_table_name.upper()}_{i}"
+            if fk_field.get("type") in ("integer", "int", "number"):
+                values.extend(range(999999 + correct_count, 999999 + num_rows))
+            else:
+                invalid_prefix = f"INVALID_FK_{parent_table_name.upper()}_"
+                values.extend(f"{invalid_prefix}{i}" for i in range(correct_count, num_rows))
             
-            # Show sample of injected values
-            sample_injected = [rows[i][fk_name] for i in range(min(3, len(rows)))]
-            print(f"         Sample injected: {sample_injected}")
+            fk_plan.append((fk_name, values))
+        return fk_plan
 
@@ -0,0 +1,56 @@
+"""Locate JSON values embedded in LLM replies.
+
+Models often wrap their JSON in prose or markdown, so callers pull out the
+first balanced array/object before handing it to a JSON parser. Brackets
+inside quoted strings and escaped characters are ignored.
+"""
+from __future__ import annotations
+
+import re
+
+# Structural characters for each scan; everything else is skipped by the
+# regex engine in C, so the Python loop runs per token rather than per char
+_ARRAY_TOKEN_RE = re.compile(r'["\[\]\\]')
+_OBJECT_TOKEN_RE = re.compile(r'["{}\\]')
+
+
+def _extract_balanced(text: str, open_ch: str, close_ch: str, token_re: re.Pattern) -> str | None:
+    if not text:
+        return None
+    start = text.find(open_ch)
+    # No closing bracket after the first opening one means a truncated value;
+    # bail out before scanning the whole text
+    if start == -1 or text.rfind(close_ch) < start:
+        return None
+    depth = 0
+    in_str = False
+    escaped_pos = -1
+    for m in token_re.finditer(text, start):
+        i = m.start()
+        ch = m.group()
+        if in_str:
+            if i == escaped_pos:
+                continue
+            if ch == '\\':
+                escaped_pos = i + 1
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch == open_ch:
+            depth += 1
+        elif ch == close_ch:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def extract_first_json_array(text: str) -> str | None:
+    """Return the first balanced JSON array in `text`, or None."""
+    return _extract_balanced(text, '[', ']', _ARRAY_TOKEN_RE)
+
+
+def extract_first_json_object(text: str) -> str | None:
+    """Return the first balanced JSON object in `text`, or None."""
+    return _extract_balanced(text, '{', '}', _OBJECT_TOKEN_RE)
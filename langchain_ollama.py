@@ -8,23 +8,126 @@ from Ollama and returns the concatenated text content.
 """
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
+import os
 try:
     import requests
+    from requests.adapters import HTTPAdapter
 except Exception:  # pragma: no cover - helpful fallback message
     requests = None
-from typing import Optional
+try:
+    import orjson
+except Exception:
+    orjson = None
+from typing import Iterator, Optional
+
+from json_extract import extract_first_json_array
+
+# Upper bound on simultaneous requests from this process (see db_generator)
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+# OLLAMA_DEBUG=1 prints the status and headers of every response
+OLLAMA_DEBUG = os.getenv("OLLAMA_DEBUG", "").lower() in ("1", "true", "yes")
+
+# Ollama streams one small JSON object per token; orjson decodes those (bytes
+# or str) several times faster than json and raises ValueError subclasses too
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+# Text keys accepted from non-Ollama servers when 'response' is absent
+_FALLBACK_TEXT_KEYS = ('token', 'text', 'content', 'output')
+
+
+def _token_text(obj) -> Optional[str]:
+    """Text of one parsed stream line, or None if it carries none.
+
+    Ollama puts each token under 'response'; other streaming servers use one
+    of _FALLBACK_TEXT_KEYS.
+    """
+    if not isinstance(obj, dict):
+        return None
+    val = obj.get('response')
+    if isinstance(val, str):
+        return val
+    return next((v for v in map(obj.get, _FALLBACK_TEXT_KEYS) if isinstance(v, str)), None)
 
 
 class OllamaError(Exception):
     pass
 
 
+# Most bytes read from a streamed body at once. read1 returns whatever has
+# already arrived up to this size, so tokens are never held back.
+_READ_SIZE = 65536
+
+
+def _iter_ndjson_lines(resp) -> Iterator[bytes]:
+    """Yield the non-blank lines of a streamed response body as bytes.
+
+    Reads the raw urllib3 stream with read1 and splits on newlines with
+    bytes.find, instead of iter_lines' small chunks and per-chunk splitting.
+    """
+    read1 = getattr(resp.raw, 'read1', None)
+    if read1 is None:
+        # urllib3 < 2 has no read1; chunk_size=None yields data as it arrives
+        chunks = resp.iter_content(chunk_size=None)
+    else:
+        resp.raw.decode_content = True
+        chunks = iter(lambda: read1(_READ_SIZE) or b'', b'')
+
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        start = 0
+        nl = buf.find(b'\n')
+        while nl >= 0:
+            line = bytes(buf[start:nl]).strip()
+            if line:
+                yield line
+            start = nl + 1
+            nl = buf.find(b'\n', start)
+        del buf[:start]
+    line = bytes(buf).strip()
+    if line:
+        yield line
+
+
+@functools.lru_cache(maxsize=1)
+def _get_session():
+    """One pooled HTTP session shared by every OllamaLLM in the process.
+
+    Agents and table generators each own a client, but they all talk to the
+    same server, so sharing the pool lets concurrent calls reuse keep-alive
+    connections instead of opening a new one per request.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=max(10, 2 * OLLAMA_NUM_PARALLEL))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class OllamaLLM:
-    def __init__(self, model: str = "llama3:latest", temperature: float = 0.7, host: str = "http://127.0.0.1:11434"):
+    def __init__(
+        self,
+        model: str = "llama3:latest",
+        temperature: float = 0.7,
+        host: str = "http://127.0.0.1:11434",
+        keep_alive: Optional[str] = None,
+        num_ctx: Optional[int] = None,
+        format: Optional[str] = None,
+    ):
         self.model = model
         self.temperature = temperature
         self.host = host.rstrip('/')
+        # How long Ollama keeps the model loaded after a request (e.g. "30m");
+        # None leaves the server default (~5 minutes).
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        # "json" makes Ollama constrain decoding to a valid JSON value
+        self.format = format
 
     def _post_generate(self, prompt: str, timeout: Optional[float] = 11300.0):
         url = f"{self.host}/api/generate"
@@ -33,6 +136,12 @@ class OllamaLLM:
             "prompt": prompt,
             "temperature": float(self.temperature)
         }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if self.num_ctx is not None:
+            payload["options"] = {"num_ctx": int(self.num_ctx)}
+        if self.format is not None:
+            payload["format"] = self.format
 
         if requests is None:
             raise OllamaError(
@@ -42,7 +151,7 @@ class OllamaLLM:
 
         try:
             # Use stream=True to support NDJSON/streaming responses from Ollama
-            resp = requests.post(url, json=payload, stream=True, timeout=timeout)
+            resp = _get_session().post(url, json=payload, stream=True, timeout=timeout)
         except Exception as e:
             raise OllamaError(f"Failed to connect to Ollama at {url}: {e}")
 
@@ -54,7 +163,6 @@ class OllamaLLM:
             except Exception:
                 content = resp.text
             raise OllamaError(f"Ollama returned status {resp.status_code}: {content}")
-
         return resp
 
     def invoke(self, prompt: str, timeout: Optional[float] = None) -> str:
@@ -67,257 +175,93 @@ class OllamaLLM:
             timeout = 300.0
         resp = self._post_generate(prompt, timeout=timeout)
 
-        # Debug: print raw response metadata + body snippet to help diagnose format issues
-        try:
-            status = getattr(resp, 'status_code', None)
-            headers = getattr(resp, 'headers', {})
-            # resp.text is safe to call even if stream=True
-            full_text = resp.text if hasattr(resp, 'text') else ''
-            snippet = (full_text or '')[:1000]
-        except Exception:
-            status = None
-            headers = {}
-            snippet = ''
-
-        def _safe_print(s: str) -> None:
-            try:
-                print(s)
-            except Exception:
-                try:
-                    print(s.encode('utf-8', errors='replace').decode('utf-8'))
-                except Exception:
-                    print(repr(s))
-
-        _safe_print(f"[OLLAMA DEBUG] status={status} headers_keys={list(headers.keys())} body_snippet={snippet!r}")
+        if OLLAMA_DEBUG:
+            # Metadata only: reading resp.text here would buffer the whole
+            # streamed body before parsing starts
+            print(f"[OLLAMA DEBUG] status={resp.status_code} headers_keys={list(resp.headers.keys())}")
 
         text_parts = []
 
-        # If response content is already available as text (NDJSON or full body),
-        # prefer parsing it first to collect streamed 'response' fields.
-        raw_text = ''
+        # Handle streaming/NDJSON: one pass over the lines, parsing JSON objects
         try:
-            raw_text = resp.text or ''
-        except Exception:
-            raw_text = ''
-
-        # Helper keys to look for inside JSON objects
-        content_type = resp.headers.get('Content-Type', '')
-        if raw_text:
-            # Attempt to parse NDJSON lines or a single JSON body
-            for raw_line in raw_text.splitlines():
-                line = raw_line.strip()
-                if not line:
-                    continue
+            for line in _iter_ndjson_lines(resp):
                 try:
-                    obj = json.loads(line)
-                except Exception:
-                    # Not a JSON object, treat as text chunk
-                    text_parts.append(line)
-                    continue
-
-                for key in ('token', 'text', 'content', 'output', 'response'):
-                    if key in obj:
-                        val = obj.get(key)
-                        if isinstance(val, str):
-                            text_parts.append(val)
-                            break
-                else:
-                    # extract any string values
-                    def extract_strings(o):
-                        if isinstance(o, str):
-                            return [o]
-                        if isinstance(o, dict):
-                            s = []
-                            for v in o.values():
-                                s += extract_strings(v)
-                            return s
-                        if isinstance(o, list):
-                            s = []
-                            for v in o:
-                                s += extract_strings(v)
-                            return s
-                        return []
-
-                    strings = extract_strings(obj)
-                    if strings:
-                        text_parts.append(''.join(strings))
-
-        # If we didn't get anything from raw_text, try streaming iteration
-        if not text_parts:
-            # Handle streaming/NDJSON: iterate lines and parse JSON objects
-            try:
-                for raw_line in resp.iter_lines(decode_unicode=True):
-                    if not raw_line:
-                        continue
-                    line = raw_line.strip()
-                    # Some streaming endpoints send plain text chunks
-                    if line.startswith('{') and line.endswith('}'):
-                        try:
-                            obj = json.loads(line)
-                        except Exception:
-                            # Not a JSON object, treat as text
-                            text_parts.append(line)
-                            continue
-
-                        # Look for common text fields
-                        for key in ('token', 'text', 'content', 'output', 'response'):
-                            if key in obj:
-                                val = obj.get(key)
-                                if isinstance(val, str):
-                                    text_parts.append(val)
-                                    break
-                        else:
-                            # obj may have a nested 'response' or 'choices'
-                            def extract_strings(o):
-                                if isinstance(o, str):
-                                    return [o]
-                                if isinstance(o, dict):
-                                    s = []
-                                    for v in o.values():
-                                        s += extract_strings(v)
-                                    return s
-                                if isinstance(o, list):
-                                    s = []
-                                    for v in o:
-                                        s += extract_strings(v)
-                                    return s
-                                return []
-
-                            strings = extract_strings(obj)
-                            if strings:
-                                text_parts.append(''.join(strings))
-                    else:
-                        # Not JSON — treat as a text chunk
-                        text_parts.append(line)
-            except Exception:
-                # Last fallback: return raw text
-                try:
-                    return raw_text
-                except Exception as e:
-                    raise OllamaError(f"Failed to read response: {e}")
-
-        # Handle streaming/NDJSON: iterate lines and parse JSON objects
-        try:
-            for raw_line in resp.iter_lines(decode_unicode=True):
-                if not raw_line:
-                    continue
-                line = raw_line.strip()
-                # Some streaming endpoints send plain text chunks
-                if line.startswith('{') and line.endswith('}'):
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        # Not a JSON object, treat as text
-                        text_parts.append(line)
-                        continue
-
-                    # Look for common text fields
-                    for key in ('token', 'text', 'content', 'output', 'response'):
-                        if key in obj:
-                            val = obj.get(key)
-                            if isinstance(val, str):
-                                text_parts.append(val)
-                                break
-                    else:
-                        # obj may have a nested 'response' or 'choices'
-                        # Try to extract any string values
-                        def extract_strings(o):
-                            if isinstance(o, str):
-                                return [o]
-                            if isinstance(o, dict):
-                                s = []
-                                for v in o.values():
-                                    s += extract_strings(v)
-                                return s
-                            if isinstance(o, list):
-                                s = []
-                                for v in o:
-                                    s += extract_strings(v)
-                                return s
-                            return []
-
-                        strings = extract_strings(obj)
-                        if strings:
-                            text_parts.append(''.join(strings))
-                else:
+                    obj = _loads(line)
+                except ValueError:
                     # Not JSON — treat as a text chunk
-                    text_parts.append(line)
-        except Exception:
-            # Last fallback: return raw text
-            try:
-                return resp.text
-            except Exception as e:
-                raise OllamaError(f"Failed to read response: {e}")
+                    text_parts.append(line.decode('utf-8', errors='replace'))
+                    continue
+                val = _token_text(obj)
+                if val is not None:
+                    text_parts.append(val)
+        except Exception as e:
+            raise OllamaError(f"Failed to read response: {e}")
 
         result = ''.join(text_parts).strip()
 
         # If the streamed response contains many NDJSON objects, it's common
         # for Ollama to stream JSON fragments where the actual JSON array is
-        # embedded inside the concatenated 'response' fields. We'll try to
-        # find the first balanced JSON array (handles brackets inside strings
-        # and escaped characters) and return that substring.
-        def _find_first_json_array(text: str) -> str | None:
-            start = None
-            in_str = False
-            esc = False
-            depth = 0
-            for i, ch in enumerate(text):
-                if start is None:
-                    if ch == '[':
-                        start = i
-                        depth = 1
-                        continue
-                else:
-                    if esc:
-                        esc = False
-                        continue
-                    if ch == '\\':
-                        esc = True
-                        continue
-                    if ch == '"':
-                        in_str = not in_str
-                        continue
-                    if in_str:
-                        continue
-                    if ch == '[':
-                        depth += 1
-                        continue
-                    if ch == ']':
-                        depth -= 1
-                        if depth == 0:
-                            return text[start:i+1]
-            return None
-
+        # embedded inside the concatenated 'response' fields. Return the first
+        # balanced JSON array if there is one.
         try:
-            arr = _find_first_json_array(result)
+            arr = extract_first_json_array(result)
             if arr:
                 return arr
         except Exception:
             pass
 
-        # If streaming yielded nothing, try the full response text as a fallback
+        # Nothing meaningful returned by Ollama — raise a helpful error. Non-JSON
+        # lines are kept as text above, so there is no other body to fall back on.
         if not result:
-            try:
-                full_text = resp.text
-            except Exception:
-                full_text = ''
+            raise OllamaError(
+                "Empty response from Ollama. The server accepted the request but returned no text. "
+                "Check the Ollama server logs for errors (model load failures, OOM, or runner crashes)."
+            )
 
-            if full_text and full_text.strip():
-                return full_text
+        return result
 
-            # Nothing meaningful returned by Ollama — raise a helpful error
-            snippet = ''
-            try:
-                snippet = (resp.text or '')[:500]
-            except Exception:
-                snippet = ''
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield text chunks from Ollama's streamed NDJSON as they arrive.
+
+        The HTTP response is closed as soon as the caller stops iterating, so
+        consumers can abort generation early (e.g. once the JSON they need is
+        complete) instead of waiting for the model to finish.
+        """
+        if timeout is None:
+            timeout = 300.0
+        resp = self._post_generate(prompt, timeout=timeout)
+        received = False
+        try:
+            for line in _iter_ndjson_lines(resp):
+                try:
+                    obj = _loads(line)
+                except ValueError:
+                    # Not JSON — treat as a text chunk
+                    received = True
+                    yield line.decode('utf-8', errors='replace')
+                    continue
+                val = _token_text(obj)
+                if val:
+                    received = True
+                    yield val
+                if obj.get('done'):
+                    break
+        finally:
+            resp.close()
+
+        if not received:
             raise OllamaError(
                 "Empty response from Ollama. The server accepted the request but returned no text. "
-                "Check the Ollama server logs for errors (model load failures, OOM, or runner crashes). "
-                f"Response snippet: {snippet!r}"
+                "Check the Ollama server logs for errors (model load failures, OOM, or runner crashes)."
             )
 
-        return result
+    async def ainvoke(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Async counterpart of `invoke`.
+
+        The blocking HTTP call runs in a worker thread, so several prompts can
+        be in flight at once without stalling the event loop.
+        """
+        return await asyncio.to_thread(self.invoke, prompt, timeout)
 
 
 if __name__ == '__main__':
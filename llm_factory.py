@@ -6,20 +6,32 @@ Allows seamless switching between local Ollama models and Groq API.
 """
 
 import os
+import asyncio
+import functools
 from typing import Optional
 from langchain_ollama import OllamaLLM
-from groq import Groq
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file (LOAD_DOTENV=0 skips it when the
+# environment is already configured)
+if os.getenv("LOAD_DOTENV", "1").lower() not in ("0", "false", "no"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Keep the Ollama model loaded between tables instead of the server's ~5 minute default
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
 
 
 class LLMFactory:
     """Factory class to create LLM clients based on provider."""
     
     @staticmethod
-    def create_llm(provider: str = "ollama", model_name: Optional[str] = None, temperature: float = 0.7):
+    def create_llm(
+        provider: str = "ollama",
+        model_name: Optional[str] = None,
+        temperature: float = 0.7,
+        json_mode: bool = False
+    ):
         """
         Create an LLM client based on the provider.
         
@@ -27,6 +39,9 @@ class LLMFactory:
             provider: Either "ollama" or "groq"
             model_name: Model name (defaults based on provider)
             temperature: Temperature for generation
+            json_mode: Ask Ollama for grammar-constrained JSON output, for
+                callers whose prompts expect a single JSON object (ignored
+                for Groq)
             
         Returns:
             LLM client (either OllamaLLM or GroqWrapper)
@@ -36,7 +51,35 @@ class LLMFactory:
         else:
             # Default to Ollama
             model = model_name or "llama3:latest"
-            return OllamaLLM(model=model, temperature=temperature)
+            return OllamaLLM(
+                model=model,
+                temperature=temperature,
+                keep_alive=OLLAMA_KEEP_ALIVE,
+                num_ctx=OLLAMA_NUM_CTX,
+                format="json" if json_mode else None,
+            )
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def get_shared(
+        provider: str = "ollama",
+        model_name: Optional[str] = None,
+        temperature: float = 0.7,
+        json_mode: bool = False
+    ):
+        """
+        Return the process-wide LLM client for this configuration.
+        
+        Agents and generators with the same settings share one client (and its
+        HTTP connection pool) instead of each creating their own. Arguments
+        are the same as for create_llm().
+        """
+        return LLMFactory.create_llm(
+            provider=provider,
+            model_name=model_name,
+            temperature=temperature,
+            json_mode=json_mode
+        )
 
 
 class GroqWrapper:
@@ -58,6 +101,9 @@ class GroqWrapper:
         if not api_key:
             raise ValueError("groq_api_key not found in environment variables. Please set it in .env file")
         
+        # Imported here: the groq SDK (httpx, pydantic, ...) is only needed
+        # once a Groq client is actually created
+        from groq import Groq
         self.client = Groq(api_key=api_key)
         
         # Get model from .env or use provided model_name
@@ -67,41 +113,68 @@ class GroqWrapper:
         
         print(f"✓ Groq API initialized with model: {self.model}")
     
-    def invoke(self, prompt: str) -> str:
+    def invoke(self, prompt: str, system: Optional[str] = None, stream: bool = True) -> str:
         """
         Invoke Groq API with the given prompt.
         Compatible with OllamaLLM's invoke() method.
         
         Args:
             prompt: The prompt text to send to Groq
+            system: Optional static instructions sent as a separate system
+                message ahead of the prompt
+            stream: Stream the completion; pass False for short replies,
+                where one plain response beats many small stream frames
             
         Returns:
             The generated text response
         """
         try:
-            # Create chat completion with streaming
+            messages = []
+            if system:
+                messages.append({
+                    "role": "system",
+                    "content": system
+                })
+            messages.append({
+                "role": "user",
+                "content": prompt
+            })
+
             completion = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=messages,
                 temperature=self.temperature,
                 max_completion_tokens=8192,
                 top_p=1,
-                stream=True,
+                stream=stream,
                 stop=None
             )
             
+            if not stream:
+                return completion.choices[0].message.content or ""
+            
             # Collect streamed response
-            response_text = ""
+            parts = []
             for chunk in completion:
-                if chunk.choices[0].delta.content:
-                    response_text += chunk.choices[0].delta.content
+                content = chunk.choices[0].delta.content
+                if content:
+                    parts.append(content)
             
-            return response_text
+            return "".join(parts)
             
         except Exception as e:
             raise Exception(f"Groq API error: {str(e)}")
+
+    async def ainvoke(self, prompt: str, system: Optional[str] = None, stream: bool = True) -> str:
+        """
+        Async counterpart of invoke(); runs the call in a worker thread.
+        
+        Args:
+            prompt: The prompt text to send to Groq
+            system: Optional system message (see invoke())
+            stream: See invoke()
+            
+        Returns:
+            The generated text response
+        """
+        return await asyncio.to_thread(self.invoke, prompt, system, stream)
@@ -1,14 +1,30 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from data_generator import TestDataGenerator
 from db_generator import DatabaseTestDataGenerator
 from intelligent_db_generator import IntelligentDatabaseGenerator
 from nl_db_generator import NaturalLanguageDatabaseGenerator
 from langchain_ollama import OllamaLLM
-from selenium_llm_parser import parse_selenium_script
+from selenium_llm_parser import parse_selenium_script_async
+import functools
 import json
+import logging
+import os
 import re
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+# TESTDATA_DEBUG=1 logs full prompts, LLM replies and per-row samples. Only the
+# generator modules go to DEBUG so HTTP/client libraries stay quiet.
+if os.getenv("TESTDATA_DEBUG", "").lower() in ("1", "true", "yes"):
+    logging.basicConfig()
+    for _name in ("data_generator", "intelligent_db_generator"):
+        logging.getLogger(_name).setLevel(logging.DEBUG)
+
 app = FastAPI(title="Test Data Generator API")
 
 # Configure CORS
@@ -21,6 +37,42 @@ app.add_middleware(
 )
 
 
+# ============================================================================
+# SHARED CLIENTS
+# ============================================================================
+
+@functools.lru_cache(maxsize=16)
+def _get_generator(generator_cls, provider: str):
+    """One generator per class and provider, reused across requests.
+
+    Building a generator creates its agents' LLM clients (and, for Groq, a new
+    API client each); none of them keep per-request state.
+    """
+    return generator_cls(provider=provider)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_health_llm() -> OllamaLLM:
+    return OllamaLLM(model="llama3:latest")
+
+
+def _ndjson_line(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+    return json.dumps(obj, default=str).encode() + b"\n"
+
+
+def _stream_db(result: dict):
+    """
+    NDJSON body for a generated database: one line per table
+    ({"table_name", "rows"}), then one line with the rest of the result.
+    Tables are serialized one at a time instead of as one large document.
+    """
+    for table_name, rows in result.get("tables", {}).items():
+        yield _ndjson_line({"table_name": table_name, "rows": rows})
+    yield _ndjson_line({key: value for key, value in result.items() if key != "tables"})
+
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -33,7 +85,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     try:
-        llm = OllamaLLM(model="llama3:latest")
+        llm = _get_health_llm()
         llm.invoke("test")
         return {
             "status": "healthy", 
@@ -66,7 +118,7 @@ async def generate_test_data(request: dict):
             )
         
         # Generate data
-        generator = TestDataGenerator(provider=model_provider)
+        generator = _get_generator(TestDataGenerator, model_provider)
         result = generator.generate_data(
             schema_fields=schema_fields,
             num_records=num_records,
@@ -126,13 +178,17 @@ async def generate_database(request: dict):
         
         if use_intelligent:
             print("Using INTELLIGENT mode with AI agents")
-            generator = IntelligentDatabaseGenerator(provider=model_provider)
+            generator = _get_generator(IntelligentDatabaseGenerator, model_provider)
+            # Per-table agent calls within each phase run concurrently
+            result = await generator.agenerate_database(db_schema)
         else:
             print("Using MANUAL mode (requires explicit PK/FK)")
-            generator = DatabaseTestDataGenerator(provider=model_provider)
-        
-        result = generator.generate_database(db_schema)
+            generator = _get_generator(DatabaseTestDataGenerator, model_provider)
+            # Independent tables in the same dependency tier are generated concurrently
+            result = await generator.agenerate_database(db_schema)
         
+        if request.get("stream"):
+            return StreamingResponse(_stream_db(result), media_type="application/x-ndjson")
         return result
         
     except HTTPException:
@@ -169,11 +225,14 @@ async def generate_from_natural_language(request: dict):
         model_provider = request.get("model_provider", "ollama")  # "ollama" or "groq"
         
         # Generate database from natural language
-        generator = NaturalLanguageDatabaseGenerator(provider=model_provider)
-        result = generator.generate_from_text(user_text)
+        generator = _get_generator(NaturalLanguageDatabaseGenerator, model_provider)
+        # Per-table schema design and the agent phases run concurrently
+        result = await generator.agenerate_from_text(user_text, request.get("batch_tables", False))
         
         print(f"\nNatural language generation completed successfully!")
         
+        if request.get("stream"):
+            return StreamingResponse(_stream_db(result), media_type="application/x-ndjson")
         return result
         
     except HTTPException:
@@ -203,7 +262,7 @@ async def generate_from_selenium(request: dict):
             raise HTTPException(status_code=400, detail="selenium_script is required and cannot be empty")
         # Use the dedicated parser module which encapsulates LLM parsing and fallback logic
         try:
-            parsed_schema, parse_error = parse_selenium_script(script_text, provider=model_provider)
+            parsed_schema, parse_error = await parse_selenium_script_async(script_text, provider=model_provider)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to parse Selenium script: {str(e)}")
 
@@ -224,7 +283,7 @@ async def generate_from_selenium(request: dict):
         print(f"Parsed schema from Selenium script: {parsed_schema}")
 
         # Otherwise, proceed to generate using the extracted schema
-        generator = TestDataGenerator(provider=model_provider)
+        generator = _get_generator(TestDataGenerator, model_provider)
         result = generator.generate_data(
             schema_fields=parsed_schema,
             num_records=num_records,
@@ -20,41 +20,79 @@ OUTPUT: Complete database with proper PKs, FKs, and realistic data
 """
 
 import json
-import re
-from typing import Dict, List, Any
+import asyncio
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
 from llm_factory import LLMFactory
-from intelligent_db_generator import IntelligentDatabaseGenerator
+from data_generator import ENABLE_PROMPT_CACHE, _ainvoke_json, _invoke_json, _loads
+from db_generator import OLLAMA_NUM_PARALLEL
+from intelligent_db_generator import CachedLLM, IntelligentDatabaseGenerator
+from json_extract import extract_first_json_array, extract_first_json_object
 
+try:
+    import orjson
+except Exception:
+    orjson = None
 
-# ============================================================================
-# AGENT 1: TEXT PARSER
-# ============================================================================
 
-class TextParserAgent:
+def _loads_reply(response: str, extract):
+    """Parse the JSON value in an LLM reply, or return None if there is none.
+
+    JSON-mode replies are the value itself and parse directly; anything else
+    is pulled out of the surrounding text with `extract` first.
     """
-    Parses natural language to extract:
-    - Database name
-    - Table names
-    - Field mentions
-    - Record counts
-    - Relationships hints
+    try:
+        return _loads(response)
+    except ValueError:
+        pass
+    json_text = extract(response)
+    return _loads(json_text) if json_text else None
+
+
+def _prompt_json(obj) -> str:
+    """JSON text of `obj` for embedding in a prompt.
+
+    Keys are sorted so the same data always gives the same text; relationship
+    hints come from the LLM in no fixed key order.
     """
-    
-    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
-        self.provider = provider
-        # Only pass model_name for Ollama; Groq uses model from .env
-        if provider == "ollama":
-            self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.1)
-        else:
-            self.llm = LLMFactory.create_llm(provider=provider, temperature=0.1)
-    
-    def parse(self, user_text: str) -> Dict[str, Any]:
-        """Extract structured information from natural language."""
-        
-        prompt = f"""You are a database design expert. Analyze this natural language description and extract structured information.
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj, indent=2, sort_keys=True)
 
-USER INPUT:
-{user_text}
+
+# Field examples shared by the single-table and bulk schema design prompts
+_COMMON_FIELD_PATTERNS = """COMMON FIELD PATTERNS:
+- Users/Customers: name, email, phone, address, date_of_birth
+- Products: name, description, price, category, stock_quantity
+- Orders: order_date, status, total_amount
+- Employees: name, email, phone, position, hire_date, salary
+- Departments: name, description, location, building
+- Students: name, email, enrollment_date, major
+- Courses: name, description, credits, semester"""
+
+# Most tables designed by one bulk LLM call; larger schemas are split so each
+# reply stays well within the model's output budget
+BULK_DESIGN_MAX_TABLES = 8
+
+# Rules text of the FK fields added from detected relationships
+_FK_RULES_PREFIX = "foreign key to "
+
+# Table designs each SchemaDesignerAgent remembers; a table with the same name,
+# fields, context and table list is designed once per generator
+DESIGN_CACHE_MAXSIZE = 128
+
+
+# ============================================================================
+# AGENT 1: TEXT PARSER
+# ============================================================================
+
+# Static part of the parser prompt; the user's text is appended to it
+_TEXT_PARSER_PROMPT = """You are a database design expert. Analyze this natural language description and extract structured information.
 
 TASK: Extract the following information in JSON format:
 
@@ -66,49 +104,149 @@ TASK: Extract the following information in JSON format:
 6. CONTEXT: Additional context or business rules mentioned
 
 OUTPUT ONLY JSON (no markdown, no explanations):
-{{
+{
   "db_name": "inferred_database_name",
   "tables": [
-    {{
+    {
       "name": "table_name",
       "explicit_fields": ["field1", "field2"],
       "num_records": 10,
       "context": "any mentioned context about this table"
-    }}
+    }
   ],
   "relationships": [
-    {{
+    {
       "from_table": "child_table",
       "to_table": "parent_table",
       "hint": "employees work in departments"
-    }}
+    }
   ],
   "general_context": "overall description of the database purpose"
-}}
+}
 
-CRITICAL: Output ONLY valid JSON, nothing else."""
+CRITICAL: Output ONLY valid JSON, nothing else.
 
+USER INPUT:
+"""
+
+
+class TextParserAgent:
+    """
+    Parses natural language to extract:
+    - Database name
+    - Table names
+    - Field mentions
+    - Record counts
+    - Relationships hints
+    """
+    
+    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
+        self.provider = provider
+        # Only pass model_name for Ollama; Groq uses model from .env
+        if provider == "ollama":
+            self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.1, json_mode=True)
+        else:
+            self.llm = LLMFactory.get_shared(provider=provider, temperature=0.1, json_mode=True)
+    
+    def parse(self, user_text: str) -> Dict[str, Any]:
+        """Extract structured information from natural language."""
         try:
-            response = self.llm.invoke(prompt)
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group(0))
-                print(f"\n📝 TEXT PARSER AGENT:")
-                print(f"   Database: {result.get('db_name')}")
-                print(f"   Tables: {len(result.get('tables', []))} detected")
-                print(f"   Relationships: {len(result.get('relationships', []))} hints found")
-                return result
-            else:
-                raise Exception("Failed to extract JSON from response")
+            response = _invoke_json(self.llm, self._build_prompt(user_text))
+            return self._parse_response(response)
         except Exception as e:
             print(f"   ⚠️  Text parsing failed: {e}")
             raise Exception(f"Failed to parse natural language: {str(e)}")
+    
+    async def aparse(self, user_text: str) -> Dict[str, Any]:
+        """Async variant of parse()."""
+        try:
+            response = await _ainvoke_json(self.llm, self._build_prompt(user_text))
+            return self._parse_response(response)
+        except Exception as e:
+            print(f"   ⚠️  Text parsing failed: {e}")
+            raise Exception(f"Failed to parse natural language: {str(e)}")
+    
+    def _build_prompt(self, user_text: str) -> str:
+        # Static instructions first and the user's text last, so repeated
+        # calls share a prompt prefix the server can reuse
+        return _TEXT_PARSER_PROMPT + user_text
+    
+    def _parse_response(self, response: str) -> Dict[str, Any]:
+        result = _loads_reply(response, extract_first_json_object)
+        if not isinstance(result, dict):
+            raise Exception("Failed to extract JSON from response")
+        print(f"\n📝 TEXT PARSER AGENT:")
+        print(f"   Database: {result.get('db_name')}")
+        print(f"   Tables: {len(result.get('tables', []))} detected")
+        print(f"   Relationships: {len(result.get('relationships', []))} hints found")
+        return result
 
 
 # ============================================================================
 # AGENT 2: SCHEMA DESIGNER
 # ============================================================================
 
+# Static parts of the design prompts; the table list and the table(s) to
+# design are appended, so every design call shares the same prefix
+_SCHEMA_DESIGN_PROMPT = """You are a database schema designer. Design a complete field schema for this table.
+
+TASK: Design a complete, realistic schema with appropriate fields and data types.
+
+RULES:
+1. Include all explicitly mentioned fields
+2. Infer additional logical fields based on table purpose and name
+3. Use appropriate data types (string, integer, email, date, phone, boolean, etc.)
+4. Add helpful examples where appropriate
+5. DO NOT add primary key fields (id, table_name_id) - these will be auto-generated
+6. DO NOT add foreign key fields yet - relationship agent will handle those
+7. Think about what a real-world table with this name would need
+
+""" + _COMMON_FIELD_PATTERNS + """
+
+OUTPUT ONLY a JSON object with the fields under "fields" (no markdown, no explanations):
+{
+  "fields": [
+    {
+      "name": "field_name",
+      "type": "string|integer|email|date|phone|boolean|float",
+      "rules": "optional constraints like 'max 100 characters' or 'positive number'",
+      "example": "optional example value"
+    }
+  ]
+}
+
+OTHER TABLES IN DATABASE: """
+
+_BULK_DESIGN_PROMPT = """You are a database schema designer. Design a complete field schema for each of these tables.
+
+TASK: Design a complete, realistic schema with appropriate fields and data types for every table.
+
+RULES:
+1. Include all explicitly mentioned fields of each table
+2. Infer additional logical fields based on each table's purpose and name
+3. Use appropriate data types (string, integer, email, date, phone, boolean, etc.)
+4. Add helpful examples where appropriate
+5. DO NOT add primary key fields (id, table_name_id) - these will be auto-generated
+6. DO NOT add foreign key fields yet - relationship agent will handle those
+7. Generate 5-10 appropriate fields per table
+
+""" + _COMMON_FIELD_PATTERNS + """
+
+OUTPUT ONLY JSON (no markdown, no explanations), with one entry per table name:
+{
+  "table_name": [
+    {
+      "name": "field_name",
+      "type": "string|integer|email|date|phone|boolean|float",
+      "rules": "optional constraints like 'max 100 characters' or 'positive number'",
+      "example": "optional example value"
+    }
+  ]
+}
+
+ALL TABLES IN DATABASE: """
+
+
 class SchemaDesignerAgent:
     """
     Designs complete schema for each table by:
@@ -121,107 +259,174 @@ class SchemaDesignerAgent:
         self.provider = provider
         # Only pass model_name for Ollama; Groq uses model from .env
         if provider == "ollama":
-            self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.2)
+            self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.2, json_mode=True)
         else:
-            self.llm = LLMFactory.create_llm(provider=provider, temperature=0.2)
+            self.llm = LLMFactory.get_shared(provider=provider, temperature=0.2, json_mode=True)
+        # Successful designs keyed by prompt (which holds every input), LRU order
+        self._designs: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._designs_lock = threading.Lock()
     
     def design_schema(self, table_info: Dict[str, Any], all_tables: List[str]) -> List[Dict[str, Any]]:
         """Design complete field schema for a table."""
-        
+        table_name = table_info.get("name", "unknown")
+        prompt = self._build_prompt(table_info, all_tables)
+        cached = self._cached_design(table_name, prompt)
+        if cached is not None:
+            return cached
+        try:
+            response = self.llm.invoke(prompt)
+            fields = self._parse_response(table_name, response)
+        except Exception as e:
+            return self._fallback_fields(table_name, e)
+        self._cache_design(prompt, fields)
+        return fields
+    
+    async def adesign_schema(self, table_info: Dict[str, Any], all_tables: List[str]) -> List[Dict[str, Any]]:
+        """Async variant of design_schema(); awaits the LLM via ainvoke()."""
+        table_name = table_info.get("name", "unknown")
+        prompt = self._build_prompt(table_info, all_tables)
+        cached = self._cached_design(table_name, prompt)
+        if cached is not None:
+            return cached
+        try:
+            response = await self.llm.ainvoke(prompt)
+            fields = self._parse_response(table_name, response)
+        except Exception as e:
+            return self._fallback_fields(table_name, e)
+        self._cache_design(prompt, fields)
+        return fields
+    
+    def _cached_design(self, table_name: str, prompt: str):
+        """Copy of an earlier design for this prompt, or None."""
+        with self._designs_lock:
+            fields = self._designs.get(prompt)
+            if fields is None:
+                return None
+            self._designs.move_to_end(prompt)
+        print(f"   ✅ {table_name}: {len(fields)} fields designed (cached)")
+        # Hand out copies: FK fields are appended to the returned list later
+        return [dict(f) for f in fields]
+    
+    def _cache_design(self, prompt: str, fields: List[Dict[str, Any]]):
+        with self._designs_lock:
+            self._designs[prompt] = [dict(f) for f in fields]
+            self._designs.move_to_end(prompt)
+            if len(self._designs) > DESIGN_CACHE_MAXSIZE:
+                self._designs.popitem(last=False)
+    
+    def _build_prompt(self, table_info: Dict[str, Any], all_tables: List[str]) -> str:
         table_name = table_info.get("name", "unknown")
         explicit_fields = table_info.get("explicit_fields", [])
         context = table_info.get("context", "")
         
-        prompt = f"""You are a database schema designer. Design a complete field schema for this table.
+        # Static rules first, then the table list shared by the whole run, then
+        # this table, so every design call shares the longest possible prefix
+        return _SCHEMA_DESIGN_PROMPT + f"""{sorted(all_tables)}
 
 TABLE: {table_name}
 EXPLICIT FIELDS (user mentioned): {explicit_fields}
 CONTEXT: {context}
-OTHER TABLES IN DATABASE: {all_tables}
-
-TASK: Design a complete, realistic schema with appropriate fields and data types.
-
-RULES:
-1. Include all explicitly mentioned fields
-2. Infer additional logical fields based on table purpose and name
-3. Use appropriate data types (string, integer, email, date, phone, boolean, etc.)
-4. Add helpful examples where appropriate
-5. DO NOT add primary key fields (id, table_name_id) - these will be auto-generated
-6. DO NOT add foreign key fields yet - relationship agent will handle those
-7. Think about what a real-world {table_name} table would need
-
-COMMON FIELD PATTERNS:
-- Users/Customers: name, email, phone, address, date_of_birth
-- Products: name, description, price, category, stock_quantity
-- Orders: order_date, status, total_amount
-- Employees: name, email, phone, position, hire_date, salary
-- Departments: name, description, location, building
-- Students: name, email, enrollment_date, major
-- Courses: name, description, credits, semester
-
-OUTPUT ONLY JSON array of fields (no markdown, no explanations):
-[
-  {{
-    "name": "field_name",
-    "type": "string|integer|email|date|phone|boolean|float",
-    "rules": "optional constraints like 'max 100 characters' or 'positive number'",
-    "example": "optional example value"
-  }}
-]
 
 Generate 5-10 appropriate fields for {table_name}."""
+    
+    def design_schemas_bulk(self, table_infos: List[Dict[str, Any]], all_tables: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        Design the fields of every table with one LLM call per
+        BULK_DESIGN_MAX_TABLES tables. Tables the response doesn't cover
+        fall back to design_schema().
+        """
+        designed = []
+        for start in range(0, len(table_infos), BULK_DESIGN_MAX_TABLES):
+            batch = table_infos[start:start + BULK_DESIGN_MAX_TABLES]
+            results = {}
+            try:
+                results = self._parse_bulk_response(_invoke_json(self.llm, self._build_bulk_prompt(batch, all_tables)))
+            except Exception as e:
+                print(f"   ⚠️  Bulk schema design failed, falling back to per-table calls: {e}")
+            for table_info in batch:
+                fields = self._bulk_fields(table_info, results)
+                designed.append(fields if fields is not None else self.design_schema(table_info, all_tables))
+        return designed
+    
+    async def adesign_schemas_bulk(self, table_infos: List[Dict[str, Any]], all_tables: List[str]) -> List[List[Dict[str, Any]]]:
+        """Async variant of design_schemas_bulk()."""
+        designed = []
+        for start in range(0, len(table_infos), BULK_DESIGN_MAX_TABLES):
+            batch = table_infos[start:start + BULK_DESIGN_MAX_TABLES]
+            results = {}
+            try:
+                results = self._parse_bulk_response(await _ainvoke_json(self.llm, self._build_bulk_prompt(batch, all_tables)))
+            except Exception as e:
+                print(f"   ⚠️  Bulk schema design failed, falling back to per-table calls: {e}")
+            for table_info in batch:
+                fields = self._bulk_fields(table_info, results)
+                designed.append(fields if fields is not None else await self.adesign_schema(table_info, all_tables))
+        return designed
+    
+    def _build_bulk_prompt(self, table_infos: List[Dict[str, Any]], all_tables: List[str]) -> str:
+        tables_info = [
+            {
+                "name": table_info.get("name", "unknown"),
+                "explicit_fields": table_info.get("explicit_fields", []),
+                "context": table_info.get("context", "")
+            }
+            for table_info in table_infos
+        ]
+        
+        return _BULK_DESIGN_PROMPT + f"""{sorted(all_tables)}
 
-        try:
-            response = self.llm.invoke(prompt)
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                fields = json.loads(json_match.group(0))
-                print(f"   ✅ {table_name}: {len(fields)} fields designed")
-                return fields
-            else:
-                raise Exception("Failed to extract JSON array")
-        except Exception as e:
-            print(f"   ⚠️  Schema design failed for {table_name}: {e}")
-            # Fallback: basic schema
-            return [
-                {"name": "name", "type": "string"},
-                {"name": "description", "type": "string"}
-            ]
+TABLES TO DESIGN:
+{_prompt_json(tables_info)}"""
+    
+    @staticmethod
+    def _parse_bulk_response(response: str) -> Dict[str, Any]:
+        """Parse a bulk reply keyed by table name ({} if there is none)."""
+        result = _loads_reply(response, extract_first_json_object)
+        return result if isinstance(result, dict) else {}
+    
+    @staticmethod
+    def _bulk_fields(table_info: Dict[str, Any], results: Dict[str, Any]):
+        """This table's fields from a bulk reply, or None if they're missing or malformed."""
+        table_name = table_info.get("name", "unknown")
+        fields = results.get(table_name)
+        if not fields or not isinstance(fields, list) or not all(isinstance(f, dict) and f.get("name") for f in fields):
+            return None
+        print(f"   ✅ {table_name}: {len(fields)} fields designed")
+        return fields
+    
+    def _parse_response(self, table_name: str, response: str) -> List[Dict[str, Any]]:
+        result = _loads_reply(response, extract_first_json_object)
+        if isinstance(result, dict) and "fields" in result:
+            fields = result["fields"]
+        elif isinstance(result, list):
+            fields = result
+        else:
+            # Replies that ignore the wrapper object hold a bare array
+            fields = _loads_reply(response, extract_first_json_array)
+        if not fields:
+            raise Exception("Failed to extract JSON array")
+        # The first array may be prose like "[5] fields"; only field objects count
+        if not isinstance(fields, list) or not all(isinstance(f, dict) for f in fields):
+            raise Exception("JSON array does not contain field objects")
+        print(f"   ✅ {table_name}: {len(fields)} fields designed")
+        return fields
+    
+    @staticmethod
+    def _fallback_fields(table_name: str, error: Exception) -> List[Dict[str, Any]]:
+        print(f"   ⚠️  Schema design failed for {table_name}: {error}")
+        # Fallback: basic schema
+        return [
+            {"name": "name", "type": "string"},
+            {"name": "description", "type": "string"}
+        ]
 
 
 # ============================================================================
 # AGENT 3: RELATIONSHIP DETECTOR
 # ============================================================================
 
-class RelationshipDetectorAgent:
-    """
-    Identifies relationships between tables and determines which foreign keys to add.
-    Uses relationship hints from text parser and semantic analysis.
-    """
-    
-    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
-        self.provider = provider
-        # Only pass model_name for Ollama; Groq uses model from .env
-        if provider == "ollama":
-            self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.2)
-        else:
-            self.llm = LLMFactory.create_llm(provider=provider, temperature=0.2)
-    
-    def detect_relationships(
-        self, 
-        tables: List[Dict[str, Any]], 
-        relationship_hints: List[Dict[str, Any]]
-    ) -> Dict[str, List[Dict[str, Any]]]:
-        """Detect foreign key relationships between tables."""
-        
-        table_names = [t["name"] for t in tables]
-        
-        prompt = f"""You are a database relationship expert. Identify foreign key relationships between these tables.
-
-TABLES: {json.dumps([{"name": t["name"], "context": t.get("context", "")} for t in tables], indent=2)}
-
-RELATIONSHIP HINTS FROM USER:
-{json.dumps(relationship_hints, indent=2)}
+# Static part of the relationship prompt; tables and hints are appended
+_RELATIONSHIP_PROMPT = """You are a database relationship expert. Identify foreign key relationships between these tables.
 
 TASK: Identify which tables should have foreign keys referencing other tables.
 
@@ -240,35 +445,93 @@ RULES:
 4. Think about logical real-world relationships
 
 OUTPUT ONLY JSON (no markdown):
-{{
+{
   "table_name": [
-    {{
+    {
       "fk_field_name": "dept_id",
       "references_table": "departments",
       "reasoning": "employees belong to departments"
-    }}
+    }
   ]
-}}
+}
+
+Return empty object {} if no relationships detected.
 
-Return empty object {{}} if no relationships detected."""
+TABLES: """
 
+
+class RelationshipDetectorAgent:
+    """
+    Identifies relationships between tables and determines which foreign keys to add.
+    Uses relationship hints from text parser and semantic analysis.
+    """
+    
+    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
+        self.provider = provider
+        # Only pass model_name for Ollama; Groq uses model from .env
+        if provider == "ollama":
+            self.llm = LLMFactory.get_shared(provider=provider, model_name=model_name, temperature=0.2, json_mode=True)
+        else:
+            self.llm = LLMFactory.get_shared(provider=provider, temperature=0.2, json_mode=True)
+    
+    def detect_relationships(
+        self, 
+        tables: List[Dict[str, Any]], 
+        relationship_hints: List[Dict[str, Any]]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Detect foreign key relationships between tables."""
+        if self._nothing_to_detect(tables, relationship_hints):
+            return {}
         try:
-            response = self.llm.invoke(prompt)
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                relationships = json.loads(json_match.group(0))
-                total_fks = sum(len(fks) for fks in relationships.values())
-                print(f"\n🔗 RELATIONSHIP DETECTOR AGENT:")
-                print(f"   Detected {total_fks} foreign key relationships")
-                for table, fks in relationships.items():
-                    for fk in fks:
-                        print(f"   ✅ {table}.{fk['fk_field_name']} → {fk['references_table']}")
-                return relationships
-            else:
-                return {}
+            response = _invoke_json(self.llm, self._build_prompt(tables, relationship_hints))
+            return self._parse_response(response)
+        except Exception as e:
+            print(f"   ⚠️  Relationship detection failed: {e}")
+            return {}
+    
+    async def adetect_relationships(
+        self, 
+        tables: List[Dict[str, Any]], 
+        relationship_hints: List[Dict[str, Any]]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Async variant of detect_relationships()."""
+        if self._nothing_to_detect(tables, relationship_hints):
+            return {}
+        try:
+            response = await _ainvoke_json(self.llm, self._build_prompt(tables, relationship_hints))
+            return self._parse_response(response)
         except Exception as e:
             print(f"   ⚠️  Relationship detection failed: {e}")
             return {}
+    
+    @staticmethod
+    def _nothing_to_detect(tables: List[Dict[str, Any]], relationship_hints: List[Dict[str, Any]]) -> bool:
+        """True for a single table without hints, which needs no LLM call."""
+        if len(tables) < 2 and not relationship_hints:
+            print(f"\n🔗 RELATIONSHIP DETECTOR AGENT:")
+            print(f"   Skipped: fewer than 2 tables and no relationship hints")
+            return True
+        return False
+    
+    def _build_prompt(self, tables: List[Dict[str, Any]], relationship_hints: List[Dict[str, Any]]) -> str:
+        # Static instructions first, tables and hints last (see TextParserAgent)
+        table_summaries = [{"name": t["name"], "context": t.get("context", "")} for t in tables]
+        return _RELATIONSHIP_PROMPT + f"""{_prompt_json(table_summaries)}
+
+RELATIONSHIP HINTS FROM USER:
+{_prompt_json(relationship_hints)}"""
+    
+    def _parse_response(self, response: str) -> Dict[str, List[Dict[str, Any]]]:
+        relationships = _loads_reply(response, extract_first_json_object)
+        if not isinstance(relationships, dict):
+            return {}
+        total_fks = sum(len(fks) for fks in relationships.values())
+        print(f"\n🔗 RELATIONSHIP DETECTOR AGENT:")
+        print(f"   Detected {total_fks} foreign key relationships")
+        for table, fks in relationships.items():
+            for fk in fks:
+                print(f"   ✅ {table}.{fk['fk_field_name']} → {fk['references_table']}")
+        return relationships
 
 
 # ============================================================================
@@ -284,19 +547,16 @@ class SchemaValidatorAgent:
     - Schema is complete and ready for generation
     """
     
-    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
+    def __init__(self, provider: str = "ollama"):
+        # Pure rule checks: no LLM client is needed
         self.provider = provider
-        # Only pass model_name for Ollama; Groq uses model from .env
-        if provider == "ollama":
-            self.llm = LLMFactory.create_llm(provider=provider, model_name=model_name, temperature=0.1)
-        else:
-            self.llm = LLMFactory.create_llm(provider=provider, temperature=0.1)
     
     def validate(self, schema: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and optionally fix the schema."""
         
         issues = []
         tables = schema.get("tables", [])
+        table_names = {t.get("table_name") for t in tables}
         
         # Check each table
         for table in tables:
@@ -307,11 +567,22 @@ class SchemaValidatorAgent:
             if len(fields) < 2:
                 issues.append(f"Table '{table_name}' has only {len(fields)} field(s)")
             
+            # Index the fields once; the checks below look them up here
+            field_by_name = {f.get("name"): f for f in fields}
+            
             # Check for duplicate field names
-            field_names = [f.get("name") for f in fields]
-            duplicates = [name for name in field_names if field_names.count(name) > 1]
-            if duplicates:
-                issues.append(f"Table '{table_name}' has duplicate fields: {set(duplicates)}")
+            if len(field_by_name) != len(fields):
+                counts = Counter(f.get("name") for f in fields)
+                duplicates = {name for name, count in counts.items() if count > 1}
+                issues.append(f"Table '{table_name}' has duplicate fields: {duplicates}")
+            
+            # Check that foreign keys reference existing tables
+            for name, field in field_by_name.items():
+                rules = field.get("rules")
+                if isinstance(rules, str) and rules.startswith(_FK_RULES_PREFIX):
+                    target = rules[len(_FK_RULES_PREFIX):].strip()
+                    if target not in table_names:
+                        issues.append(f"Table '{table_name}' field '{name}' references unknown table '{target}'")
         
         if issues:
             print(f"\n⚠️  SCHEMA VALIDATOR AGENT:")
@@ -337,54 +608,158 @@ class NaturalLanguageDatabaseGenerator:
     Main orchestrator that uses multiple agents to generate databases from natural language.
     """
     
-    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama"):
+    def __init__(self, model_name: str = "llama3:latest", provider: str = "ollama", use_cache: Optional[bool] = None):
         self.model_name = model_name
         self.provider = provider
+        # Reuse LLM replies for identical prompts (defaults to ENABLE_PROMPT_CACHE)
+        if use_cache is None:
+            use_cache = ENABLE_PROMPT_CACHE
         # Only pass model_name for Ollama; Groq uses model from .env
         if provider == "ollama":
             self.text_parser = TextParserAgent(model_name, provider)
             self.schema_designer = SchemaDesignerAgent(model_name, provider)
             self.relationship_detector = RelationshipDetectorAgent(model_name, provider)
-            self.schema_validator = SchemaValidatorAgent(model_name, provider)
-            self.db_generator = IntelligentDatabaseGenerator(model_name, provider)
+            self.schema_validator = SchemaValidatorAgent(provider)
+            self.db_generator = IntelligentDatabaseGenerator(model_name, provider, use_cache=use_cache)
         else:
             self.text_parser = TextParserAgent(provider=provider)
             self.schema_designer = SchemaDesignerAgent(provider=provider)
             self.relationship_detector = RelationshipDetectorAgent(provider=provider)
             self.schema_validator = SchemaValidatorAgent(provider=provider)
-            self.db_generator = IntelligentDatabaseGenerator(provider=provider)
+            self.db_generator = IntelligentDatabaseGenerator(provider=provider, use_cache=use_cache)
+        
+        if use_cache:
+            for agent in (self.text_parser, self.schema_designer, self.relationship_detector):
+                agent.llm = CachedLLM(agent.llm, provider)
     
-    def generate_from_text(self, user_text: str) -> Dict[str, Any]:
+    def generate_from_text(self, user_text: str, batch_tables: bool = False) -> Dict[str, Any]:
         """
         Generate complete database from natural language description.
         
         Args:
             user_text: Natural language description of desired database
+            batch_tables: Design all tables' fields in one LLM call (per
+                BULK_DESIGN_MAX_TABLES tables) instead of one call per table
             
         Returns:
             Complete database with generated data
         """
-        
-        print(f"\n{'='*70}")
-        print(f"🤖 NATURAL LANGUAGE DATABASE GENERATION")
-        print(f"{'='*70}\n")
-        print(f"User Input: {user_text[:100]}...")
+        self._print_start(user_text)
         
         # PHASE 1: Parse natural language
-        print(f"\n{'='*70}")
-        print(f"PHASE 1: TEXT PARSING")
-        print(f"{'='*70}")
+        self._print_phase("PHASE 1: TEXT PARSING")
         parsed_data = self.text_parser.parse(user_text)
         
-        # PHASE 2: Design schema for each table
+        # PHASES 2 & 3: Design schema for each table and detect relationships.
+        # Relationship detection only needs the parsed tables, so it runs
+        # alongside the designs instead of after them
+        self._print_phase("PHASE 2 & 3: SCHEMA DESIGN + RELATIONSHIP DETECTION")
+        table_infos = parsed_data.get("tables", [])
+        all_table_names = [t["name"] for t in table_infos]
+        num_calls = 1 + (1 if batch_tables else len(table_infos))
+        workers = max(1, min(num_calls, OLLAMA_NUM_PARALLEL))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            relationships_future = executor.submit(
+                self.relationship_detector.detect_relationships,
+                table_infos,
+                parsed_data.get("relationships", [])
+            )
+            if batch_tables:
+                designed_fields = executor.submit(
+                    self.schema_designer.design_schemas_bulk, table_infos, all_table_names
+                ).result()
+            else:
+                # Each table's design is an independent blocking LLM call; the pool
+                # runs them concurrently and map() keeps the table order
+                designed_fields = list(executor.map(
+                    lambda table_info: self.schema_designer.design_schema(table_info, all_table_names),
+                    table_infos
+                ))
+            relationships = relationships_future.result()
+        
+        # PHASE 4: Validate schema
+        db_schema = self._build_db_schema(parsed_data, designed_fields, relationships)
+        
+        # PHASE 5: Generate database using intelligent generator
+        self._print_generation_start()
+        result = self.db_generator.generate_database(db_schema)
+        self._print_phase("🎉 NATURAL LANGUAGE GENERATION COMPLETE!", trailing_newline=True)
+        
+        return result
+    
+    async def agenerate_from_text(self, user_text: str, batch_tables: bool = False) -> Dict[str, Any]:
+        """
+        Async variant of generate_from_text().
+        
+        The per-table schema designs and the relationship detection are
+        independent, so they run concurrently (at most OLLAMA_NUM_PARALLEL
+        LLM calls at a time), and Phase 5 uses the intelligent generator's
+        async pipeline.
+        """
+        self._print_start(user_text)
+        
+        # PHASE 1: Parse natural language
+        self._print_phase("PHASE 1: TEXT PARSING")
+        parsed_data = await self.text_parser.aparse(user_text)
+        
+        # PHASES 2 & 3: Design schema for each table and detect relationships
+        self._print_phase("PHASE 2 & 3: SCHEMA DESIGN + RELATIONSHIP DETECTION")
+        table_infos = parsed_data.get("tables", [])
+        all_table_names = [t["name"] for t in table_infos]
+        semaphore = asyncio.Semaphore(max(1, OLLAMA_NUM_PARALLEL))
+        bounded = IntelligentDatabaseGenerator._bounded
+        detect = bounded(semaphore, self.relationship_detector.adetect_relationships(
+            table_infos,
+            parsed_data.get("relationships", [])
+        ))
+        if batch_tables:
+            relationships, designed_fields = await asyncio.gather(
+                detect,
+                bounded(semaphore, self.schema_designer.adesign_schemas_bulk(table_infos, all_table_names))
+            )
+        else:
+            relationships, *designed_fields = await asyncio.gather(detect, *(
+                bounded(semaphore, self.schema_designer.adesign_schema(table_info, all_table_names))
+                for table_info in table_infos
+            ))
+        
+        # PHASE 4: Validate schema
+        db_schema = self._build_db_schema(parsed_data, designed_fields, relationships)
+        
+        # PHASE 5: Generate database using intelligent generator
+        self._print_generation_start()
+        result = await self.db_generator.agenerate_database(db_schema)
+        self._print_phase("🎉 NATURAL LANGUAGE GENERATION COMPLETE!", trailing_newline=True)
+        
+        return result
+    
+    # ------------------------------------------------------------------------
+    # Steps shared by the sync and async pipelines
+    # ------------------------------------------------------------------------
+    
+    @staticmethod
+    def _print_phase(title: str, trailing_newline: bool = False):
         print(f"\n{'='*70}")
-        print(f"PHASE 2: SCHEMA DESIGN")
-        print(f"{'='*70}")
+        print(title)
+        print(f"{'='*70}" + ("\n" if trailing_newline else ""))
+    
+    def _print_start(self, user_text: str):
+        self._print_phase("🤖 NATURAL LANGUAGE DATABASE GENERATION", trailing_newline=True)
+        print(f"User Input: {user_text[:100]}...")
+    
+    def _print_generation_start(self):
+        self._print_phase("PHASE 5: DATABASE GENERATION")
+        print(f"🎲 Using Intelligent Database Generator with AI agents...")
+    
+    def _build_db_schema(
+        self,
+        parsed_data: Dict[str, Any],
+        designed_fields: List[List[Dict[str, Any]]],
+        relationships: Dict[str, List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Assemble the tables, add the detected FK fields and validate (Phase 4)."""
         tables_with_schema = []
-        all_table_names = [t["name"] for t in parsed_data.get("tables", [])]
-        
-        for table_info in parsed_data.get("tables", []):
-            fields = self.schema_designer.design_schema(table_info, all_table_names)
+        for table_info, fields in zip(parsed_data.get("tables", []), designed_fields):
             tables_with_schema.append({
                 "table_name": table_info["name"],
                 "num_records": table_info.get("num_records", 10),
@@ -394,15 +769,6 @@ class NaturalLanguageDatabaseGenerator:
                 "fields": fields
             })
         
-        # PHASE 3: Detect relationships and add foreign keys
-        print(f"\n{'='*70}")
-        print(f"PHASE 3: RELATIONSHIP DETECTION")
-        print(f"{'='*70}")
-        relationships = self.relationship_detector.detect_relationships(
-            parsed_data.get("tables", []),
-            parsed_data.get("relationships", [])
-        )
-        
         # Add FK fields to tables
         for table in tables_with_schema:
             table_name = table["table_name"]
@@ -412,14 +778,12 @@ class NaturalLanguageDatabaseGenerator:
                     table["fields"].append({
                         "name": fk_info["fk_field_name"],
                         "type": "integer",
-                        "rules": f"foreign key to {fk_info['references_table']}"
+                        "rules": f"{_FK_RULES_PREFIX}{fk_info['references_table']}"
                     })
                     print(f"   ➕ Added FK field: {table_name}.{fk_info['fk_field_name']}")
         
         # PHASE 4: Validate schema
-        print(f"\n{'='*70}")
-        print(f"PHASE 4: SCHEMA VALIDATION")
-        print(f"{'='*70}")
+        self._print_phase("PHASE 4: SCHEMA VALIDATION")
         db_schema = {
             "db_name": parsed_data.get("db_name", "generated_db"),
             "use_intelligent_mode": True,
@@ -431,19 +795,7 @@ class NaturalLanguageDatabaseGenerator:
         if not validation_result["valid"]:
             print(f"\n⚠️  Warning: Schema has issues but will attempt generation anyway")
         
-        # PHASE 5: Generate database using intelligent generator
-        print(f"\n{'='*70}")
-        print(f"PHASE 5: DATABASE GENERATION")
-        print(f"{'='*70}")
-        print(f"🎲 Using Intelligent Database Generator with AI agents...")
-        
-        result = self.db_generator.generate_database(db_schema)
-        
-        print(f"\n{'='*70}")
-        print(f"🎉 NATURAL LANGUAGE GENERATION COMPLETE!")
-        print(f"{'='*70}\n")
-        
-        return result
+        return db_schema
 
 
 # ============================================================================
@@ -1,23 +1,77 @@
+import os
 import re
 import json
+import asyncio
+import hashlib
+import functools
+from collections import OrderedDict
 from typing import Tuple, List, Optional
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 from llm_factory import LLMFactory
-from data_generator import TestDataGenerator
+from json_extract import extract_first_json_array
+from data_generator import _assemble_ndjson, _clean_json_response, _loads
 
 
+# str.translate table that drops ASCII control characters except \t, \n, \r
+_CTRL_CHARS_TABLE = dict.fromkeys((c for c in range(32) if c not in (9, 10, 13)), None)
 
-def parse_selenium_script(script_text: str, provider: str = "ollama", model_name: str = None) -> Tuple[List[dict], Optional[str]]:
+# Compiled once at import; these run on every parsed LLM response.
+# : "value" "nextkey" :  ->  : "value", "nextkey":
+_FIX_FIELD_RE = re.compile(r'(:\s*"[^"]*)\s+"([a-z_]+)"\s*:')
+_COLLAPSE_WS_RE = re.compile(r'  +')
+# "value" "field":  ->  "value", "field":
+_REPAIR_RE = re.compile(r'"\s+"([a-z_]+)":\s*')
 
-    script_text = script_text or ''
-    # Only pass model_name for Ollama; Groq uses model from .env
-    if provider == "ollama":
-        llm = LLMFactory.create_llm(provider=provider, model_name=model_name or "llama3:latest", temperature=0.0)
-    else:
-        llm = LLMFactory.create_llm(provider=provider, temperature=0.0)
-    # Stronger, more explicit prompt to handle opaque IDs, label->input mapping, Tab sequences, and value-based inference.
-    parse_prompt = (
-        """You are an expert parser assistant. Given a Selenium-like script (Python or JS), extract all form fields the script interacts with (calls like driver.enter_text, driver.get_text).
+# driver.enter_text('<id>', '<value>', ...): group 2 is the element id, group 4 the value.
+# Script syntax is ASCII, so re.ASCII keeps \s / \d off the Unicode tables.
+_ENTER_TEXT_RE = re.compile(r"""driver\.enter_text\(\s*(['"])(.*?)\1\s*,\s*(['"])(.*?)\3""", re.ASCII)
+# Method name of every driver call; the fast path only handles enter_text-only scripts
+_DRIVER_CALL_RE = re.compile(r'\bdriver\.(\w+)\s*\(', re.ASCII)
+# Words of an element id: camelCase is split and digits dropped ("txtPinCode2" -> txt, pin, code)
+_CAMEL_BOUNDARY_RE = re.compile(r'(?<=[a-z0-9])(?=[A-Z])', re.ASCII)
+_ID_WORD_RE = re.compile(r'[a-z]+', re.ASCII)
+# UI boilerplate in element ids that says nothing about the field
+_ID_NOISE_WORDS = frozenset(('input', 'inp', 'txt', 'text', 'fld', 'field', 'box', 'tb', 'id', 'el', 'elem', 'element', 'ctl', 'ctrl'))
+# Id words (joined with "_") that name each field type. A readable id
+# matching its type becomes the field name.
+_ID_HINT_RES = {
+    'email': re.compile(r'mail', re.ASCII),
+    'pan': re.compile(r'(?<![a-z])pan(?![a-z])', re.ASCII),
+    'ifsc': re.compile(r'ifsc', re.ASCII),
+    'phone': re.compile(r'phone|mobile', re.ASCII),
+    'postal_code': re.compile(r'(?<![a-z])(?:pin|zip)(?:_?code)?(?![a-z])|postal', re.ASCII),
+}
+# Digit-only patterns that also fit other fields (account and card numbers,
+# OTPs, amounts); they are only trusted when the element id names the type
+_ID_GATED_KINDS = frozenset(('phone', 'postal_code'))
+# One alternation for the deterministic value patterns; the group name is the field type
+_CLASSIFIER_RE = re.compile(
+    r'(?P<email>^[^@\s]+@[^@\s]+\.[^@\s]+$)'
+    r'|(?P<pan>^[A-Z]{5}\d{4}[A-Z]$)'
+    r'|(?P<ifsc>^[A-Z]{4}0[A-Z0-9]{6}$)'
+    r'|(?P<phone>^\d{10,}$)'
+    r'|(?P<postal_code>^\d{6}$)',
+    re.ASCII
+)
+_CLASSIFIED_DESCRIPTIONS = {
+    'email': "Email address.",
+    'pan': "Indian PAN (Permanent Account Number).",
+    'ifsc': "Bank branch IFSC code.",
+    'phone': "Phone number.",
+    'postal_code': "Postal / PIN code.",
+}
+
+
+# Parser prompt pieces. The base instructions and the explicit-id example are
+# always sent; each optional block (its rules plus a few-shot example) is only
+# added when the script contains what it covers. Blocks keep a fixed order
+# after the base, so every request still shares the base as a prompt prefix.
+_PARSE_BASE_PROMPT = """You are an expert parser assistant. Given a Selenium-like script (Python or JS), extract all form fields the script interacts with (calls like driver.enter_text, driver.get_text).
 Return ONLY a valid, properly escaped JSON array. Each item must be an object with keys exactly: name (snake_case), type (one of string,email,phone,pan,ifsc,account_number,postal_code,city,state,address,number,date), rules (short string or empty), description (one-sentence), example (realistic example), confidence (float 0.0-1.0).
 
 CRITICAL JSON FORMATTING RULES:
@@ -32,19 +86,9 @@ CRITICAL JSON FORMATTING RULES:
 
 General instructions and strong heuristics (use these to infer fields even when element IDs are opaque/random):
 - Primary evidence: driver.enter_text('<id>', '<value>', ...). Use the written value to infer type and a sensible name.
-- Label mapping: If you see driver.get_text(id) or (often on a label) immediately before an enter_text call (within the next 1-3 interactions), treat the label text as the field label for that enter_text.
-- Tab-based mapping: If the script uses press_key('Tab') between enter_text calls, and there is no explicit label, map the two enter_texts as adjacent fields. Use value patterns and ordering to name them. Common sequence heuristics:
-  - If first looks like a personal name and second looks like a surname, name them first_name and last_name (or first_name/last_name).
-  - If a field value contains '@' -> email. If numeric >=10 digits -> phone. If 6 consecutive digits -> postal_code. If matches date formats -> date.
-- switch_Tab or switch_Tab text: treat the visible tab title or switch target as contextual text that can indicate section or label meaning near subsequent inputs.
+- If a field value contains '@' -> email. If numeric >=10 digits -> phone. If 6 consecutive digits -> postal_code. If matches date formats -> date.
 - If identifiers contain readable tokens (email, phone, name, dob, zip, addr, pan, ifsc, acct, amount), prefer those as the canonical field name (convert to snake_case).
 - When only a value exists, infer name from value pattern or from nearby textual context (get_text, switch_Tab, surrounding comments).
-- For addresses: values containing street tokens (Lane, St, Road, Apt, #, comma-separated address) -> address.
-- For currency/amounts: values with commas and digits or currency symbols -> number.
-- For PAN/IFSC/account_number: follow the patterns:
-  - pan: 10-char Indian PAN pattern (5 letters + 4 digits + 1 letter) -> pan
-  - ifsc: 11-char (4 letters + 0 + 6 alnum) -> ifsc
-  - account_number: long numeric string (8+ digits) without IFSC/PAN pattern
 - Confidence scoring rules:
   - 0.95+ for exact pattern matches or explicit identifier hints (email pattern, PAN, IFSC, explicit label token).
   - ~0.8 for strong contextual matches (label->input, get_text mapping).
@@ -54,9 +98,7 @@ General instructions and strong heuristics (use these to infer fields even when
 - Always produce realistic example values in the example field (use the actual value from the script when given).
 - Return a JSON array only. No extra text, explanation, or markup. Ensure confidence is a float.
 
-FEW-SHOT EXAMPLES (demonstrating opaque IDs and tab inference):
-
-Example A - explicit ids:
+FEW-SHOT EXAMPLE - explicit ids:
 Script:
 driver.enter_text('input_email', 'user@example.com', 0, False)
 Output:
@@ -69,7 +111,12 @@ Output:
   "confidence": 0.98
 }]
 
-Example B - opaque ids with get_text label:
+"""
+
+# Scripts that read labels with get_text
+_LABEL_MAPPING_BLOCK = """Label mapping: If you see driver.get_text(id) or (often on a label) immediately before an enter_text call (within the next 1-3 interactions), treat the label text as the field label for that enter_text.
+
+Example - opaque ids with get_text label:
 Script:
 driver.get_text('label_23')  # text: "Contact Email"
 driver.enter_text('rnd_abc_1', 'alice@company.com', 0, False)
@@ -83,7 +130,13 @@ Output:
   "confidence": 0.95
 }]
 
-Example C - opaque ids + Tab sequence (name pair):
+"""
+
+# Scripts that press Tab between inputs or switch tabs
+_TAB_MAPPING_BLOCK = """Tab-based mapping: If the script uses press_key('Tab') between enter_text calls, and there is no explicit label, map the two enter_texts as adjacent fields. Use value patterns and ordering to name them. If first looks like a personal name and second looks like a surname, name them first_name and last_name.
+switch_Tab or switch_Tab text: treat the visible tab title or switch target as contextual text that can indicate section or label meaning near subsequent inputs.
+
+Example - opaque ids + Tab sequence (name pair):
 Script:
 driver.enter_text('fld_a1', 'John', 0, False)
 driver.press_key('Tab')
@@ -105,7 +158,21 @@ Output:
   "confidence": 0.8
 }]
 
-Example D - opaque ids + amount/address/phone inference:
+"""
+
+# Scripts with PAN/IFSC-like codes, long digit runs or bank-field identifiers
+_PAN_IFSC_BLOCK = """For PAN/IFSC/account_number: follow the patterns:
+  - pan: 10-char Indian PAN pattern (5 letters + 4 digits + 1 letter) -> pan
+  - ifsc: 11-char (4 letters + 0 + 6 alnum) -> ifsc
+  - account_number: long numeric string (8+ digits) without IFSC/PAN pattern
+
+"""
+
+# Scripts with comma-grouped numbers, currency symbols or street/amount tokens
+_ADDRESS_AMOUNT_BLOCK = """For addresses: values containing street tokens (Lane, St, Road, Apt, #, comma-separated address) -> address.
+For currency/amounts: values with commas and digits or currency symbols -> number.
+
+Example - opaque ids + amount/address/phone inference:
 Script:
 driver.enter_text('xyz1', '100,000', 0, False)
 driver.enter_text('xyz2', '123, jane lane', 0, False)
@@ -134,155 +201,343 @@ Output:
   "confidence": 0.95
 }]
 
-IMPORTANT REMINDER: Your output must be ONLY a valid JSON array with properly escaped strings. Ensure all URLs, descriptions, and examples are complete and properly quoted. No control characters, no truncated values.
+"""
+
+_PARSE_PROMPT_TAIL = """IMPORTANT REMINDER: Your output must be ONLY a valid JSON array with properly escaped strings. Ensure all URLs, descriptions, and examples are complete and properly quoted. No control characters, no truncated values.
 
 Now parse the following Selenium script and return the JSON array only:
 
-""" + script_text
-    )
+"""
+
+_PAN_IFSC_TRIGGER_RE = re.compile(r'[A-Z]{4}[0-9]|\d{8}|(?i:pan|ifsc|acc)')
+_ADDRESS_AMOUNT_TRIGGER_RE = re.compile(r'\d,\d|[$₹€£]|(?i:lane|street|road|apt|addr|amount|amt)')
+
 
+# In-process LRU of successful parses keyed by _parse_cache_key(); identical
+# (provider, model, script) triples skip the LLM round-trip entirely.
+_PARSE_CACHE_MAXSIZE = 256
+_PARSE_CACHE: "OrderedDict[str, List[dict]]" = OrderedDict()
+# Set SELENIUM_PARSE_CACHE_DIR (and install diskcache) to share results across processes.
+_PARSE_CACHE_DIR = os.getenv("SELENIUM_PARSE_CACHE_DIR")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_disk_cache():
+    """Shared on-disk cache, or None when not configured/available."""
+    if not _PARSE_CACHE_DIR:
+        return None
+    # Imported here: diskcache (and sqlite3) is only needed once a cache
+    # directory is configured
     try:
-      resp = llm.invoke(parse_prompt)
-
-      # Assemble NDJSON stream if present (Ollama streams many small JSON objects).
-      assembled = ''
-      try:
-        for line in (resp or '').splitlines():
-          line = line.strip()
-          if not line:
+        import diskcache
+    except Exception:
+        return None
+    return diskcache.Cache(_PARSE_CACHE_DIR)
+
+
+def _parse_cache_key(provider: str, model_name: Optional[str], script_text: str) -> str:
+    h = hashlib.sha256()
+    for part in (provider.lower(), model_name or '', script_text):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _cache_get(key: str) -> Optional[List[dict]]:
+    fields = _PARSE_CACHE.get(key)
+    if fields is None:
+        disk = _get_disk_cache()
+        if disk is None:
+            return None
+        fields = disk.get(key)
+        if fields is None:
+            return None
+        _cache_put(key, fields, to_disk=False)
+    else:
+        _PARSE_CACHE.move_to_end(key)
+    # Hand out copies so callers can't mutate the cached entry
+    return [dict(f) for f in fields]
+
+
+def _cache_put(key: str, fields: List[dict], to_disk: bool = True) -> None:
+    _PARSE_CACHE[key] = [dict(f) for f in fields]
+    _PARSE_CACHE.move_to_end(key)
+    if len(_PARSE_CACHE) > _PARSE_CACHE_MAXSIZE:
+        _PARSE_CACHE.popitem(last=False)
+    if to_disk:
+        disk = _get_disk_cache()
+        if disk is not None:
+            disk.set(key, _PARSE_CACHE[key])
+
+
+def _id_words(element_id: str) -> str:
+    """Readable words of `element_id` joined with "_", UI boilerplate removed."""
+    words = _ID_WORD_RE.findall(_CAMEL_BOUNDARY_RE.sub('_', element_id).lower())
+    return '_'.join(w for w in words if w not in _ID_NOISE_WORDS)
+
+
+def _classify_value(value: str, element_id: str) -> Optional[dict]:
+    """Return a field dict for values matching an unambiguous pattern, else None.
+
+    The field is named after the element id when the id names its type
+    (work_email -> work_email), otherwise after the type.
+    """
+    m = _CLASSIFIER_RE.match(value)
+    if not m:
+        return None
+    kind = m.lastgroup
+    id_name = _id_words(element_id)
+    named_by_id = bool(id_name) and _ID_HINT_RES[kind].search(id_name) is not None
+    if kind in _ID_GATED_KINDS and not named_by_id:
+        return None
+    return {
+        'name': id_name if named_by_id else kind,
+        'type': kind,
+        'rules': '',
+        'description': _CLASSIFIED_DESCRIPTIONS[kind],
+        'example': value,
+        'confidence': 0.95
+    }
+
+
+def _classify_script_fields(script_text: str) -> Optional[List[dict]]:
+    """Client-side fast path: classify every enter_text value without the LLM.
+
+    Returns None (fall back to the LLM) unless the script makes no driver
+    calls other than enter_text, every value matches a deterministic pattern
+    and the resulting field names are unique. Other calls (get_text,
+    select_option, ...) carry labels and inputs only the LLM can map.
+    """
+    # str.__contains__ is a C-level scan; skip the regex for scripts with no enter_text calls
+    if 'driver.enter_text' not in script_text:
+        return None
+    if any(call != 'enter_text' for call in _DRIVER_CALL_RE.findall(script_text)):
+        return None
+
+    fields = []
+    seen = set()
+    seen_inputs = set()
+    append_field, mark_seen = fields.append, seen.add
+    for m in _ENTER_TEXT_RE.finditer(script_text):
+        value = m.group(4).strip()
+        # Blank entries (field clears) carry no type evidence; repeats of the
+        # same (element, value) describe the same field.
+        if not value:
             continue
-          try:
-            obj = json.loads(line)
-            if isinstance(obj, dict) and 'response' in obj:
-              assembled += obj['response']
-          except Exception:
-            # not a JSON line, ignore
+        key = (m.group(2), value)
+        if key in seen_inputs:
             continue
-      except Exception:
-        assembled = ''
-
-      source_text = assembled if assembled else (resp or '')
-
-      def _extract_first_json_array(text: str) -> Optional[str]:
-        if not text:
-          return None
-        start = text.find('[')
-        if start == -1:
-          return None
-        i = start
-        depth = 0
-        in_str = False
-        escape = False
-        while i < len(text):
-          ch = text[i]
-          if in_str:
-            if escape:
-              escape = False
-            elif ch == '\\':
-              escape = True
-            elif ch == '"':
-              in_str = False
-          else:
-            if ch == '"':
-              in_str = True
-            elif ch == '[':
-              depth += 1
-            elif ch == ']':
-              depth -= 1
-              if depth == 0:
-                return text[start:i+1]
-          i += 1
-        return None
+        seen_inputs.add(key)
+        field = _classify_value(value, m.group(2))
+        if field is None:
+            return None
+        name = field['name']
+        if name in seen:
+            return None
+        mark_seen(name)
+        append_field(field)
+    return fields or None
+
 
-      json_str = _extract_first_json_array(source_text)
-      if not json_str:
-        # fallback to naive regex on raw resp
-        m = re.search(r'\[.*\]', resp, re.DOTALL)
-        if m:
-          json_str = m.group(0)
-        else:
-          json_str = source_text.strip()
-
-      # Clean and attempt to parse
-      cleaner = TestDataGenerator()
-      json_str = cleaner._clean_json_response(json_str)
-      
-      import re
-      
-      # Step 1: Remove all control characters (ASCII < 32 except \n, \r, \t)
-      cleaned_chars = []
-      for char in json_str:
-        code = ord(char)
-        if code >= 32 or char in '\n\r\t':
-          cleaned_chars.append(char)
-      json_str = ''.join(cleaned_chars)
-      
-      # Step 2: Fix the specific broken pattern from Groq
-      # Pattern: "example": "https: "confidence" (missing closing quote, comma, and rest of URL)
-      # This happens when control char truncates the string value
-      # Look for: ": "text without closing quote before next field
-      
-      # Find all occurrences of incomplete string values
-      # Pattern: ": "[^"]*" "[a-z_]+" where the second quote should be comma+quote
-      json_str = re.sub(
-        r'(:\s*"[^"]*)\s+"([a-z_]+)"\s*:',  # Match: : "value" "nextkey" :
-        r'\1", "\2":',                        # Replace with: : "value", "nextkey":
-        json_str
-      )
-      
-      # Step 3: Normalize whitespace
-      json_str = re.sub(r'  +', ' ', json_str)
-
-      try:
-        # Try with strict=False first to be more lenient
-        parsed = json.loads(json_str, strict=False)
-      except json.JSONDecodeError as e:
+def _create_parser_llm(provider: str, model_name: Optional[str]):
+    # Only pass model_name for Ollama; Groq uses model from .env
+    if provider == "ollama":
+        return LLMFactory.get_shared(provider=provider, model_name=model_name or "llama3:latest", temperature=0.0)
+    return LLMFactory.get_shared(provider=provider, temperature=0.0)
+
+
+def _parse_instructions(script_text: str) -> str:
+    """The parser prompt for `script_text`, without the script itself."""
+    parts = [_PARSE_BASE_PROMPT]
+    if 'get_text' in script_text:
+        parts.append(_LABEL_MAPPING_BLOCK)
+    if 'Tab' in script_text:
+        parts.append(_TAB_MAPPING_BLOCK)
+    if _PAN_IFSC_TRIGGER_RE.search(script_text):
+        parts.append(_PAN_IFSC_BLOCK)
+    if _ADDRESS_AMOUNT_TRIGGER_RE.search(script_text):
+        parts.append(_ADDRESS_AMOUNT_BLOCK)
+    parts.append(_PARSE_PROMPT_TAIL)
+    return ''.join(parts)
+
+
+def _build_parse_request(provider: str, script_text: str) -> Tuple[str, dict]:
+    """Return the (prompt, invoke kwargs) pair for the parser LLM.
+
+    Groq receives the instructions as a separate system message; Ollama's
+    generate endpoint takes a single prompt, so the script is appended to them.
+    """
+    instructions = _parse_instructions(script_text)
+    if provider.lower() == "groq":
+        return script_text, {"system": instructions}
+    return instructions + script_text, {}
+
+
+_NOT_PARSED = object()
+
+
+def _loads_strict_fast(json_str: str):
+    """Parse well-formed JSON with orjson when installed.
+
+    Returns _NOT_PARSED when orjson is unavailable or rejects the input, so the
+    caller falls through to the lenient stdlib parse and repair pass.
+    """
+    if orjson is None:
+        return _NOT_PARSED
+    try:
+        return orjson.loads(json_str)
+    except ValueError:
+        return _NOT_PARSED
+
+
+def _parse_llm_response(resp: str) -> Tuple[List[dict], Optional[str]]:
+    """Extract, repair and normalize the JSON field list from raw parser output."""
+    # Assemble NDJSON stream if present (Ollama streams many small JSON objects).
+    assembled = _assemble_ndjson(resp)
+
+    source_text = assembled if assembled else (resp or '')
+
+    json_str = extract_first_json_array(source_text)
+    if not json_str:
+        # fallback: widest [...] span of the raw resp (plain index math, no regex backtracking)
+        raw = resp or ''
+        start, end = raw.find('['), raw.rfind(']')
+        json_str = raw[start:end + 1] if start != -1 and end > start else source_text.strip()
+
+    # Clean and attempt to parse
+    json_str = _clean_json_response(json_str)
+
+    # Step 1: Remove all control characters (ASCII < 32 except \n, \r, \t)
+    json_str = json_str.translate(_CTRL_CHARS_TABLE)
+
+    # Step 2: Fix the specific broken pattern from Groq
+    # Pattern: "example": "https: "confidence" (missing closing quote, comma, and rest of URL)
+    # This happens when control char truncates the string value
+    # Look for: ": "text without closing quote before next field
+
+    # Find all occurrences of incomplete string values
+    # Pattern: ": "[^"]*" "[a-z_]+" where the second quote should be comma+quote
+    json_str = _FIX_FIELD_RE.sub(r'\1", "\2":', json_str)
+
+    # Step 3: Normalize whitespace
+    json_str = _COLLAPSE_WS_RE.sub(' ', json_str)
+
+    try:
+        parsed = _loads_strict_fast(json_str)
+        if parsed is _NOT_PARSED:
+            # Try with strict=False to be more lenient
+            parsed = json.loads(json_str, strict=False)
+    except json.JSONDecodeError as e:
         print(f"JSON parse failed at position {e.pos}: {e.msg}")
         error_start = max(0, e.pos - 100)
         error_end = min(len(json_str), e.pos + 100)
         print(f"Problematic JSON section: {json_str[error_start:error_end]}")
-        
+
         # Try to repair common issues
         try:
-          # Replace any remaining problematic patterns
-          repaired = json_str
-          
-          # Fix incomplete string values before field names
-          # Pattern: "value" "field": should be "value", "field":
-          repaired = re.sub(r'"\s+"([a-z_]+)":\s*', r'", "\1": ', repaired)
-          
-          # Try parsing repaired version
-          parsed = json.loads(repaired, strict=False)
-          print("✓ Parsed successfully after repair")
+            # Replace any remaining problematic patterns
+            repaired = json_str
+
+            # Fix incomplete string values before field names
+            # Pattern: "value" "field": should be "value", "field":
+            repaired = _REPAIR_RE.sub(r'", "\1": ', repaired)
+
+            # Try parsing repaired version
+            parsed = json.loads(repaired, strict=False)
+            print("✓ Parsed successfully after repair")
         except Exception as repair_error:
-          # Show detailed error context
-          snippet = (source_text or '')[:2000]
-          error_context = json_str[max(0, e.pos - 50):min(len(json_str), e.pos + 50)]
-          return [], f"Failed to JSON-decode parser output: {str(e)}\nError context: ...{error_context}...\nRaw snippet: {snippet}"
-      except Exception as e:
+            # Show detailed error context
+            snippet = (source_text or '')[:2000]
+            error_context = json_str[max(0, e.pos - 50):min(len(json_str), e.pos + 50)]
+            return [], f"Failed to JSON-decode parser output: {str(e)}\nError context: ...{error_context}...\nRaw snippet: {snippet}"
+    except Exception as e:
         snippet = (source_text or '')[:1500]
         return [], f"Failed to JSON-decode parser output: {str(e)}\nRaw snippet:\n{snippet}"
 
-      if not isinstance(parsed, list):
+    if not isinstance(parsed, list):
         parsed = [parsed]
 
-      normalized = []
-      for item in parsed:
+    normalized = []
+    append = normalized.append
+    for item in parsed:
         if not isinstance(item, dict):
-          continue
-        normalized.append({
-          'name': item.get('name', '').strip(),
-          'type': item.get('type', 'string'),
-          'rules': item.get('rules', '') or '',
-          'description': item.get('description', '') or '',
-          'example': item.get('example', '') or '',
-          'confidence': float(item.get('confidence', 0.0))
+            continue
+        get = item.get
+        append({
+            'name': get('name', '').strip(),
+            'type': get('type', 'string'),
+            'rules': get('rules') or '',
+            'description': get('description') or '',
+            'example': get('example') or '',
+            'confidence': float(get('confidence', 0.0))
         })
 
-      if not normalized:
+    if not normalized:
         snippet = (source_text or '')[:1500]
         return [], f"No fields parsed from LLM output. Raw LLM snippet:\n{snippet}"
 
-      return normalized, None
+    return normalized, None
+
+
+def _known_fields(script_text: str, provider: str, model_name: Optional[str]) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """Fields found without the LLM (classifier fast path or parse cache), else None,
+    plus the parse-cache key for storing the LLM's answer."""
+    classified = _classify_script_fields(script_text)
+    if classified is not None:
+      return classified, None
+    cache_key = _parse_cache_key(provider, model_name, script_text)
+    return _cache_get(cache_key), cache_key
+
+
+def _parse_request(provider: str, model_name: Optional[str], script_text: str):
+    """(llm, prompt, invoke kwargs) for asking the LLM to parse `script_text`."""
+    llm = _create_parser_llm(provider, model_name)
+    parse_prompt, invoke_kwargs = _build_parse_request(provider, script_text)
+    return llm, parse_prompt, invoke_kwargs
+
+
+def _finish_parse(resp: str, cache_key: str) -> Tuple[List[dict], Optional[str]]:
+    """Parse the LLM reply and cache the fields if it parsed cleanly."""
+    fields, err = _parse_llm_response(resp)
+    if err is None:
+      _cache_put(cache_key, fields)
+    return fields, err
+
+
+def parse_selenium_script(script_text: str, provider: str = "ollama", model_name: str = None) -> Tuple[List[dict], Optional[str]]:
+
+    script_text = script_text or ''
+    known, cache_key = _known_fields(script_text, provider, model_name)
+    if known is not None:
+      return known, None
+
+    llm, parse_prompt, invoke_kwargs = _parse_request(provider, model_name, script_text)
+    try:
+      return _finish_parse(llm.invoke(parse_prompt, **invoke_kwargs), cache_key)
+    except Exception as e:
+      return [], f"LLM parsing failed: {str(e)}"
+
+
+async def parse_selenium_script_async(script_text: str, provider: str = "ollama", model_name: str = None) -> Tuple[List[dict], Optional[str]]:
+    """Async variant of `parse_selenium_script`.
+
+    The LLM round-trip is awaited via `llm.ainvoke`, so several scripts can be
+    parsed concurrently without blocking the event loop.
+    """
+    script_text = script_text or ''
+    known, cache_key = _known_fields(script_text, provider, model_name)
+    if known is not None:
+      return known, None
+
+    llm, parse_prompt, invoke_kwargs = _parse_request(provider, model_name, script_text)
+    try:
+      return _finish_parse(await llm.ainvoke(parse_prompt, **invoke_kwargs), cache_key)
     except Exception as e:
-      return [], f"LLM parsing failed: {str(e)}"
\ No newline at end of file
+      return [], f"LLM parsing failed: {str(e)}"
+
+
+async def parse_many(scripts: List[str], provider: str = "ollama", model_name: str = None) -> List[Tuple[List[dict], Optional[str]]]:
+    """Parse several Selenium scripts concurrently; results keep input order."""
+    return list(await asyncio.gather(
+        *(parse_selenium_script_async(script, provider, model_name) for script in scripts)
+    ))
@@ -0,0 +1,133 @@
+"""
+Tests for the LLM reply parsing in data_generator.py: NDJSON assembly and the JSON repair heuristics.
+
+Run with `python -m pytest test_data_generator.py` or `python test_data_generator.py`.
+"""
+
+import asyncio
+import json
+import unittest
+
+from data_generator import TestDataGenerator, _assemble_ndjson, _clean_json_response
+
+# (label, raw LLM text, value it must parse to after cleaning). Each raw text
+# is invalid JSON, so the scanner (not the fast path) does the repair.
+REPAIR_CASES = [
+    ("trailing comma in array", '[{"a": 1},]', [{"a": 1}]),
+    ("trailing comma in object", '[{"a": 1,}]', [{"a": 1}]),
+    ("trailing comma before whitespace", '[{"a": 1}, \n ]', [{"a": 1}]),
+    ("repeated commas", '[{"a": 1,, "b": 2}]', [{"a": 1, "b": 2}]),
+    ("leading comma", '[, {"a": 1}]', [{"a": 1}]),
+    ("line comment", '[{"a": 1} // first row\n]', [{"a": 1}]),
+    ("line comment at end", '[{"a": 1}]\n// done', [{"a": 1}]),
+    ("// inside a string", '[{"url": "https://x.com//a",}]', [{"url": "https://x.com//a"}]),
+    ("block comment", '[{"a": /* one */ 1}]', [{"a": 1}]),
+    ("multi-line block comment", '[/* rows\nfollow */ {"a": 1},]', [{"a": 1}]),
+    ("/* */ inside a string", '[{"a": "/* keep */",}]', [{"a": "/* keep */"}]),
+    ("escaped single quote", '[{"a": "it\\\'s"}]', [{"a": "it's"}]),
+    ("escaped double quote kept", '[{"a": "say \\"hi\\"",}]', [{"a": 'say "hi"'}]),
+    ("lone null between keys", '[{"a": 1, null, "b": 2}]', [{"a": 1, "b": 2}]),
+    ("lone null first in object", '[{null, "a": 1}]', [{"a": 1}]),
+    ("lone null last in object", '[{"a": 1, null}]', [{"a": 1}]),
+    ("null value kept", '[{"a": null,}]', [{"a": None}]),
+    ("null inside a string kept", '[{"a": "null", null}]', [{"a": "null"}]),
+    ("doubled brackets", '[[{"a": 1}]]', [{"a": 1}]),
+    ("doubled brackets with spaces", ' [ [ {"a": 1} ] ] ', [{"a": 1}]),
+    ("control characters", '[{"a": "x\x01y"},]', [{"a": "x y"}]),
+]
+
+# Valid JSON that the fast path must return unchanged
+FAST_PATH_CASES = [
+    ("plain array", '[{"a": 1}, {"a": 2}]'),
+    ("comment-like text in strings", '[{"url": "https://x.com/a//b", "note": "/* not a comment */"}]'),
+    ("null values and entries", '[{"a": null}, null]'),
+]
+
+
+class CleanJsonResponseTest(unittest.TestCase):
+    def test_repairs(self):
+        for label, raw, expected in REPAIR_CASES:
+            with self.subTest(label):
+                self.assertEqual(json.loads(_clean_json_response(raw)), expected)
+
+    def test_fast_path_returns_valid_json_unchanged(self):
+        for label, raw in FAST_PATH_CASES:
+            with self.subTest(label):
+                self.assertEqual(_clean_json_response(raw), raw)
+
+
+class AssembleNdjsonTest(unittest.TestCase):
+    def test_joins_stream_chunks(self):
+        stream = '{"response": "[{\\"a\\"", "done": false}\n{"response": ": 1}]", "done": false}\n{"response": "", "done": true}\n'
+        self.assertEqual(_assemble_ndjson(stream), '[{"a": 1}]')
+
+    def test_plain_text_is_not_a_stream(self):
+        cases = [
+            ("prose quoting a response field", 'text "response": "x" [1,2]'),
+            ("array whose rows have a response field", '[{"response": "yes"}]'),
+            ("empty", ''),
+        ]
+        for label, text in cases:
+            with self.subTest(label):
+                self.assertEqual(_assemble_ndjson(text), '')
+
+
+class ParseGeneratedResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.generator = TestDataGenerator(provider="ollama", use_cache=False)
+
+    def test_lone_null_rows_are_dropped(self):
+        cases = [
+            ("valid JSON (fast path)", '[{"a": 1}, null, {"a": 2}]'),
+            ("repaired JSON (scanner)", '[{"a": 1}, null, {"a": 2},]'),
+            ("null first and last", '[null, {"a": 1}, {"a": 2}, null]'),
+        ]
+        for label, raw in cases:
+            with self.subTest(label):
+                result = self.generator._parse_generated_response(raw, 5)
+                self.assertEqual(result, {"data": [{"a": 1}, {"a": 2}], "count": 2})
+
+    def test_rows_are_capped_after_dropping_nulls(self):
+        result = self.generator._parse_generated_response('[null, {"a": 1}, {"a": 2}, {"a": 3}]', 2)
+        self.assertEqual(result, {"data": [{"a": 1}, {"a": 2}], "count": 2})
+
+
+class _UnparseableLLM:
+    """LLM client whose batched replies never parse, forcing the per-table fallback."""
+
+    async def ainvoke(self, prompt):
+        return "no JSON here"
+
+
+class BatchFallbackConcurrencyTest(unittest.TestCase):
+    def test_fallback_stays_within_the_semaphore(self):
+        generator = TestDataGenerator(provider="ollama", use_cache=False)
+        generator.llm = _UnparseableLLM()
+        running = 0
+        peak = 0
+
+        async def fake_agenerate_data(**kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"data": [], "count": 0}
+
+        generator.agenerate_data = fake_agenerate_data
+        tables_spec = [
+            {"table_name": f"t{i}", "schema_fields": [{"name": "a"}], "num_records": 1,
+             "correct_num_records": 1, "wrong_num_records": 0}
+            for i in range(6)
+        ]
+
+        async def run():
+            return await generator.agenerate_many(tables_spec, asyncio.Semaphore(2))
+
+        results = asyncio.run(run())
+        self.assertEqual(sorted(results), [f"t{i}" for i in range(6)])
+        self.assertEqual(peak, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
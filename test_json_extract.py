@@ -0,0 +1,58 @@
+"""
+Tests for json_extract, which every LLM reply parser uses to find the JSON
+value inside prose.
+
+Run with `python -m pytest test_json_extract.py` or `python test_json_extract.py`.
+"""
+
+import unittest
+
+from json_extract import extract_first_json_array, extract_first_json_object
+
+# (label, text, expected first array)
+ARRAY_CASES = [
+    ("bare array", '[1, 2]', '[1, 2]'),
+    ("surrounded by prose", 'Here you go: [1, 2] Hope it helps [3]', '[1, 2]'),
+    ("nested arrays", 'x [[1], [2, [3]]] y', '[[1], [2, [3]]]'),
+    ("array inside an object", '{"rows": [1, 2]}', '[1, 2]'),
+    ("closing bracket in a string", '["a]b", "c"] tail', '["a]b", "c"]'),
+    ("opening bracket in a string", '["[c", 1] tail ]', '["[c", 1]'),
+    ("escaped quote in a string", r'["say \"]\" ok", 1] x', r'["say \"]\" ok", 1]'),
+    ("escaped backslash before a quote", r'["C:\\", "]"] x', r'["C:\\", "]"]'),
+    ("escaped backslash then escaped quote", r'["a\\\"]", 2]', r'["a\\\"]", 2]'),
+    ("stray closer before the opener", '] oops [1, 2]', '[1, 2]'),
+    ("truncated", '[{"a": 1}, {"a": 2', None),
+    ("truncated with a closed inner array", '[1, [2, 3]', None),
+    ("closer only inside a string", '["a]"', None),
+    ("no array", 'no json here', None),
+    ("empty", '', None),
+]
+
+# (label, text, expected first object)
+OBJECT_CASES = [
+    ("bare object", '{"a": 1}', '{"a": 1}'),
+    ("surrounded by prose", 'Result: {"a": {"b": [1]}} done {"c": 2}', '{"a": {"b": [1]}}'),
+    ("braces in strings", '{"a": "}{", "b": "{"} x', '{"a": "}{", "b": "{"}'),
+    ("escaped quote in a string", r'{"a": "\"}\""} x', r'{"a": "\"}\""}'),
+    ("escaped backslash before a quote", r'{"path": "C:\\"} }', r'{"path": "C:\\"}'),
+    ("stray closer before the opener", '} then {"a": 1}', '{"a": 1}'),
+    ("truncated", '{"a": {"b": 1}', None),
+    ("no object", '[1, 2]', None),
+    ("none", None, None),
+]
+
+
+class ExtractFirstJsonTest(unittest.TestCase):
+    def test_arrays(self):
+        for label, text, expected in ARRAY_CASES:
+            with self.subTest(label):
+                self.assertEqual(extract_first_json_array(text), expected)
+
+    def test_objects(self):
+        for label, text, expected in OBJECT_CASES:
+            with self.subTest(label):
+                self.assertEqual(extract_first_json_object(text), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+"""
+Check that JSON-object replies survive the Ollama client.
+
+OllamaLLM.invoke() returns the first JSON array of a reply, so callers that
+expect an object ({table: rows, ...}) must read the whole object instead.
+These tests fake the HTTP session, so no Ollama server is needed.
+
+Run with `python -m pytest test_ollama_json_replies.py` or `python test_ollama_json_replies.py`.
+"""
+
+import asyncio
+import io
+import json
+import unittest
+from unittest import mock
+
+import langchain_ollama
+from data_generator import TestDataGenerator
+from nl_db_generator import RelationshipDetectorAgent, SchemaDesignerAgent, TextParserAgent
+
+BATCH_REPLY = {
+    "users": [
+        {"id": 1, "name": "Asha", "is_valid": True},
+        {"id": 2, "name": "Ravi", "is_valid": True},
+    ],
+    "orders": [
+        {"order_id": 10, "user_id": 1, "is_valid": True},
+    ],
+}
+
+TABLES_SPEC = [
+    {
+        "table_name": "users",
+        "schema_fields": [{"name": "id", "type": "integer"}, {"name": "name", "type": "string"}],
+        "num_records": 2,
+        "correct_num_records": 2,
+        "wrong_num_records": 0,
+    },
+    {
+        "table_name": "orders",
+        "schema_fields": [{"name": "order_id", "type": "integer"}, {"name": "user_id", "type": "integer"}],
+        "num_records": 1,
+        "correct_num_records": 1,
+        "wrong_num_records": 0,
+    },
+]
+
+DESIGN_REPLY = {
+    "users": [{"name": "id", "type": "integer"}, {"name": "email", "type": "email"}],
+    "orders": [{"name": "order_id", "type": "integer"}, {"name": "total", "type": "float"}],
+}
+
+TABLE_INFOS = [{"name": "users"}, {"name": "orders"}]
+
+PARSE_REPLY = {
+    "db_name": "shop",
+    "tables": [{"name": "users", "explicit_fields": ["email"]}, {"name": "orders", "explicit_fields": []}],
+    "relationships": [{"from": "orders", "to": "users"}],
+}
+
+RELATIONSHIP_REPLY = {
+    "orders": [{"fk_field_name": "user_id", "references_table": "users", "reasoning": "orders belong to users"}],
+}
+
+
+class _Raw(io.BytesIO):
+    decode_content = False
+
+
+class _FakeResponse:
+    status_code = 200
+    headers = {"Content-Type": "application/x-ndjson"}
+
+    def __init__(self, text: str, key: str = "response"):
+        # Stream the reply a few characters per NDJSON line, like Ollama does
+        lines = [json.dumps({key: text[i:i + 7], "done": False}) for i in range(0, len(text), 7)]
+        lines.append(json.dumps({key: "", "done": True}))
+        self.raw = _Raw(("\n".join(lines) + "\n").encode("utf-8"))
+
+    def close(self):
+        self.raw.close()
+
+
+class _FakeSession:
+    def __init__(self, text: str, key: str = "response"):
+        self.text = text
+        self.key = key
+        self.calls = 0
+
+    def post(self, url, json=None, stream=False, timeout=None):
+        self.calls += 1
+        return _FakeResponse(self.text, self.key)
+
+
+class StreamTextKeysTest(unittest.TestCase):
+    def test_invoke_and_stream_read_the_same_keys(self):
+        for key in ("response", "token", "text", "content", "output"):
+            with self.subTest(key), mock.patch.object(
+                langchain_ollama, "_get_session", return_value=_FakeSession("plain reply text", key)
+            ):
+                llm = langchain_ollama.OllamaLLM()
+                self.assertEqual(llm.invoke("hi"), "plain reply text")
+                self.assertEqual("".join(llm.stream("hi")), "plain reply text")
+
+
+class BatchedGenerationTest(unittest.TestCase):
+    def setUp(self):
+        self.session = _FakeSession("Here is the data:\n" + json.dumps(BATCH_REPLY) + "\nDone.")
+        patcher = mock.patch.object(langchain_ollama, "_get_session", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.generator = TestDataGenerator(provider="ollama", use_cache=False)
+
+    def _check(self, results):
+        # A single request means the batch was parsed, not the per-table fallback
+        self.assertEqual(self.session.calls, 1)
+        self.assertEqual(results["users"], {"data": BATCH_REPLY["users"], "count": 2})
+        self.assertEqual(results["orders"], {"data": BATCH_REPLY["orders"], "count": 1})
+
+    def test_generate_many_reads_whole_object(self):
+        self._check(self.generator.generate_many(TABLES_SPEC))
+
+    def test_agenerate_many_reads_whole_object(self):
+        self._check(asyncio.run(self.generator.agenerate_many(TABLES_SPEC)))
+
+
+class SingleTableGenerationTest(unittest.TestCase):
+    def setUp(self):
+        rows = BATCH_REPLY["users"]
+        self.session = _FakeSession(json.dumps(rows) + "\nThese rows follow {the rules}.")
+        patcher = mock.patch.object(langchain_ollama, "_get_session", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.generator = TestDataGenerator(provider="ollama", use_cache=False)
+
+    def test_generate_data_reads_the_array(self):
+        result = self.generator.generate_data(TABLES_SPEC[0]["schema_fields"], num_records=2, correct_num_records=2)
+        self.assertEqual(result, {"data": BATCH_REPLY["users"], "count": 2})
+
+    def test_agenerate_data_reads_the_array(self):
+        result = asyncio.run(
+            self.generator.agenerate_data(TABLES_SPEC[0]["schema_fields"], num_records=2, correct_num_records=2)
+        )
+        self.assertEqual(result, {"data": BATCH_REPLY["users"], "count": 2})
+
+
+class BulkSchemaDesignTest(unittest.TestCase):
+    def setUp(self):
+        self.session = _FakeSession(json.dumps(DESIGN_REPLY))
+        patcher = mock.patch.object(langchain_ollama, "_get_session", return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.agent = SchemaDesignerAgent(provider="ollama")
+
+    def _check(self, designed):
+        # A single request means no table fell back to design_schema()
+        self.assertEqual(self.session.calls, 1)
+        self.assertEqual(designed, [DESIGN_REPLY["users"], DESIGN_REPLY["orders"]])
+
+    def test_design_schemas_bulk_reads_whole_object(self):
+        self._check(self.agent.design_schemas_bulk(TABLE_INFOS, ["users", "orders"]))
+
+    def test_adesign_schemas_bulk_reads_whole_object(self):
+        self._check(asyncio.run(self.agent.adesign_schemas_bulk(TABLE_INFOS, ["users", "orders"])))
+
+
+class AgentObjectReplyTest(unittest.TestCase):
+    def _patch_session(self, reply):
+        session = _FakeSession(json.dumps(reply))
+        patcher = mock.patch.object(langchain_ollama, "_get_session", return_value=session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_text_parser_reads_whole_object(self):
+        self._patch_session(PARSE_REPLY)
+        agent = TextParserAgent(provider="ollama")
+        self.assertEqual(agent.parse("a shop with users and orders"), PARSE_REPLY)
+        self.assertEqual(asyncio.run(agent.aparse("a shop with users and orders")), PARSE_REPLY)
+
+    def test_relationship_detector_reads_whole_object(self):
+        self._patch_session(RELATIONSHIP_REPLY)
+        agent = RelationshipDetectorAgent(provider="ollama")
+        tables = [{"name": "users"}, {"name": "orders"}]
+        hints = PARSE_REPLY["relationships"]
+        self.assertEqual(agent.detect_relationships(tables, hints), RELATIONSHIP_REPLY)
+        self.assertEqual(asyncio.run(agent.adetect_relationships(tables, hints)), RELATIONSHIP_REPLY)
+
+
+if __name__ == "__main__":
+    unittest.main()
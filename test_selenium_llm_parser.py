@@ -0,0 +1,128 @@
+"""
+Tests for the Selenium script parser: the client-side classifier that
+answers simple scripts without the LLM, and the sync/async LLM path.
+
+Run with `python -m pytest test_selenium_llm_parser.py` or `python test_selenium_llm_parser.py`.
+"""
+
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import selenium_llm_parser
+from selenium_llm_parser import _classify_script_fields, parse_selenium_script, parse_selenium_script_async
+
+
+def _script(*inputs):
+    return "\n".join(f"driver.enter_text('{element_id}', '{value}', 0, False)" for element_id, value in inputs)
+
+
+class ClassifyScriptFieldsTest(unittest.TestCase):
+    def _names_and_types(self, *inputs):
+        fields = _classify_script_fields(_script(*inputs))
+        return fields and [(f["name"], f["type"]) for f in fields]
+
+    def test_ambiguous_values_go_to_the_llm(self):
+        cases = [
+            ("six digits on an otp input", ("otp_input", "482913")),
+            ("six digits on an amount input", ("loan_amount", "250000")),
+            ("six digits on an opaque id", ("xyz1", "560001")),
+            ("long digit run on an account input", ("acct_no", "123456789012")),
+            ("long digit run on an opaque id", ("fld_7", "9876543210")),
+        ]
+        for label, element in cases:
+            with self.subTest(label):
+                self.assertIsNone(_classify_script_fields(_script(element)))
+
+    def test_one_ambiguous_value_sends_the_whole_script(self):
+        self.assertIsNone(_classify_script_fields(_script(("email", "a@b.com"), ("otp", "482913"))))
+
+    def test_digit_patterns_need_a_matching_id(self):
+        cases = [
+            (("pin_code", "560001"), [("pin_code", "postal_code")]),
+            (("txtZipCode", "560001"), [("zip_code", "postal_code")]),
+            (("postalCode", "560001"), [("postal_code", "postal_code")]),
+            (("mobile_no", "9876543210"), [("mobile_no", "phone")]),
+            (("input_phone", "9876543210"), [("phone", "phone")]),
+        ]
+        for element, expected in cases:
+            with self.subTest(element[0]):
+                self.assertEqual(self._names_and_types(element), expected)
+
+    def test_readable_ids_name_the_field(self):
+        cases = [
+            (("work_email", "a@b.com"), [("work_email", "email")]),
+            (("input_email", "a@b.com"), [("email", "email")]),
+            (("panNumber", "ABCDE1234F"), [("pan_number", "pan")]),
+            (("bank_ifsc", "SBIN0001234"), [("bank_ifsc", "ifsc")]),
+        ]
+        for element, expected in cases:
+            with self.subTest(element[0]):
+                self.assertEqual(self._names_and_types(element), expected)
+
+    def test_opaque_ids_use_the_type_as_name(self):
+        self.assertEqual(
+            self._names_and_types(("rnd_abc_1", "a@b.com"), ("fld_a2", "SBIN0001234")),
+            [("email", "email"), ("ifsc", "ifsc")],
+        )
+
+    def test_distinct_readable_ids_keep_both_fields(self):
+        self.assertEqual(
+            self._names_and_types(("work_email", "a@b.com"), ("home_email", "c@d.com")),
+            [("work_email", "email"), ("home_email", "email")],
+        )
+
+    def test_duplicate_names_go_to_the_llm(self):
+        self.assertIsNone(_classify_script_fields(_script(("rnd_1", "a@b.com"), ("rnd_2", "c@d.com"))))
+
+    def test_other_driver_calls_go_to_the_llm(self):
+        script = "driver.get_text('label_1')\n" + _script(("email", "a@b.com"))
+        self.assertIsNone(_classify_script_fields(script))
+
+
+PARSED_FIELDS = [{
+    "name": "first_name",
+    "type": "string",
+    "rules": "",
+    "description": "Given name.",
+    "example": "John",
+    "confidence": 0.8,
+}]
+
+
+class _FakeParserLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        return json.dumps(PARSED_FIELDS)
+
+    async def ainvoke(self, prompt, **kwargs):
+        return self.invoke(prompt, **kwargs)
+
+
+class ParseSeleniumScriptTest(unittest.TestCase):
+    def setUp(self):
+        self.llm = _FakeParserLLM()
+        patcher = mock.patch.object(selenium_llm_parser, "_create_parser_llm", return_value=self.llm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sync_and_async_parse_and_share_the_cache(self):
+        # The name can't be classified locally, so the first parse asks the LLM
+        script = _script(("fld_sync_async_1", "John"))
+        self.assertEqual(parse_selenium_script(script), (PARSED_FIELDS, None))
+        self.assertEqual(asyncio.run(parse_selenium_script_async(script)), (PARSED_FIELDS, None))
+        self.assertEqual(self.llm.calls, 1)
+
+    def test_classified_scripts_skip_the_llm(self):
+        script = _script(("work_email", "a@b.com"))
+        self.assertEqual(parse_selenium_script(script)[0][0]["name"], "work_email")
+        self.assertEqual(asyncio.run(parse_selenium_script_async(script))[0][0]["name"], "work_email")
+        self.assertEqual(self.llm.calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()